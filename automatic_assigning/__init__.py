@@ -1 +1,3 @@
 from .assigner import Assigner
+from .async_assigner import AsyncAssigner
+from .registry import Registry
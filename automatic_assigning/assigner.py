@@ -1,50 +1,333 @@
-from typing import Type
+import heapq
+import itertools
+from datetime import datetime, timedelta
+from time import perf_counter
+from typing import Iterable, Type
 
+from .augment import augment
+from .candidates import CandidatePool
+from .flow import MinCostFlow
 from .models import AssignmentObject, AssignmentRule, AssignmentSlot, AssignmentGroup, Event
+from .ordering import ORDERS, CandidateOrder
+from .parallel import assign_parallel
+from .registry import Registry, scoped
+from .storage import Storage
+from .stats import AssignerStats
 
 
 class Assigner:
-    def __init__(self):
-        pass
+    strategies = ("greedy", "flow")
 
+    def __init__(self, strategy: str = "greedy", continuity_cost: int = 10, load_cost: int = 1, workers: int = None,
+                 stats: AssignerStats = None, order: str = "pool", repair_iterations: int = 0,
+                 repair_seconds: float = None, repair_depth: int = 3, registry: Registry = None,
+                 storage: Storage = None):
+        """
+        :param strategy: "greedy" assigns events one at a time, giving each slot the first object that can be assigned.
+            "flow" assigns windows of conflicting events at once as a min-cost max-flow problem, filling as many slots
+            as possible while preferring to keep assignments in the group and spreading work between objects
+        :param continuity_cost: (flow) Cost of assigning an object that wasn't in the same slot for the previous event
+            in the group
+        :param load_cost: (flow) Cost per event already in the object's schedule
+        :param workers: Assign independent partitions of the events (see parallel.partition) in this many processes.
+            The result is the same as a serial run
+        :param stats: Collect timings and counters of each run into this (see stats.AssignerStats), off by default
+        :param order: (greedy) Order to try candidates in, see ordering.ORDERS. Any order but "pool" also fills an
+            event's most constrained slots (fewest eligible objects) first. With workers, least_loaded and
+            fewest_eligible only see the events of the partition being assigned
+        :param repair_iterations: After the main pass, try filling the slots it left empty by moving up to this many
+            already assigned objects around (see augment.augment), 0 to skip unless repair_seconds is set
+        :param repair_seconds: Stop the repair pass after this long. Set on its own, the pass runs with no iteration
+            limit until then
+        :param repair_depth: Longest chain of moves to fill one slot
+        :param registry: Registry the models are in (see registry.Registry), activated while the Assigner's methods run.
+            None uses whichever registry is active when they are called
+        :param storage: Store the assignments and scheduled counts of every assign_events run in this (see
+            storage.SQLiteStorage)
+        """
+
+        if strategy not in self.strategies:
+            raise ValueError(f"Unknown strategy: {strategy}, expected one of {self.strategies}")
+        if order not in ORDERS:
+            raise ValueError(f"Unknown candidate order: {order}, expected one of {ORDERS}")
+
+        self.strategy = strategy
+        self.continuity_cost = continuity_cost
+        self.load_cost = load_cost
+        self.workers = workers
+        self.stats = stats
+        self.order = order
+        self.repair_iterations = repair_iterations
+        self.repair_seconds = repair_seconds
+        self.repair_depth = repair_depth
+        self.registry = registry
+        self.storage = storage
+
+        self.pools: dict[Type[AssignmentObject], CandidatePool] = {}
+        self.ordering: CandidateOrder | None = None  # Of the current run
+
+    @scoped
     def assign_events(self, event_class: Type[Event], events: list[Event] = None, exclude_slots: list[AssignmentSlot | AssignmentGroup] = None):
+        """
+        :return: The Assigner's stats (None unless it was given some)
+        """
+
         if events is None:
             events = event_class.objects.all()
 
-        scheduled_count = {}  # slot: amount
+        # Events and objects may have changed since the last run
+        AssignmentRule.clear_caches()
+        self.pools = {}
+        self.start_ordering(events)
+
+        scheduled_count = {}  # {slot name: objects assigned}
+        if self.workers and self.workers > 1:
+            assign_parallel(self, events, self.workers, scheduled_count)
+        else:
+            self.assign_serial(events, scheduled_count)
+
+        if self.repair_iterations or self.repair_seconds is not None:
+            started = perf_counter()
+            filled = augment(self, events, self.repair_depth, self.repair_iterations or None, self.repair_seconds,
+                             scheduled_count)
+            if filled:
+                print(f"Filled {filled} more slots by moving assignments")
+            if self.stats is not None:
+                self.stats.seconds["repair"] += perf_counter() - started
+
+        for slot_name, amount in scheduled_count.items():
+            print(f"Scheduled {amount} {slot_name}s")
+
+        if self.storage is not None:
+            self.storage.save_assignments(events, scheduled_count)
+
+        return self.stats
+
+    @scoped
+    def assign_serial(self, events: list[Event], scheduled_count: dict):
+        if self.strategy == "flow":
+            for window in self.conflict_windows(events):
+                self.assign_window(window, scheduled_count)
+        else:
+            for event in events:
+                for group in event.assignment_groups:
+                    self.assign_group(event, group, scheduled_count)
+
+    @scoped
+    def assign_stream(self, events: Iterable[Event], horizon: timedelta = None):
+        """
+        Assign events as they arrive (e.x. read from a file) and yield each one once it is assigned. Events that ended
+        more than `horizon` before the latest one started can't conflict with anything still to come, so they are
+        retired (see retire) and memory stays bounded however long the stream is. Objects are snapshotted when the
+        first event needing them arrives. Greedy assigns the same as assign_events, the flow strategy's load cost only
+        counts events that haven't been retired.
+
+        :param events: Events in start time order
+        :param horizon: How long a finished event can still block an object, defaults to the longest
+            assignment_buffer (or travel time, or workload limit reach) seen so far (pass it if later events can have
+            longer buffers)
+        :return: Generator of the assigned events
+        """
+
+        AssignmentRule.clear_caches()
+        self.pools = {}
+        self.start_ordering([])
+
+        active = []  # Heap of (end time, arrival, event) not retired yet
+        held = {}  # {stay in group EventGroup: its latest event, finished but kept for continuity}
+        latest = {}  # {stay in group EventGroup: the last of its events this stream assigned}
+        arrivals = itertools.count()
+        longest_buffer = timedelta(0)
+
+        if self.strategy == "flow":
+            batches = self.conflict_windows(self._in_start_order(events), presorted=True)
+        else:
+            batches = ([event] for event in self._in_start_order(events))
+
+        for batch in batches:
+            for event in batch:
+                for group in event.assignment_groups:
+                    longest_buffer = max(longest_buffer, group.longest_buffer)
+                    for slot in group.slots:
+                        for limit in slot.object_to_assign.workload_limits:
+                            longest_buffer = max(longest_buffer, limit.reach)
+
+            # Retire what can't conflict with this batch (or anything after it) anymore
+            cutoff = batch[0].start_time - (horizon if horizon is not None else longest_buffer)
+            retired = []
+            while active and active[0][0] <= cutoff:
+                old = heapq.heappop(active)[2]
+                stay_in_group = self.get_stay_in_group(old)
+                # The group's next event may already be registered, but until the stream gets to it this one is
+                # still what it continues from
+                if stay_in_group is not None and latest.get(stay_in_group) is old:
+                    held[stay_in_group] = old
+                else:
+                    retired.append(old)
+
+            if self.strategy == "flow":
+                self.assign_window(batch, {})
+            else:
+                for group in batch[0].assignment_groups:
+                    self.assign_group(batch[0], group, {})
+
+            for event in batch:
+                stay_in_group = self.get_stay_in_group(event)
+                if stay_in_group in held:
+                    retired.append(held.pop(stay_in_group))  # Continuity copied from it, no longer needed
+                if stay_in_group is not None:
+                    latest[stay_in_group] = event
+                heapq.heappush(active, (event.end_time, next(arrivals), event))
+
+            for old in retired:
+                self.retire(old)
+
+            yield from batch
+
+    @staticmethod
+    def _in_start_order(events: Iterable[Event]):
+        last = None
         for event in events:
-            for group in event.assignment_groups:
-                self.assign_group(event, group, scheduled_count)
+            if last is not None and event.start_time < last.start_time:
+                raise ValueError(f"Event {event.event_id} starts before {last.event_id}, streamed events have to be "
+                                 f"in start time order")
+            last = event
+            yield event
 
-        for slot, amount in scheduled_count:
-            print(f"Scheduled {amount} {slot.name}s")
-            # records.save_flights_to_db()
+    @staticmethod
+    def retire(event: Event):
+        """
+        Forget a finished event: take it out of its objects' schedules, its EventGroups and its class's registry. Its
+        own assignments are left as they are.
+        """
 
-    def assign_group(self, event: Event, assignment_group: AssignmentGroup, scheduled_count: dict):
-        event_type = type(event)
+        for assignment_group in event.assignment_groups:
+            for slot in assignment_group.slots:
+                for obj in slot.assigned_objects:
+                    if obj is not None:
+                        obj.schedule.discard(event)
+                slot.rule.clear_cache()  # Memoized per (event, object)
 
+        for group in event.groups:
+            group.remove_event(event)
+        if type(event)._instances.get(event.event_id) is event:
+            type(event).objects.unregister(event.event_id)
+
+    def get_pool(self, object_class: Type[AssignmentObject]):
+        pool = self.pools.get(object_class)
+        if pool is not None and pool.stale:  # Pools outlive the run for reschedule / withdraw / repair
+            self.drop_pool(pool)
+            pool = None
+        if pool is None:
+            pool = self.pools[object_class] = CandidatePool(object_class)
+        return pool
+
+    def drop_pool(self, pool: CandidatePool):
+        del self.pools[pool.object_class]
+        if self.ordering is not None:
+            self.ordering.queues.pop(pool, None)
+            self.ordering.remaining.pop(pool, None)
+
+    def get_candidates(self, event: Event, slot: AssignmentSlot, available_only: bool = True):
+        """
+        Objects the slot's rule allows for this event that aren't booked at the time, the rest of can_be_assigned
+        still needs checking
+
+        :param available_only: Include objects that are booked at the time (e.x. to move them)
+        """
+
+        pool = self.get_pool(slot.object_to_assign)
+        mask = pool.eligible(slot.rule, event)
+        if self.stats is not None:
+            self.stats.prefiltered += len(pool.objects) - mask.bit_count()
+
+        if available_only:
+            eligible = mask
+            mask &= pool.available(event, slot.group.shortest_buffer(event) if slot.group else timedelta(0))
+            if self.stats is not None:
+                booked = eligible & ~mask
+                self.stats.booked += booked.bit_count()
+                if slot.group is not None:
+                    for obj in pool.iter(booked):  # Counted under the reason can_be_assigned would have refused them for
+                        self.record_rejection(event, slot, slot.group, obj)
+
+        if self.ordering is None:
+            return pool.iter(mask)
+        return self.ordering.candidates(pool, mask, event, self.get_eligible,
+                                        slot.group.travel_times if slot.group else None)
+
+    def get_eligible(self, event: Event, slot: AssignmentSlot):
+        return self.get_pool(slot.object_to_assign).eligible(slot.rule, event)
+
+    def start_ordering(self, events: list[Event]):
+        self.ordering = CandidateOrder(self.order, events) if self.order != "pool" else None
+
+    @staticmethod
+    def get_stay_in_group(event: Event):
         stay_in_group = None  # TODO: Allow multiple
         for group in event.groups:
             if group.try_keep_assignments_in_group:
                 stay_in_group = group
 
-        if stay_in_group:
-            event_group_index = stay_in_group.get_events(event_type).index(event)
-            if event_group_index > 0:  # There was an event before this in the same group
-                # Try to copy over assignments for the last slot
-                prev: AssignmentGroup = stay_in_group.get_events(event_type)[event_group_index - 1].get_assignment_group(assignment_group)
-                for slot in prev.slots:
-                    if not slot.should_assign:
+        return stay_in_group
+
+    @staticmethod
+    def get_previous_assignment_group(event: Event, assignment_group: AssignmentGroup):
+        """
+        Matching assignment group of the event before this one in its stay in group EventGroup
+        """
+
+        stay_in_group = Assigner.get_stay_in_group(event)
+        if stay_in_group is None:
+            return None
+
+        prev_event = stay_in_group.previous_event(event)
+        if prev_event is None:
+            return None
+
+        return prev_event.get_assignment_group(assignment_group)
+
+    def assign_group(self, event: Event, assignment_group: AssignmentGroup, scheduled_count: dict):
+        stats = self.stats
+        if stats is not None:
+            started = perf_counter()
+
+        prev: AssignmentGroup = self.get_previous_assignment_group(event, assignment_group)
+        if prev is not None:  # There was an event before this in the same group
+            # Try to copy over assignments for the last slot
+            for slot in prev.slots:
+                if slot.assigned_objects:
+                    this_slot: AssignmentSlot = assignment_group.get_slot(slot.name)
+                    if not this_slot.should_assign:
                         continue
 
-                    if slot.assigned_objects:
-                        this_slot: AssignmentSlot = assignment_group.slots[assignment_group.slots_names.index(slot.name)]
-                        for obj in slot.assigned_objects:
-                            if obj.can_be_assigned(event, this_slot, assignment_group):
-                                this_slot.assigned_objects.append(obj)
-                                obj.schedule.append(event)
+                    for obj in slot.assigned_objects:
+                        if len(this_slot.assigned_objects) >= this_slot.amount:
+                            break
+
+                        if obj.can_be_assigned(event, this_slot, assignment_group):
+                            this_slot.assigned_objects.append(obj)
+                            obj.schedule.append(event)
+                            scheduled_count[this_slot.name] = scheduled_count.get(this_slot.name, 0) + 1
+                            if stats is not None:
+                                stats.assigned_object(event, this_slot, obj)
+                        elif stats is not None:
+                            self.record_rejection(event, this_slot, assignment_group, obj)
+
+        if stats is not None:
+            now = perf_counter()
+            stats.seconds["continuity"] += now - started
+            phase_started = now
 
         needed_slots = assignment_group.get_needed_assignments()
+        if self.ordering is not None:  # Most constrained first
+            needed_slots.sort(key=lambda slot: self.get_eligible(event, slot).bit_count())
+
+        if stats is not None:
+            now = perf_counter()
+            stats.seconds["needed"] += now - phase_started
+            phase_started = now
+
         slot: AssignmentSlot
         for slot in needed_slots:
             if not slot.should_assign:
@@ -52,15 +335,223 @@ class Assigner:
 
             assigned = False
 
-            for obj in slot.object_to_assign.objects.all():
+            for obj in self.get_candidates(event, slot):
                 if obj.can_be_assigned(event, slot, assignment_group):
                     slot.assigned_objects.append(obj)
                     obj.schedule.append(event)
+                    scheduled_count[slot.name] = scheduled_count.get(slot.name, 0) + 1
+                    if stats is not None:
+                        stats.assigned_object(event, slot, obj)
                     assigned = True
                     break
+                elif stats is not None:
+                    self.record_rejection(event, slot, assignment_group, obj)
 
             if not assigned:
                 print(f"[ERR] Could not assign {slot.name} for event {event.event_id}")
+                if stats is not None:
+                    stats.unassigned_slot(event, slot)
+
+        if stats is not None:
+            now = perf_counter()
+            stats.seconds["candidates"] += now - phase_started
+            stats.add_group_time(self.get_stay_in_group(event), now - started)
+
+        if self.ordering is not None:
+            for slot in assignment_group.slots:
+                self.ordering.slot_done(self.get_pool(slot.object_to_assign), self.get_eligible(event, slot),
+                                        slot.amount)
 
-        # Increment counter
         return True
+
+    def record_rejection(self, event: Event, slot: AssignmentSlot, assignment_group: AssignmentGroup,
+                         obj: AssignmentObject):
+        self.stats.rejected(event, slot, obj, obj.rejection_reason(event, slot, assignment_group) or "other")
+
+    @staticmethod
+    def conflict_windows(events: Iterable[Event], presorted: bool = False):
+        """
+        Split events (in start time order) into windows where every event conflicts with every other event in the
+        window, meaning an object can fill at most one slot per window
+
+        :param presorted: The events are already in start time order, consume them lazily instead of sorting
+        """
+
+        window = []
+        window_end = None
+        for event in events if presorted else sorted(events, key=lambda e: e.start_time):
+            if window and event.start_time >= window_end:
+                yield window
+                window = []
+
+            buffers = [group.longest_buffer for group in event.assignment_groups]
+            end = event.end_time + max(buffers) if buffers else event.end_time
+            window_end = end if not window else min(window_end, end)
+            window.append(event)
+
+        if window:
+            yield window
+
+    def assign_window(self, events: list[Event], scheduled_count: dict):
+        """
+        Assign a window of conflicting events with min-cost max-flow:
+        source -> (event, slot) with capacity of the needed amount -> object that can be assigned -> sink with capacity 1
+        """
+
+        stats = self.stats
+        if stats is not None:
+            started = perf_counter()
+
+        solver = MinCostFlow()
+        source = solver.add_node()
+        sink = solver.add_node()
+        object_nodes = {}  # {obj: node}
+        slot_nodes = []  # (event, assignment group, slot, needed, [(obj, edge), ...])
+
+        for event in events:
+            for assignment_group in event.assignment_groups:
+                needed = {}
+                for slot in assignment_group.get_needed_assignments():
+                    needed[slot] = needed.get(slot, 0) + 1
+
+                if not needed:
+                    continue
+
+                prev = self.get_previous_assignment_group(event, assignment_group)
+                for slot, amount in needed.items():
+                    node = solver.add_node()
+                    solver.add_edge(source, node, amount)
+
+                    kept = set()
+                    if prev is not None and prev.get_slot(slot.name) is not None:
+                        kept = set(prev[slot.name])
+
+                    edges = []
+                    for obj in self.get_candidates(event, slot):
+                        if not obj.can_be_assigned(event, slot, assignment_group):
+                            if stats is not None:
+                                self.record_rejection(event, slot, assignment_group, obj)
+                            continue
+
+                        if obj not in object_nodes:
+                            object_nodes[obj] = solver.add_node()
+                            solver.add_edge(object_nodes[obj], sink, 1)
+
+                        cost = (0 if obj in kept else self.continuity_cost) + self.load_cost * len(obj.schedule)
+                        edges.append((obj, solver.add_edge(node, object_nodes[obj], 1, cost)))
+
+                    slot_nodes.append((event, assignment_group, slot, amount, edges))
+
+        if stats is not None:
+            solve_started = perf_counter()
+            stats.seconds["flow_build"] += solve_started - started
+
+        solver.solve(source, sink)
+
+        if stats is not None:
+            stats.seconds["flow_solve"] += perf_counter() - solve_started
+
+        for event, assignment_group, slot, amount, edges in slot_nodes:
+            assigned = 0
+            for obj, edge in edges:
+                if edge[1] == 0 and obj.can_be_assigned(event, slot, assignment_group):
+                    slot.assigned_objects.append(obj)
+                    obj.schedule.append(event)
+                    assigned += 1
+                    scheduled_count[slot.name] = scheduled_count.get(slot.name, 0) + 1
+                    if stats is not None:
+                        stats.assigned_object(event, slot, obj)
+
+            for i in range(amount - assigned):
+                print(f"[ERR] Could not assign {slot.name} for event {event.event_id}")
+                if stats is not None:
+                    stats.unassigned_slot(event, slot)
+
+    @scoped
+    def release(self, event: Event):
+        """
+        Unassign every object from the event
+        """
+
+        for assignment_group in event.assignment_groups:
+            for slot in assignment_group.slots:
+                for obj in slot.assigned_objects:
+                    if obj is not None:
+                        obj.schedule.discard(event)
+            assignment_group.clear()
+
+    @staticmethod
+    def snapshot(event: Event):
+        return [[list(slot.assigned_objects) for slot in group.slots] for group in event.assignment_groups]
+
+    @scoped
+    def repair(self, event: Event):
+        """
+        Assign the event again, then walk forward through its stay in group EventGroup re-assigning following events
+        until one comes out the same as before (continuity copies from the previous event, so changes ripple forward)
+
+        :return: Events whose assignments changed
+        """
+
+        changed = []
+        stay_in_group = self.get_stay_in_group(event)
+        while event is not None:
+            before = self.snapshot(event)
+            self.release(event)
+            self.assign_serial([event], {})
+
+            if self.snapshot(event) == before and changed:
+                break
+
+            changed.append(event)
+            event = stay_in_group.next_event(event) if stay_in_group else None
+
+        return changed
+
+    @scoped
+    def reschedule(self, event: Event, new_start: datetime):
+        """
+        Move an event and repair the assignments that depend on it: the event itself, and the events after its old and
+        new position in its stay in group EventGroup
+
+        :return: Events whose assignments changed
+        """
+
+        stay_in_group = self.get_stay_in_group(event)
+        old_next = stay_in_group.next_event(event) if stay_in_group else None
+
+        self.release(event)
+        event.start_time = new_start
+        for assignment_group in event.assignment_groups:
+            for slot in assignment_group.slots:
+                slot.rule.clear_cache()
+                slot.should_assign_rule.clear_cache()
+
+        changed = self.repair(event)
+        if old_next is not None and old_next not in changed:
+            changed += [e for e in self.repair(old_next) if not any(e is c for c in changed)]
+
+        return changed
+
+    @scoped
+    def withdraw(self, obj: AssignmentObject, start: datetime, end: datetime):
+        """
+        Make the object unavailable between start and end, and fill the slots it had in that window with someone else
+
+        :return: Events whose assignments changed
+        """
+
+        obj.add_blackout(start, end)
+
+        changed = []
+        for event in obj.schedule.overlapping(start, end):
+            if event in changed:
+                continue
+
+            for assignment_group in event.assignment_groups:
+                assignment_group.unassign(obj)
+            obj.schedule.remove(event)
+
+            changed += [e for e in self.repair(event) if e not in changed]
+
+        return changed
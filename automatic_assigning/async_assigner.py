@@ -0,0 +1,90 @@
+import asyncio
+from typing import Protocol
+
+from .assigner import Assigner
+from .models import AssignmentRule, Event
+from .registry import scoped
+
+
+class AsyncSource(Protocol):
+    async def next_window(self) -> list[Event] | None:
+        """
+        :return: The next events to assign, in start time order, or None when there are no more
+        """
+
+    async def load_objects(self, events: list[Event]) -> None:
+        """
+        Load the objects (and their availability) that the events' slots can be filled with, if they aren't loaded yet
+        (e.x. one batched query per object class)
+        """
+
+
+class AsyncSink(Protocol):
+    async def write(self, events: list[Event]) -> None:
+        """
+        Store the assignments of a batch of assigned events
+        """
+
+
+class AsyncAssigner(Assigner):
+    @scoped
+    async def assign_events_async(self, source: AsyncSource, sink: AsyncSink = None, batch_size: int = 100):
+        """
+        Assign events window by window from an async source. The next window (and its objects) is fetched while the
+        current one is being assigned, and assigned events are written to the sink in batches while assigning goes on.
+
+        Assigning runs on the event loop thread, handing control back to the loop after each event (each conflict
+        window with the flow strategy) so the fetch and the writes can make progress in between, and the source and
+        sink never run at the same time as the assigner touches the models. The source and sink run with the Assigner's registry
+        active, so the models they create are registered in it.
+
+        :param batch_size: Write to the sink once at least this many events are assigned, at most one write is in
+            flight at a time
+        :return: The Assigner's stats (None unless it was given some)
+        """
+
+        AssignmentRule.clear_caches()
+        self.pools = {}
+        self.start_ordering([])
+
+        fetch = asyncio.ensure_future(self._fetch(source))
+        flush = None
+        pending = []
+        try:
+            while True:
+                window = await fetch
+                if window is None:
+                    break
+
+                fetch = asyncio.ensure_future(self._fetch(source))  # Prefetch while this window is assigned
+
+                steps = self.conflict_windows(window) if self.strategy == "flow" else ([event] for event in window)
+                for step in steps:
+                    self.assign_serial(step, {})
+                    await asyncio.sleep(0)
+
+                pending += window
+                if sink is not None and len(pending) >= batch_size:
+                    if flush is not None:
+                        await flush
+                    flush = asyncio.ensure_future(sink.write(pending))
+                    pending = []
+
+            if sink is not None and pending:
+                if flush is not None:
+                    await flush
+                flush = asyncio.ensure_future(sink.write(pending))
+            if flush is not None:
+                await flush
+        finally:
+            if not fetch.done():
+                fetch.cancel()
+
+        return self.stats
+
+    @staticmethod
+    async def _fetch(source: AsyncSource):
+        window = await source.next_window()
+        if window is not None:
+            await source.load_objects(window)
+        return window
@@ -0,0 +1,130 @@
+import math
+from time import perf_counter
+
+
+class Budget:
+    def __init__(self, iterations: int = None, seconds: float = None):
+        """
+        :param iterations: Steps allowed, None for no limit (only the time)
+        """
+
+        self.iterations = iterations if iterations is not None else math.inf
+        self.deadline = perf_counter() + seconds if seconds is not None else None
+
+    def spend(self):
+        """
+        :return: If there was budget left for one more step
+        """
+
+        if self.iterations <= 0:
+            return False
+        if self.deadline is not None and perf_counter() >= self.deadline:
+            self.iterations = 0
+            return False
+
+        self.iterations -= 1
+        return True
+
+
+def augment(assigner, events: list, max_depth: int = 3, iterations: int | None = 10000, seconds: float = None,
+            scheduled_count: dict = None):
+    """
+    Try to fill the slots the main pass left empty by reshuffling earlier assignments: an object that can't take the
+    slot only because one other event it is assigned to is in the way gets moved over, and that event's slot is filled
+    the same way in turn (an augmenting path / ejection chain, at most `max_depth` moves long). A chain that doesn't end
+    in a filled slot is undone, so every check can_be_assigned makes (overlaps, buffers, rules) still holds.
+
+    :param iterations: Most objects to try moving, across all slots (None for no limit, then only `seconds` stops it)
+    :param seconds: Stop trying after this long
+    :param scheduled_count: {slot name: objects assigned} to add the filled places to. A chain moves objects between
+        slots it refills, so only the slot it started from gains one
+    :return: Number of slot places filled
+    """
+
+    budget = Budget(iterations, seconds)
+    filled = 0
+    for event in events:
+        for group in event.assignment_groups:
+            for slot in group.get_needed_assignments():
+                if budget.iterations <= 0:
+                    return filled
+                if _fill(assigner, event, group, slot, max_depth, budget, frozenset()):
+                    filled += 1
+                    if scheduled_count is not None:
+                        scheduled_count[slot.name] = scheduled_count.get(slot.name, 0) + 1
+                    if assigner.stats is not None:
+                        assigner.stats.repaired += 1
+
+    return filled
+
+
+def _fits(obj, event, group, slot):
+    """
+    can_be_assigned, plus the buffer before the object's next event (the main pass assigns in time order, so it never
+    has to look forward)
+    """
+
+    if not obj.can_be_assigned(event, slot, group):
+        return False
+
+    later = obj.schedule.following(event.end_time)
+    if later is not None:
+        for later_group in later.assignment_groups:
+            if later_group.find_assigned_object(obj) is not None and \
+                    later.start_time < event.end_time + later_group.buffer_between(event, later):
+                return False
+
+    return True
+
+
+def _fill(assigner, event, group, slot, depth: int, budget: Budget, chain: frozenset):
+    candidates = list(assigner.get_candidates(event, slot, available_only=False))
+    for obj in candidates:
+        if _fits(obj, event, group, slot):
+            slot.assigned_objects.append(obj)
+            obj.schedule.append(event)
+            return True
+
+    if depth <= 0:
+        return False
+
+    chain = chain | {(event, slot)}
+    buffer = group.longest_buffer
+    for obj in candidates:
+        if not budget.spend():
+            return False
+        if group.find_assigned_object(obj) is not None:
+            continue
+
+        # Only objects kept out by a single other event can be moved
+        blockers = obj.schedule.overlapping(event.start_time - buffer, event.end_time + buffer)
+        if len(blockers) != 1:
+            continue
+
+        blocker = blockers[0]
+        for blocker_group in blocker.assignment_groups:
+            blocker_slot = blocker_group.find_assigned_object(obj)
+            if blocker_slot is not None:
+                break
+        else:
+            continue
+        if (blocker, blocker_slot) in chain:
+            continue
+
+        index = blocker_slot.assigned_objects.index(obj)
+        del blocker_slot.assigned_objects[index]
+        obj.schedule.remove(blocker)
+
+        if _fits(obj, event, group, slot):
+            slot.assigned_objects.append(obj)
+            obj.schedule.append(event)
+            if _fill(assigner, blocker, blocker_group, blocker_slot, depth - 1, budget, chain):
+                return True
+
+            slot.assigned_objects.remove(obj)
+            obj.schedule.remove(event)
+
+        blocker_slot.assigned_objects.insert(index, obj)
+        obj.schedule.append(blocker)
+
+    return False
@@ -0,0 +1,144 @@
+from datetime import datetime, time, timedelta
+
+from .scenario import active_scenario
+
+EPOCH = datetime(2000, 1, 3)  # A Monday, weekly patterns start here
+WEEK = timedelta(days=7)
+
+
+class AwareDatetimeError(ValueError):
+    def __init__(self, value: datetime):
+        super().__init__(f"Times are bucketed as naive datetimes (one local time), got a timezone-aware one: {value}")
+
+
+class Availability:
+    def __init__(self, bucket: timedelta = timedelta(minutes=5)):
+        """
+        When an object can and can't be assigned, kept as bitsets over fixed time buckets so checking an event is a
+        couple of shifts and masks no matter how many windows were added.
+
+        - One-off windows and blackouts are bitsets starting at `origin` (the earliest bucket used so far)
+        - Weekly windows are a bitset over one week, repeated
+
+        :param bucket: Size of a bucket. Blackouts (and the events checked) are widened to whole buckets, available
+            windows are narrowed to them, so rounding never makes an object look available when it isn't
+        """
+
+        self.bucket = bucket
+        self.week_buckets = WEEK // bucket
+
+        self.origin = None  # Bucket number of bit 0 in `available` and `blocked`
+        self.available = 0
+        self.blocked = 0
+        self.weekly = 0
+        self._weekly_twice = 0  # Two weeks of the weekly pattern, so ranges that wrap around can be read in one shift
+
+    def _range(self, start: datetime, end: datetime, inward: bool = False):
+        """
+        :return: Buckets (lo, hi) covering the range, or only the ones inside it if `inward`. A zero-duration range
+            is inside no bucket, but covered by the one it falls in
+        """
+
+        if end < start:
+            raise ValueError(f"Availability window ends before it starts: {start} - {end}")
+
+        try:
+            if inward:
+                return -((EPOCH - start) // self.bucket), (end - EPOCH) // self.bucket
+            lo = (start - EPOCH) // self.bucket
+            return lo, max(-((EPOCH - end) // self.bucket), lo + 1)
+        except TypeError:
+            raise AwareDatetimeError(start if start.tzinfo is not None else end) from None
+
+    def _touch(self):
+        scenario = active_scenario()
+        if scenario is not None:
+            scenario.touch_state(self)
+
+    def _mark(self, attr: str, start: datetime, end: datetime):
+        self._touch()
+        lo, hi = self._range(start, end, inward=attr == "available")
+        if hi <= lo:
+            return  # Window shorter than a bucket
+        if self.origin is None:
+            self.origin = lo
+        elif lo < self.origin:
+            shift = self.origin - lo
+            self.available <<= shift
+            self.blocked <<= shift
+            self.origin = lo
+
+        bits = ((1 << (hi - lo)) - 1) << (lo - self.origin)
+        setattr(self, attr, getattr(self, attr) | bits)
+
+    def add_window(self, start: datetime, end: datetime):
+        self._mark("available", start, end)
+
+    def add_blackout(self, start: datetime, end: datetime):
+        self._mark("blocked", start, end)
+
+    def add_weekly(self, weekday: int, start: time, end: time):
+        """
+        :param weekday: 0 is Monday (like datetime.weekday())
+        :param start: Time of day the window starts
+        :param end: Time of day the window ends, at or before start means it runs past midnight
+        """
+
+        day = EPOCH + timedelta(days=weekday)
+        start_dt = datetime.combine(day.date(), start)
+        end_dt = datetime.combine(day.date(), end)
+        if end_dt <= start_dt:
+            end_dt += timedelta(days=1)
+
+        self._touch()
+        lo, hi = self._range(start_dt, end_dt, inward=True)
+        for bucket in range(lo, hi):
+            self.weekly |= 1 << (bucket % self.week_buckets)
+        self._weekly_twice = self.weekly | (self.weekly << self.week_buckets)
+
+    def add(self, entry):
+        """
+        Add an entry from AssignmentObject(availability=[...]):
+        (start: datetime, end: datetime) for a one-off window or (weekday: int, start: time, end: time) for a weekly one
+        """
+
+        if len(entry) == 3:
+            self.add_weekly(*entry)
+        else:
+            self.add_window(*entry)
+
+    def check(self, start: datetime, end: datetime):
+        """
+        :return: False if any of the range is blacked out, True if all of it is inside windows, None otherwise
+        """
+
+        if self.origin is None and not self.weekly:
+            return None
+
+        lo, hi = self._range(start, end)
+        mask = (1 << (hi - lo)) - 1
+
+        if self.origin is not None:
+            offset = lo - self.origin
+            if offset >= 0:
+                if (self.blocked >> offset) & mask:
+                    return False
+                covered = (self.available >> offset) & mask
+            else:
+                if (self.blocked << -offset) & mask:
+                    return False
+                covered = (self.available << -offset) & mask
+        else:
+            covered = 0
+
+        if self.weekly and covered != mask:
+            if hi - lo >= self.week_buckets:
+                weekly = mask if self.weekly == (1 << self.week_buckets) - 1 else 0
+            else:
+                weekly = (self._weekly_twice >> (lo % self.week_buckets)) & mask
+            covered |= weekly
+
+        return True if covered == mask else None
+
+    def __bool__(self):
+        return self.origin is not None or bool(self.weekly)
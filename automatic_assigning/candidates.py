@@ -0,0 +1,142 @@
+from datetime import datetime, timedelta
+from typing import Type
+
+from .availability import EPOCH, AwareDatetimeError
+from .models import AssignmentObject, AssignmentRule, Event
+
+
+class CandidatePool:
+    def __init__(self, object_class: Type[AssignmentObject], objects: list[AssignmentObject] = None,
+                 bucket: timedelta = timedelta(minutes=5)):
+        """
+        Objects of one type that can fill slots, with each object's eligibility under a rule precomputed as a bitset
+        (bit i is objects[i]) so the assigner only has to look at objects the slot's rule allows.
+
+        Pure rules only depend on the object and the event attributes they read, so the bitset is computed once per
+        rule and distinct values of those attributes (e.x. once per age group) rather than once per event.
+
+        Bookings are indexed the other way around too: for each time bucket, a bitset of the objects with an event
+        covering the whole bucket, kept up to date by watching the objects' schedules. available() turns that into
+        the objects that are free for an event in one pass over the event's buckets.
+
+        :param object_class: Type of object in the pool
+        :param objects: Objects in the pool, defaults to a snapshot of object_class.objects.all()
+        :param bucket: Size of the booking buckets, bookings that don't line up with them are left for
+            can_be_assigned to catch
+        """
+
+        self.object_class = object_class
+        self.objects: list[AssignmentObject] = object_class.objects.all() if objects is None else list(objects)
+        # (manager, version) the objects were taken from, None if they were given
+        self.registered = (object_class.objects, object_class.objects.version) if objects is None else None
+        self.positions = {obj: i for i, obj in enumerate(self.objects)}
+        self.everyone = (1 << len(self.objects)) - 1
+
+        self._eligible = {}  # {(compiled rule, event key): bitset}
+
+        self.bucket = bucket
+        self.booked: dict[int, int] = {}  # {bucket number since EPOCH: bitset}
+        for i, obj in enumerate(self.objects):
+            obj.schedule.watch(self, i)
+            for event in obj.schedule:
+                self._book(i, event.start_time, event.end_time)
+
+    @property
+    def stale(self):
+        """
+        If objects were registered or unregistered since the pool took them from the registry
+        """
+
+        if self.registered is None:
+            return False
+        manager, version = self.registered
+        return self.object_class.objects is not manager or manager.version != version
+
+    def eligible(self, rule: AssignmentRule, event: Event):
+        """
+        :return: Bitset of objects the rule allows for this event
+        """
+
+        compiled = rule.compiled
+        if not compiled.pure:
+            return self.everyone  # Has to be checked as objects are assigned
+        if compiled.constant:
+            return self.everyone if compiled.predicate(event, None) else 0
+
+        try:
+            key = (compiled, compiled.event_key(event))
+            return self._eligible[key]
+        except KeyError:
+            pass
+        except TypeError:  # Unhashable attribute values
+            return self._compute(rule, event)
+
+        res = self._eligible[key] = self._compute(rule, event)
+        return res
+
+    def _compute(self, rule: AssignmentRule, event: Event):
+        if not rule.compiled.reads_obj:
+            return self.everyone if rule.compiled.predicate(event, None) else 0
+
+        predicate = rule.compiled.predicate
+        mask = 0
+        for i, obj in enumerate(self.objects):
+            if predicate(event, obj):
+                mask |= 1 << i
+        return mask
+
+    def _book(self, i: int, start: datetime, end: datetime):
+        bit = 1 << i
+        booked = self.booked
+        try:
+            buckets = range(-((EPOCH - start) // self.bucket), (end - EPOCH) // self.bucket)  # Whole buckets only
+        except TypeError:
+            raise AwareDatetimeError(start) from None
+        for b in buckets:
+            booked[b] = booked.get(b, 0) | bit
+
+    def schedule_changed(self, i: int, start: datetime, end: datetime, added: bool):
+        if added:
+            self._book(i, start, end)
+            return
+
+        # Clear every bucket the removed event may have touched, then book what is still scheduled there again
+        keep = ~(1 << i)
+        booked = self.booked
+        for b in range((start - EPOCH) // self.bucket, -((EPOCH - end) // self.bucket)):
+            if b in booked:
+                booked[b] &= keep
+                if not booked[b]:
+                    del booked[b]
+
+        for event in self.objects[i].schedule.overlapping(start, end):
+            self._book(i, event.start_time, event.end_time)
+
+    def available(self, event: Event, buffer: timedelta = timedelta(0)):
+        """
+        :return: Bitset of objects with nothing booked in the event's time (or `buffer` before it). Bookings that
+            don't line up with the buckets may be missed, so this is a filter before can_be_assigned, not a replacement
+        """
+
+        booked = self.booked
+        if not booked:
+            return self.everyone
+
+        busy = 0
+        for b in range((event.start_time - buffer - EPOCH) // self.bucket, -((EPOCH - event.end_time) // self.bucket)):
+            busy |= booked.get(b, 0)
+        return self.everyone & ~busy
+
+    def iter(self, mask: int):
+        """
+        Objects in the bitset, in pool order
+        """
+
+        objects = self.objects
+        while mask:
+            low = mask & -mask
+            yield objects[low.bit_length() - 1]
+            mask ^= low
+
+    def candidates(self, rule: AssignmentRule, event: Event):
+        return self.iter(self.eligible(rule, event))
@@ -0,0 +1,87 @@
+from heapq import heappop, heappush
+
+
+class MinCostFlow:
+    def __init__(self):
+        """
+        Min-cost max-flow solver (successive shortest paths with Dijkstra and node potentials).
+        Edge costs must be non-negative integers.
+        """
+
+        self.graph: list[list[list]] = []  # graph[node] = [[to, capacity, cost, reverse edge index], ...]
+
+    def add_node(self):
+        self.graph.append([])
+        return len(self.graph) - 1
+
+    def add_edge(self, frm: int, to: int, capacity: int, cost: int = 0):
+        """
+        :return: The edge, edge[1] is its remaining capacity once solved
+        """
+
+        edge = [to, capacity, cost, len(self.graph[to])]
+        self.graph[frm].append(edge)
+        self.graph[to].append([frm, 0, -cost, len(self.graph[frm]) - 1])
+        return edge
+
+    def solve(self, source: int, sink: int, max_flow: int = None):
+        """
+        Push as much flow as possible from source to sink at the lowest total cost
+
+        :return: (flow, cost)
+        """
+
+        n = len(self.graph)
+        potential = [0] * n
+        flow = 0
+        cost = 0
+
+        while max_flow is None or flow < max_flow:
+            dist = [None] * n
+            prev = [None] * n  # (node, edge index)
+            dist[source] = 0
+            queue = [(0, source)]
+
+            while queue:
+                d, node = heappop(queue)
+                if d > dist[node]:
+                    continue
+
+                for i, (to, capacity, edge_cost, _) in enumerate(self.graph[node]):
+                    if capacity <= 0:
+                        continue
+
+                    nd = d + edge_cost + potential[node] - potential[to]
+                    if dist[to] is None or nd < dist[to]:
+                        dist[to] = nd
+                        prev[to] = (node, i)
+                        heappush(queue, (nd, to))
+
+            if dist[sink] is None:
+                break
+
+            for node in range(n):
+                if dist[node] is not None:
+                    potential[node] += dist[node]
+
+            # Find the bottleneck of the path, then push it
+            push = None if max_flow is None else max_flow - flow
+            node = sink
+            while node != source:
+                frm, i = prev[node]
+                capacity = self.graph[frm][i][1]
+                push = capacity if push is None else min(push, capacity)
+                node = frm
+
+            node = sink
+            while node != source:
+                frm, i = prev[node]
+                edge = self.graph[frm][i]
+                edge[1] -= push
+                self.graph[node][edge[3]][1] += push
+                cost += push * edge[2]
+                node = frm
+
+            flow += push
+
+        return flow, cost
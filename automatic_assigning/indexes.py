@@ -0,0 +1,148 @@
+KNOWN_LOOKUPS = {"eq", "contains", "in"}
+
+
+def compile_lookup(key):
+    """
+    Split a filter key (e.x. "groups__contains", "event_type__name") into its attribute path and lookup once, so
+    it doesn't have to be re-parsed for every object
+    """
+
+    parts = key.split("__")
+
+    if len(parts) > 1 and parts[-1] in KNOWN_LOOKUPS:
+        *field_parts, lookup = parts
+    else:
+        field_parts = parts
+        lookup = "eq"
+
+    return tuple(field_parts), lookup
+
+
+def compile_resolver(path):
+    """
+    Compiled version of models.resolve_lookup for an already split attribute path
+    """
+
+    if len(path) == 1:
+        name = path[0]
+
+        def resolve(obj):
+            value = getattr(obj, name, None)
+            if callable(value):
+                value = value()
+            return value
+
+        return resolve
+
+    def resolve(obj):
+        for part in path:
+            obj = getattr(obj, part, None)
+            if obj is None:
+                return None
+            if callable(obj):
+                obj = obj()
+        return obj
+
+    return resolve
+
+
+def compile_matcher(resolve, lookup, value):
+    if lookup == "eq":
+        return lambda obj: resolve(obj) == value
+    elif lookup == "contains":
+        def contains(obj):
+            actual = resolve(obj)
+            return value in actual if actual else False
+        return contains
+    elif lookup == "in":
+        if not value:
+            return lambda obj: False
+        return lambda obj: resolve(obj) in value
+    else:
+        raise ValueError(f"Unsupported lookup: {lookup}")
+
+
+class Index:
+    lookups = set()
+
+    def __init__(self, field: str):
+        """
+        Base class for per-model field indexes. Declare them on the model:
+
+        class Game(Event):
+            indexes = (HashIndex("event_type"), InvertedIndex("groups"))
+
+        :param field: Attribute (or dotted path, e.x. "event_type.name") to index
+        """
+
+        self.field = field
+        self.path = tuple(field.split("."))
+        self.resolve = compile_resolver(self.path)
+
+        self._buckets = {}  # {key: {pk: instance}}
+        self._keys = {}  # {pk: keys the instance is stored under}
+
+    def copy(self):
+        return self.__class__(self.field)
+
+    def keys_for(self, obj):
+        raise NotImplementedError
+
+    def add(self, pk, obj):
+        keys = self.keys_for(obj)
+        self._keys[pk] = keys
+        for key in keys:
+            self._buckets.setdefault(key, {})[pk] = obj
+
+    def remove(self, pk):
+        for key in self._keys.pop(pk, ()):
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.pop(pk, None)
+                if not bucket:
+                    del self._buckets[key]
+
+    def clear(self):
+        self._buckets = {}
+        self._keys = {}
+
+    def bucket(self, key):
+        return self._buckets.get(key, {})
+
+    def lookup(self, lookup, value):
+        raise NotImplementedError
+
+
+class HashIndex(Index):
+    """
+    Index for `eq` and `in` lookups on hashable fields
+    """
+
+    lookups = {"eq", "in"}
+
+    def keys_for(self, obj):
+        return (self.resolve(obj),)
+
+    def lookup(self, lookup, value):
+        if lookup == "eq":
+            return self.bucket(value)
+
+        res = {}
+        for v in value or ():
+            res.update(self.bucket(v))
+        return res
+
+
+class InvertedIndex(Index):
+    """
+    Index for `contains` lookups on list fields (e.x. Event.groups)
+    """
+
+    lookups = {"contains"}
+
+    def keys_for(self, obj):
+        values = self.resolve(obj)
+        return tuple(dict.fromkeys(values)) if values else ()
+
+    def lookup(self, lookup, value):
+        return self.bucket(value)
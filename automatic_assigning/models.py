@@ -1,6 +1,13 @@
 from datetime import datetime, timedelta
 from typing import Type
 
+from .availability import Availability
+from .indexes import InvertedIndex, compile_lookup, compile_matcher, compile_resolver
+from .registry import active_registry
+from .scenario import active_scenario
+from .rules import compile_rule
+from .schedule import Schedule
+
 
 def resolve_lookup(obj, dotted_path):
     for part in dotted_path.split("."):
@@ -39,19 +46,192 @@ def matches(obj, key, value):
 
 
 _sentinel = object()
+_pk_index = object()
 class ModelObjectsManager:
     def __init__(self, model_cls):
+        """
+        Instances of a model class in one registry (see registry.Registry), get it through `model_cls.objects`
+        """
+
         self.model_cls = model_cls
+        self.instances = {}  # {pk: instance}
+        self.indexes = {index.field: index.copy() for index in model_cls.indexes}
+
+        self._queries = {}  # {(pk_field, filter keys): compiled terms}
+        self._last_pk = 0  # Auto-increment sequence
+        self.version = 0  # Bumped whenever instances are registered or unregistered (e.x. so pools know to rebuild)
+        self._pending = None  # Instances waiting to be registered by bulk_create
+        self._given_pks = None  # Iterator of the pks bulk_create was given
+        self.source = None  # Storage to load matching rows from before filtering (see storage.SQLiteStorage.attach)
 
     def all(self):
-        return list(self.model_cls._instances.values())
+        if self.source is not None:
+            self.source.load(self.model_cls)
+        return list(self.instances.values())
+
+    def next_pk(self):
+        scenario = active_scenario()
+        if scenario is not None:
+            scenario.touch_sequence(self)
+        if self._given_pks is not None:
+            pk = next(self._given_pks)
+            self._last_pk = max(self._last_pk, pk)
+            return pk
+
+        self._last_pk += 1
+        return self._last_pk
+
+    def reset_sequence(self, last_pk=0):
+        """
+        Restart auto-increment primary keys after `last_pk` (e.x. to seed fixtures with known pks)
+        """
+
+        scenario = active_scenario()
+        if scenario is not None:
+            scenario.touch_sequence(self)
+        self._last_pk = last_pk
+
+    def bulk_create(self, rows, pks=None):
+        """
+        Create many instances, registering them in a single pass once they are all built
+
+        :param rows: Arguments for each instance, either a tuple of positional arguments or a dict of keyword arguments
+        :param pks: (auto-increment primary keys) Primary keys to give the instances instead of the next ones in the
+            sequence (e.x. loaded from storage)
+        :return: The created instances
+        """
+
+        pending, self._pending = self._pending, []
+        given_pks, self._given_pks = self._given_pks, iter(pks) if pks is not None else None
+        try:
+            created = [self.model_cls(**row) if isinstance(row, dict) else self.model_cls(*row) for row in rows]
+            registering = self._pending
+        finally:
+            self._pending = pending
+            self._given_pks = given_pks
+
+        instances = self.instances
+        pks = {pk for pk, obj in registering}
+        if len(pks) < len(registering) or not pks.isdisjoint(instances):
+            # Some instances replace others, let register take care of unindexing them
+            for pk, obj in registering:
+                self.register(pk, obj)
+        else:
+            scenario = active_scenario()
+            if scenario is not None:
+                for pk in pks:
+                    scenario.touch_member(self, pk)
+            instances.update(registering)
+            self.version += 1
+            for index in self.indexes.values():
+                for pk, obj in registering:
+                    index.add(pk, obj)
+
+        return created
+
+    def register(self, pk, obj):
+        if self._pending is not None:
+            self._pending.append((pk, obj))
+            return
+
+        scenario = active_scenario()
+        if scenario is not None:
+            scenario.touch_member(self, pk)
+        if pk in self.instances:
+            self.unregister(pk)
+
+        self.instances[pk] = obj
+        self.version += 1
+        for index in self.indexes.values():
+            index.add(pk, obj)
+
+    def unregister(self, pk):
+        scenario = active_scenario()
+        if scenario is not None:
+            scenario.touch_member(self, pk)
+        self.instances.pop(pk, None)
+        self.version += 1
+        for index in self.indexes.values():
+            index.remove(pk)
+
+    def clear(self):
+        scenario = active_scenario()
+        if scenario is not None:
+            scenario.touch_sequence(self)
+            for pk in self.instances:
+                scenario.touch_member(self, pk)
+        self.instances.clear()
+        self.version += 1
+        self._last_pk = 0
+        for index in self.indexes.values():
+            index.clear()
+
+    def reindex(self, obj):
+        """
+        Update the indexes after an indexed field was changed in place (e.x. `event.groups.append(group)`).
+        Assigning the attribute reindexes automatically.
+        """
+
+        obj._changed_in_place()
+        pk = getattr(obj, self.model_cls.pk_field or "pk", None)
+        if self.instances.get(pk) is not obj:
+            return  # Not registered (yet)
+
+        for index in self.indexes.values():
+            index.remove(pk)
+            index.add(pk, obj)
+
+    def _compile(self, keys):
+        cache_key = (self.model_cls.pk_field, keys)
+        terms = self._queries.get(cache_key)
+        if terms is None:
+            terms = []
+            for key in keys:
+                path, lookup = compile_lookup(key)
+                field = ".".join(path)
+
+                if lookup == "eq" and field == self.model_cls.pk_field:
+                    index = _pk_index
+                else:
+                    index = self.indexes.get(field)
+                    if index is not None and lookup not in index.lookups:
+                        index = None
+
+                terms.append((key, compile_resolver(path), lookup, index))
+
+            self._queries[cache_key] = terms
+
+        return terms
 
     def filter(self, **kwargs):
-        results = []
-        for obj in self.all():
-            if all(matches(obj, k, v) for k, v in kwargs.items()):
-                results.append(obj)
-        return results
+        if self.source is not None:
+            self.source.load(self.model_cls, **kwargs)
+        terms = self._compile(tuple(kwargs))
+
+        # Start from the smallest index hit, then check the remaining terms against those candidates only
+        candidates = None
+        used = None
+        for i, (key, resolve, lookup, index) in enumerate(terms):
+            if index is None:
+                continue
+
+            if index is _pk_index:
+                obj = self.instances.get(kwargs[key])
+                found = {kwargs[key]: obj} if obj is not None else {}
+            else:
+                found = index.lookup(lookup, kwargs[key])
+
+            if candidates is None or len(found) < len(candidates):
+                candidates = found
+                used = i
+
+        if candidates is None:
+            candidates = self.instances
+
+        checks = [compile_matcher(resolve, lookup, kwargs[key])
+                  for i, (key, resolve, lookup, index) in enumerate(terms) if i != used]
+
+        return [obj for obj in list(candidates.values()) if all(check(obj) for check in checks)]
 
     def get(self, pk=None, default=_sentinel, **kwargs):
         if pk:
@@ -66,117 +246,224 @@ class ModelObjectsManager:
         return matches[0]
 
 
+class _ActiveObjects:
+    # `cls.objects`: the class's manager in the active registry
+    def __get__(self, instance, owner):
+        return active_registry().objects(owner)
+
+
+class _ActiveInstances:
+    # `cls._instances`: {pk: instance} of the class in the active registry
+    def __get__(self, instance, owner):
+        return active_registry().objects(owner).instances
+
+
 class Model:
+    __slots__ = ()  # Subclasses can declare __slots__ all the way down to drop the per-instance __dict__
     pk_field = None
+    indexes = ()  # Field indexes for ModelObjectsManager.filter (e.x. (HashIndex("event_type"), ))
+    manager_class = ModelObjectsManager
+    objects = _ActiveObjects()
+    _instances = _ActiveInstances()
+    _indexed_fields = frozenset()
 
     def __init_subclass__(cls):
         super().__init_subclass__()
-        cls._instances = {}  # {pk: instance}
-        cls.objects = ModelObjectsManager(cls)
+        cls._indexed_fields = frozenset(index.path[0] for index in cls.indexes)
 
     def __init__(self, pk_field=None):
         cls = self.__class__
 
         if pk_field is None:
             # Auto-increment primary key
-            pks = list(cls._instances.keys())
-            pks.sort()
-            last_pk = pks[-1] if pks else 0
-            self.pk = last_pk + 1
+            self.pk = cls.objects.next_pk()
             pk_field = "pk"
 
         cls.pk_field = pk_field
         # Register instance
-        cls._instances[getattr(self, pk_field)] = self
+        cls.objects.register(getattr(self, pk_field), self)
+
+    def __setattr__(self, name, value):
+        scenario = active_scenario()
+        if scenario is not None:
+            scenario.touch_attribute(self, name)
+        super().__setattr__(name, value)
+        if name in self._indexed_fields:
+            self.__class__.objects.reindex(self)
+
+    def _changed_in_place(self):
+        """
+        Called by reindex, for state the model keeps off its fields to catch up with them
+        """
 
 
 class AssignmentObject(Model):
     """
     Base class for objects that will be assigned to a slot (CrewMember, Aircraft, Official) to inherit from
     """
+    __slots__ = ("pk", "availability", "default_availability", "schedule")
+
+    workload_limits = ()  # WorkloadLimits every object of the class is held to, see workload.py
+
     def __init__(self, availability, default_availability=False):
-        self.availability = availability
+        """
+        :param availability: Windows the object is available in, (start: datetime, end: datetime) for one-off windows or
+            (weekday: int, start: time, end: time) for weekly ones
+        :param default_availability: If the object is available when there is no availability for the time
+        """
+
+        self.availability = Availability()
+        for entry in availability:
+            self.availability.add(entry)
         self.default_availability = default_availability
 
-        self.schedule = []
+        self.schedule = Schedule()
 
         super().__init__()
 
+    def add_blackout(self, start: datetime, end: datetime):
+        self.availability.add_blackout(start, end)
+
     def is_available(self, event, group):
-        start_dt = event.start_time
-        end_dt = event.end_time
-        # TODO: Check availability
+        available = self.availability.check(event.start_time, event.end_time) if self.availability else None
+        if available is False:
+            return False  # Blacked out
 
         # Check overlap and buffer
-        for event in self.schedule:
-            event_start = event.start_time
-            event_end = event.end_time
+        if self._conflict(event, group):
+            return False  # Overlaps or inside the break period, not available
 
-            if start_dt < event_end and end_dt > event_start:
-                return False  # Overlaps, not available
-
-            # Ensure break period
-            if event_end + group.assignment_buffer > start_dt and event_start < end_dt:
-                return False
+        if available is None:
+            return self.default_availability  # If there is no availability for this dt range
+        return True
 
-        return self.default_availability  # If there is no availability for this dt range
+    def _conflict(self, event: "Event", group: "AssignmentGroup"):
+        travel_times = group.travel_times
+        if travel_times is None:
+            return self.schedule.conflicts(event.start_time, event.end_time, group.assignment_buffer)
+        return self.schedule.conflicts(event.start_time, event.end_time, travel_times.longest,
+                                       travel_times.before(event))
 
     def can_be_assigned(self, event: "Event", slot: "AssignmentSlot", group: "AssignmentGroup"):
         if not self.is_available(event, group):
             return False
-        return True
-
-
-class AssignmentRule(Model):
-    def __init__(self, rule_text):
-        self.rule_text = rule_text
-
 
         if group.find_assigned_object(self):  # Make sure it isn't assigned to any slot in the group
             return False
 
-        if not slot.rule.evaluate_can_be_assigned(self):
+        if not slot.rule.evaluate_can_be_assigned(self, event):
             return False
 
-        super().__init__()
+        if self.workload_limits and self.blocking_limit(event) is not None:
+            return False
+
+        return True
 
-    def evaluate_should_assign(self):
+    def blocking_limit(self, event: "Event"):
         """
-        Decide if autoassign should fill this slot
-        :return:
+        :return: The first of the class's workload_limits that taking the event would break, or None
         """
 
-        if self.rule_text == "ALWAYS":
-            return True
-        if self.rule_text == "NEVER":
-            return False
+        for limit in self.workload_limits:
+            if not limit.allows(self, event):
+                return limit
+        return None
 
-        # TODO: Evaluate rule text
+    def rejection_reason(self, event: "Event", slot: "AssignmentSlot", group: "AssignmentGroup"):
+        """
+        Why can_be_assigned refuses the object, for instrumentation (see stats.REASONS). Being in the group already is
+        checked first, since the object's own assignment would otherwise show up as an overlap.
+
+        :return: Reason or None if the checks above all pass
+        """
+
+        if group.find_assigned_object(self):
+            return "in_group"
+
+        available = self.availability.check(event.start_time, event.end_time) if self.availability else None
+        if available is False:
+            return "blackout"
+
+        conflict = self._conflict(event, group)
+        if conflict is not None:
+            if conflict.start_time < event.end_time and conflict.end_time > event.start_time:
+                return "overlap"
+            return "buffer"
+
+        if available is None and not self.default_availability:
+            return "unavailable"
+        if not slot.rule.evaluate_can_be_assigned(self, event):
+            return "rule"
+        if self.workload_limits and self.blocking_limit(event) is not None:
+            return "workload"
+        return None
+
+
+class AssignmentRule(Model):
+    def __init__(self, rule_text):
         """
         ALWAYS                                     # Always auto-assign this slot
         NEVER                                      # Never auto-assign this slot
+        ANY                                        # Any object of this type
         WHEN event.start_time <= 12:00 PM          # Assign only if the start time is before noon
+        WHEN obj.age >= event.age_group.age + 2    # Assign only if the obj is 2 years older than age group (e.x. for assigning centers)
+
+        The text is compiled once (see rules.py), results of rules that only read the event and object are memoized
+        until clear_cache() is called.
         """
 
-        return False
+        self.rule_text = rule_text
+        self.compiled = compile_rule(rule_text)
+        self._cache = {} if self.compiled.pure and not self.compiled.constant else None
+
+        super().__init__()
 
-    def evaluate_can_be_assigned(self, obj: "AssignmentObject"):
+    def evaluate(self, event: "Event" = None, obj: "AssignmentObject" = None):
+        if self._cache is None:
+            return self.compiled.predicate(event, obj)
+
+        key = (event, obj)
+        try:
+            return self._cache[key]
+        except KeyError:
+            res = self._cache[key] = self.compiled.predicate(event, obj)
+            return res
+
+    def evaluate_should_assign(self, event: "Event" = None):
         """
-        Decide if this object is allowed to fill this slot
+        Decide if autoassign should fill this slot
         :return:
         """
 
-        if self.rule_text == "ANY":
-            return True
+        return self.evaluate(event)
 
-        # TODO: Evaluate rule text
+    def evaluate_can_be_assigned(self, obj: "AssignmentObject", event: "Event" = None):
         """
-        ANY                                        # Any object of this type 
-        WHEN obj.age >= event.age_group.age + 2    # Assign only if the obj is 2 years older than age group (e.x. for assigning centers)
-        
+        Decide if this object is allowed to fill this slot
+        :return:
         """
 
-        return False
+        return self.evaluate(event, obj)
+
+    def clear_cache(self):
+        if self._cache is not None:
+            self._cache = {}
+
+    def __getstate__(self):
+        # The compiled rule is closures, compile it again when unpickled
+        state = self.__dict__.copy()
+        del state["compiled"]
+        state["_cache"] = {} if self._cache is not None else None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.compiled = compile_rule(self.rule_text)
+
+    @classmethod
+    def clear_caches(cls):
+        for rule in cls.objects.all():
+            rule.clear_cache()
 
     def __eq__(self, other):
         if type(other) is AssignmentRule:
@@ -189,7 +476,104 @@ NEVER_RULE = AssignmentRule("NEVER")
 ANY_RULE = AssignmentRule("ANY")
 
 
+class AssignedObjects(list):
+    """
+    A slot's assigned objects. A list that keeps the reverse index of the slot's group (object -> slot) current through
+    every change, so `slot.assigned_objects.append(obj)` and the like can be used as before.
+    """
+    __slots__ = ("slot",)
+
+    def __init__(self, slot: "AssignmentSlot", objects=()):
+        super().__init__(objects)
+        self.slot = slot
+
+    def __reduce__(self):
+        return AssignedObjects, (self.slot, list(self))
+
+    def _touch(self):
+        scenario = active_scenario()
+        if scenario is not None:
+            scenario.touch_slot(self.slot)
+
+    def _added(self, objs):
+        group = self.slot.group
+        if group is not None:
+            for obj in objs:
+                group._index(obj, self.slot)
+
+    def _removed(self, objs):
+        group = self.slot.group
+        if group is not None:
+            for obj in objs:
+                group._unindex(obj, self.slot)
+
+    def append(self, obj):
+        self._touch()
+        super().append(obj)
+        self._added((obj,))
+
+    def extend(self, objs):
+        objs = list(objs)
+        self._touch()
+        super().extend(objs)
+        self._added(objs)
+
+    def insert(self, index, obj):
+        self._touch()
+        super().insert(index, obj)
+        self._added((obj,))
+
+    def remove(self, obj):
+        self._touch()
+        super().remove(obj)
+        self._removed((obj,))
+
+    def pop(self, index=-1):
+        self._touch()
+        obj = super().pop(index)
+        self._removed((obj,))
+        return obj
+
+    def clear(self):
+        self._touch()
+        objs = list(self)
+        super().clear()
+        self._removed(objs)
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            old = self[index]
+            value = new = list(value)
+        else:
+            old, new = (self[index],), (value,)
+
+        self._touch()
+        super().__setitem__(index, value)
+        self._removed(old)
+        self._added(new)
+
+    def __delitem__(self, index):
+        old = self[index] if isinstance(index, slice) else [self[index]]
+        self._touch()
+        super().__delitem__(index)
+        self._removed(old)
+
+    def __iadd__(self, objs):
+        self.extend(objs)
+        return self
+
+    def __imul__(self, n):
+        self._touch()
+        objs = list(self)
+        super().__imul__(n)
+        self._removed(objs)
+        self._added(list(self))
+        return self
+
+
 class AssignmentSlot(Model):
+    __slots__ = ("name", "object_to_assign", "amount", "rule", "should_assign_rule", "assigned_objects", "group")
+
     def __init__(self, name: str, object_to_assign: Type[AssignmentObject], amount: int = 1,
                  should_assign_rule: AssignmentRule = ALWAYS_RULE, rule: AssignmentRule = ANY_RULE):
         """
@@ -207,12 +591,37 @@ class AssignmentSlot(Model):
         self.rule = rule
         self.should_assign_rule = should_assign_rule
         self.assigned_objects = []
+        self.group: AssignmentGroup | None = None  # Set by the AssignmentGroup this slot is in
 
         super().__init__("name")
 
+    def __setattr__(self, name, value):
+        if name == "assigned_objects":
+            scenario = active_scenario()
+            if scenario is not None:
+                scenario.touch_slot(self)
+            old = getattr(self, "assigned_objects", ())
+            value = AssignedObjects(self, value)
+            object.__setattr__(self, name, value)  # The slot list is recorded whole, not as an attribute
+            group = getattr(self, "group", None)
+            if group is not None:
+                for obj in old:
+                    group._unindex(obj, self)
+                for obj in value:
+                    group._index(obj, self)
+            return
+
+        super().__setattr__(name, value)
+        if name == "name" and getattr(self, "group", None) is not None:
+            self.group._index_slots()
+
+    @property
+    def event(self):
+        return self.group.event if self.group is not None else None
+
     @property
     def should_assign(self):
-        return self.should_assign_rule.evaluate_should_assign()
+        return self.should_assign_rule.evaluate_should_assign(self.event)
 
     def __str__(self):
         return self.name
@@ -221,7 +630,12 @@ class AssignmentSlot(Model):
         return self.name
 
 
+_signatures = {}  # {slot names: slot names}, so groups with the same slots share one signature tuple
+
+
 class AssignmentGroup(Model):
+    __slots__ = ("pk", "slots", "assignment_buffer", "travel_times", "event", "_signature", "_by_name", "_assigned")
+
     def __init__(self, *slots: AssignmentSlot, **kwargs):
         """
         EXAMPLE
@@ -230,23 +644,111 @@ class AssignmentGroup(Model):
             crew = AssignmentSlots(CaptainSlot, CoCaptainSlot, FlightAttendantSlot)
 
         :param slots: A list of AssignmentSlot that will be assigned to this model
+        :param kwargs: assignment_buffer (time an object needs between events, 15 minutes by default), travel_times
+            (a TravelTimes used instead of assignment_buffer, so the time depends on where both events are)
         """
 
         self.slots = slots
         self.assignment_buffer: timedelta = timedelta(minutes=15)
+        self.travel_times = None  # TravelTimes
+        self.event: Event | None = None  # Set when the group is assigned to an event attribute
 
         for k, v in kwargs.items():
             setattr(self, k, v)
 
         super().__init__()
 
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        if name == "slots":
+            self._index_slots()
+
+    def __setstate__(self, state):
+        dict_state, slots_state = state if isinstance(state, tuple) else (state, None)
+        object.__setattr__(self, "travel_times", None)  # Missing from snapshots older than it
+        for part in (dict_state, slots_state):
+            for name, value in (part or {}).items():
+                object.__setattr__(self, name, value)
+
+        signature = self._signature
+        self._signature = _signatures.setdefault(signature, signature)
+
+    def _index_slots(self):
+        """
+        Build the slot name map, the signature and the reverse index (object -> slot) from scratch
+        """
+
+        names = tuple(slot.name for slot in self.slots)
+        self._signature = _signatures.setdefault(names, names)
+        self._by_name = {}
+        self._assigned = {}
+        for slot in self.slots:
+            self._by_name.setdefault(slot.name, slot)
+            slot.group = self
+            for obj in slot.assigned_objects:
+                self._index(obj, slot)
+
+    def _index(self, obj, slot: AssignmentSlot):
+        # An object is normally in one slot of the group, a list of slots is only kept for the ones that aren't
+        found = self._assigned.get(obj)
+        if found is None:
+            self._assigned[obj] = slot
+        elif type(found) is list:
+            found.append(slot)
+        else:
+            self._assigned[obj] = [found, slot]
+
+    def _unindex(self, obj, slot: AssignmentSlot):
+        found = self._assigned.get(obj)
+        if found is slot:
+            del self._assigned[obj]
+        elif type(found) is list and slot in found:
+            found.remove(slot)
+            if len(found) == 1:
+                self._assigned[obj] = found[0]
+
     @property
     def _assigned_objects(self):
         return [(slot, obj) for slot in self.slots for obj in slot.assigned_objects]
 
     @property
     def slots_names(self):
-        return [slot.name for slot in self.slots]
+        return list(self._signature)
+
+    def get_slot(self, name: str):
+        """
+        :return: The slot with this name, or None
+        """
+
+        return self._by_name.get(name)
+
+    def buffer_between(self, previous: "Event", event: "Event"):
+        """
+        Time an object needs between the end of `previous` and the start of `event` (an event of this group)
+        """
+
+        if self.travel_times is None:
+            return self.assignment_buffer
+        return self.travel_times.between(previous, event)
+
+    def shortest_buffer(self, event: "Event"):
+        """
+        Least buffer any earlier event can need before `event`
+        """
+
+        if self.travel_times is None:
+            return self.assignment_buffer
+        return self.travel_times.shortest_before(event)
+
+    @property
+    def longest_buffer(self):
+        """
+        Most buffer any two events can need between them
+        """
+
+        if self.travel_times is None:
+            return self.assignment_buffer
+        return self.travel_times.longest
 
     def get_assigned_objects_by_slot(self):
         res = []
@@ -277,11 +779,14 @@ class AssignmentGroup(Model):
         return needed
 
     def find_assigned_object(self, obj_to_find):
-        for slot, obj in self._assigned_objects:
-            if obj == obj_to_find:
-                return slot
+        """
+        :return: The slot the object is assigned to in this group, or None
+        """
 
-        return None
+        found = self._assigned.get(obj_to_find)
+        if type(found) is list:
+            return found[0]
+        return found
 
     def unassign(self, obj):
         slot = self.find_assigned_object(obj)
@@ -289,41 +794,46 @@ class AssignmentGroup(Model):
             slot.assigned_objects.remove(obj)
 
     def clear(self):
+        scenario = active_scenario()
         for slot in self.slots:
-            slot.assigned_objects = []
+            if scenario is not None:
+                scenario.touch_slot(slot)
+            list.clear(slot.assigned_objects)
+        self._assigned = {}
 
     def __setitem__(self, key: str, value: AssignmentObject):
         # key should be slot.name
-        for slot in self.slots:
-            if slot.name == key:
-                if type(value) is slot.object_to_assign or value is None:
-                    slot.assigned_objects.append(value)
-                    return
-                else:
-                    raise TypeError(f"Attempted to assign incorrect type to AssignmentSlot. "
-                                    f"Assigned: {type(value)}, Expected: {slot.object_to_assign}")
+        slot = self._by_name.get(key)
+        if slot is None:
+            raise KeyError(f"Could not find {key} in AssignmentSlots")
 
-        raise KeyError(f"Could not find {key} in AssignmentSlots")
+        if type(value) is slot.object_to_assign or value is None:
+            slot.assigned_objects.append(value)
+        else:
+            raise TypeError(f"Attempted to assign incorrect type to AssignmentSlot. "
+                            f"Assigned: {type(value)}, Expected: {slot.object_to_assign}")
 
     def __getitem__(self, key: str):
         # key should be slot.name
-        for slot in self.slots:
-            if slot.name == key:
-                return slot.assigned_objects
+        slot = self._by_name.get(key)
+        if slot is None:
+            raise KeyError(f"Could not find {key} in AssignmentSlots")
 
-        raise KeyError(f"Could not find {key} in AssignmentSlots")
+        return slot.assigned_objects
 
     def __iter__(self):
-        yield from self._assigned_objects
+        for slot in self.slots:
+            for obj in slot.assigned_objects:
+                yield slot, obj
 
     def __eq__(self, other):
         if type(other) == AssignmentGroup:
-            return [s.name for s in self.slots] == [s.name for s in other.slots]
+            return self._signature is other._signature or self._signature == other._signature
 
         return False
 
     def __repr__(self):
-        return f"AssignmentGroup({', '.join([s.name for s in self.slots])})"
+        return f"AssignmentGroup({', '.join(self._signature)})"
 
 
 class EventType(Model):
@@ -335,6 +845,18 @@ class EventType(Model):
 
 
 class Event(Model):
+    __slots__ = ("event_id", "name", "event_type", "start_time", "groups", "duration_override", "_joined_groups",
+                 "_venue")
+    indexes = (InvertedIndex("groups"),)
+    # Attributes that hold the event's AssignmentGroups. Attributes are also added as groups are assigned to them, but
+    # declaring them keeps the order of assignment_groups fixed
+    assignment_group_fields = ()
+    _group_fields = {}  # {attribute: None}, per subclass
+
+    def __init_subclass__(cls):
+        super().__init_subclass__()
+        cls._group_fields = dict.fromkeys(cls.assignment_group_fields)
+
     def __init__(self, event_id: str, name: str, event_type: EventType, start_time: datetime, **kwargs):
         """
         Examples: Game, Flight
@@ -362,11 +884,65 @@ class Event(Model):
 
         super().__init__("event_id")
 
+        self._joined_groups = []
+        self._join_groups()
+        self._venue = None  # (TravelTimes, groups, position), see TravelTimes.venue
+
+    def __setattr__(self, name, value):
+        if isinstance(value, AssignmentGroup):
+            value.event = self
+            if name not in self._group_fields:
+                self._group_fields[name] = None
+
+        if name not in ("groups", "start_time") or getattr(self, "_joined_groups", None) is None:
+            super().__setattr__(name, value)
+            return
+
+        # Keep the EventGroup orderings current when the event is regrouped or moved
+        self._leave_groups()
+        super().__setattr__(name, value)
+        self._join_groups()
+
+    def _join_groups(self):
+        for group in self.groups:
+            group.add_event(self)
+            self._joined_groups.append(group)
+
+    def _leave_groups(self):
+        for group in self._joined_groups:
+            group.remove_event(self)
+        self._joined_groups = []
+
+    def _changed_in_place(self):
+        # `event.groups.append(group)` doesn't go through __setattr__, so the EventGroups and venue don't know yet
+        if getattr(self, "_joined_groups", None) is None:
+            return
+        self._leave_groups()
+        self._join_groups()
+        object.__setattr__(self, "_venue", None)
+
+    def add_group(self, group: "EventGroup"):
+        if group not in self.groups:
+            self.groups = self.groups + [group]
+
+    def remove_group(self, group: "EventGroup"):
+        self.groups = [g for g in self.groups if g is not group]
+
+    def __setstate__(self, state):
+        # Unpickling skips __setattr__, and in a fresh process the class hasn't seen the group attributes yet
+        dict_state, slots_state = state if isinstance(state, tuple) else (state, None)
+        for part in (dict_state, slots_state):
+            for name, value in (part or {}).items():
+                object.__setattr__(self, name, value)
+                if isinstance(value, AssignmentGroup) and name not in self._group_fields:
+                    self._group_fields[name] = None
+
     @property
     def assignment_groups(self):
         s = []
-        for field, value in self.__dict__.items():
-            if type(value) == AssignmentGroup:
+        for field in self._group_fields:
+            value = getattr(self, field, None)
+            if isinstance(value, AssignmentGroup):
                 s.append(value)
 
         return s
@@ -386,8 +962,13 @@ class Event(Model):
         return self.start_time + self.duration
 
     def get_assignment_group(self, group):
-        for as_group in self.assignment_groups:
-            if as_group == group:
+        """
+        :return: This event's AssignmentGroup with the same slots as the group, or None
+        """
+
+        for field in self._group_fields:
+            as_group = getattr(self, field, None)
+            if isinstance(as_group, AssignmentGroup) and as_group == group:
                 return as_group
         return None
 
@@ -406,10 +987,85 @@ class EventGroup(Model):
         self.name = name
         self.try_keep_assignments_in_group = try_keep_assignments_in_group
 
+        self._events: dict[Type[Event], Schedule] = {}  # {event class: events ordered by start time}
+        self._previous: dict[Event, Event | None] = {}
+        self._next: dict[Event, Event | None] = {}
+
         super().__init__()
 
+    def add_event(self, event: Event):
+        """
+        Called by Event when it joins this group, use `event.add_group(group)` instead of calling this directly
+        """
+
+        if event in self._previous:
+            return
+
+        scenario = active_scenario()
+        if scenario is not None:
+            scenario.touch_event_group(self)
+        events = self._events.setdefault(type(event), Schedule())
+        index = events.append(event)
+
+        previous_event = events[index - 1] if index > 0 else None
+        next_event = events[index + 1] if index + 1 < len(events) else None
+
+        self._previous[event] = previous_event
+        self._next[event] = next_event
+        if previous_event is not None:
+            self._next[previous_event] = event
+        if next_event is not None:
+            self._previous[next_event] = event
+
+    def remove_event(self, event: Event):
+        if event not in self._previous:
+            return
+
+        scenario = active_scenario()
+        if scenario is not None:
+            scenario.touch_event_group(self)
+        self._events[type(event)].remove(event)
+
+        previous_event = self._previous.pop(event)
+        next_event = self._next.pop(event)
+        if previous_event is not None:
+            self._next[previous_event] = next_event
+        if next_event is not None:
+            self._previous[next_event] = previous_event
+
+    def relink(self):
+        """
+        Rebuild the previous/next links from the ordered events (e.x. after their schedules were restored)
+        """
+
+        self._previous = {}
+        self._next = {}
+        for events in self._events.values():
+            previous_event = None
+            for event in events:
+                self._previous[event] = previous_event
+                if previous_event is not None:
+                    self._next[previous_event] = event
+                previous_event = event
+            if previous_event is not None:
+                self._next[previous_event] = None
+
     def get_events(self, event_type: Type[Event]):
-        return event_type.objects.filter(groups__contains=self)
+        """
+        Events of this type in the group, ordered by start time
+        """
+
+        return list(self._events.get(event_type, ()))
+
+    def previous_event(self, event: Event):
+        """
+        Event of the same type in this group that starts right before this one (None if it is the first)
+        """
+
+        return self._previous.get(event)
+
+    def next_event(self, event: Event):
+        return self._next.get(event)
 
     def __str__(self):
         return self.name
@@ -0,0 +1,206 @@
+"""
+Orders to try a slot's candidates in, used by the greedy strategy (see Assigner(order=...))
+
+- pool: Pool order, the order objects were created in
+- least_loaded: Fewest events in the object's schedule first
+- fewest_eligible: Fewest slots left in the run that the object's rules allow first, so objects that can fill many
+  slots are kept for the slots only they can fill
+- closest_venue: Objects whose previous event shares an EventGroup (field, airport, ...) with the event first, then
+  least loaded. With the slot group's travel_times, objects whose previous event is the shortest trip away first
+"""
+import heapq
+
+from .candidates import CandidatePool
+
+ORDERS = ("pool", "least_loaded", "fewest_eligible", "closest_venue")
+
+
+class CandidateQueue:
+    def __init__(self, pool: CandidatePool, key, watch: bool = False):
+        """
+        A pool's objects in a heap by key, so the order is kept up to date as keys change instead of sorting the pool
+        for every slot. Every key change has to be pushed with touch; the entry it replaces is left in the heap as
+        stale (by version) and skipped, and the heap is rebuilt once it is mostly stale entries.
+
+        :param key: Function of an object's position in the pool, smaller keys are tried first (ties in pool order)
+        :param watch: Touch objects whenever their schedule changes (for keys that depend on it, e.x. the load)
+        """
+
+        self.pool = pool
+        self.key = key
+        self.versions = [0] * len(pool.objects)
+        self.stale = 0
+        self._rebuild()
+
+        if watch:
+            for i, obj in enumerate(pool.objects):
+                obj.schedule.watch(self, i)
+
+    def _rebuild(self):
+        self.heap = [(self.key(i), i, version) for i, version in enumerate(self.versions)]
+        heapq.heapify(self.heap)
+        self.stale = 0
+
+    def touch(self, i: int):
+        self.versions[i] += 1
+        heapq.heappush(self.heap, (self.key(i), i, self.versions[i]))
+        self.stale += 1
+        if self.stale > len(self.versions) + 16:
+            self._rebuild()
+
+    def schedule_changed(self, i: int, start, end, added: bool):
+        self.touch(i)
+
+    def iter(self, mask: int):
+        """
+        Objects in the bitset, smallest key first
+        """
+
+        objects = self.pool.objects
+        eligible = mask.bit_count()
+        if eligible * 8 < len(objects):
+            # Few candidates, sorting them beats walking the heap past everyone else
+            positions = []
+            while mask:
+                low = mask & -mask
+                positions.append(low.bit_length() - 1)
+                mask ^= low
+            positions.sort(key=lambda i: (self.key(i), i))
+            for i in positions:
+                yield objects[i]
+            return
+
+        heap = self.heap
+        versions = self.versions
+        popped = []
+        try:
+            while heap and eligible:
+                entry = heapq.heappop(heap)
+                i = entry[1]
+                if entry[2] != versions[i]:
+                    if self.heap is heap:
+                        self.stale -= 1  # Replaced by a touch, dropped for good
+                    continue
+
+                popped.append(entry)
+                if mask >> i & 1:
+                    eligible -= 1
+                    yield objects[i]
+        finally:
+            if self.heap is heap:  # Otherwise a touch rebuilt it while the caller held an object
+                for entry in popped:
+                    if entry[2] == versions[entry[1]]:
+                        heapq.heappush(heap, entry)
+                    else:
+                        self.stale -= 1  # Touched while popped, its replacement is already in
+
+
+class CandidateOrder:
+    def __init__(self, name: str, events: list):
+        """
+        Candidate order for one run of the assigner
+
+        :param name: One of ORDERS
+        :param events: Events of the run (fewest_eligible counts their slots)
+        """
+
+        if name not in ORDERS:
+            raise ValueError(f"Unknown candidate order: {name}, expected one of {ORDERS}")
+
+        self.name = name
+        self.events = events
+        self.queues: dict[CandidatePool, CandidateQueue] = {}
+        self.remaining: dict[CandidatePool, list[int]] = {}  # fewest_eligible: {pool: slots left per position}
+
+    def queue(self, pool: CandidatePool, eligible):
+        queue = self.queues.get(pool)
+        if queue is not None:
+            return queue
+
+        objects = pool.objects
+        if self.name == "fewest_eligible":
+            remaining = self.remaining[pool] = [0] * len(objects)
+            for event in self.events:
+                for group in event.assignment_groups:
+                    for slot in group.slots:
+                        if slot.object_to_assign is pool.object_class:
+                            mask = eligible(event, slot)
+                            while mask:
+                                low = mask & -mask
+                                remaining[low.bit_length() - 1] += slot.amount
+                                mask ^= low
+            key = remaining.__getitem__
+        else:
+            key = lambda i: len(objects[i].schedule)
+
+        queue = self.queues[pool] = CandidateQueue(pool, key, watch=self.name != "fewest_eligible")
+        return queue
+
+    def candidates(self, pool: CandidatePool, mask: int, event, eligible, travel_times=None):
+        """
+        :param eligible: Function of (event, slot) to their eligibility bitset
+        :param travel_times: TravelTimes closest_venue orders by
+        """
+
+        if self.name == "pool":
+            return pool.iter(mask)
+
+        ordered = self.queue(pool, eligible).iter(mask)
+        if self.name == "closest_venue":
+            if travel_times is not None:
+                return self._nearest_first(ordered, event, travel_times)
+            return self._venue_first(ordered, event)
+        return ordered
+
+    @staticmethod
+    def _nearest_first(ordered, event, travel_times):
+        # Objects as close as anything can be are yielded right away, the rest wait in a bucket per travel time (the
+        # matrix has few distinct times), so nothing is sorted per object
+        gap = travel_times.before(event)
+        shortest = travel_times.shortest_before(event)
+        buckets = {}  # {travel time: [objects in least loaded order]}
+        later = []
+        for obj in ordered:
+            previous = obj.schedule.previous(event.start_time)
+            if previous is None:
+                later.append(obj)
+                continue
+
+            time = gap(previous)
+            if time <= shortest:
+                yield obj
+            else:
+                buckets.setdefault(time, []).append(obj)
+
+        for time in sorted(buckets):
+            yield from buckets[time]
+        yield from later
+
+    @staticmethod
+    def _venue_first(ordered, event):
+        groups = set(event.groups)
+        later = []
+        for obj in ordered:
+            previous = obj.schedule.previous(event.start_time)
+            if previous is not None and not groups.isdisjoint(previous.groups):
+                yield obj
+            else:
+                later.append(obj)
+        yield from later
+
+    def slot_done(self, pool: CandidatePool, mask: int, amount: int):
+        """
+        The run is past a slot, for fewest_eligible its candidates have one less slot to fill
+        """
+
+        remaining = self.remaining.get(pool)
+        if remaining is None:
+            return
+
+        queue = self.queues[pool]
+        while mask:
+            low = mask & -mask
+            i = low.bit_length() - 1
+            remaining[i] -= amount
+            queue.touch(i)
+            mask ^= low
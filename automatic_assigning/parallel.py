@@ -0,0 +1,184 @@
+import contextlib
+import heapq
+import io
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+from .candidates import CandidatePool
+from .stats import AssignerStats
+
+
+def partition(assigner, events: list):
+    """
+    Split events into independent partitions: events end up in the same partition if they are chained in a stay in
+    group EventGroup, or if they conflict in time and share an eligible object. With the flow strategy, or objects with
+    workload_limits, sharing an eligible object at all links events, since the object's workload is part of the cost
+    or of what it can still take.
+
+    Events of one partition never affect another's assignments, so partitions can be assigned in any order, or at the
+    same time.
+
+    :return: Partitions (lists of events, in the order they were given), ordered by their first event
+    """
+
+    parent = list(range(len(events)))
+    positions = {event: i for i, event in enumerate(events)}
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(i, j):
+        i, j = find(i), find(j)
+        if i != j:
+            parent[max(i, j)] = min(i, j)
+
+    # Eligible objects of each event, as {object class: bitset}
+    masks = []
+    for i, event in enumerate(events):
+        mask = {}
+        for group in event.assignment_groups:
+            for slot in group.slots:
+                pool = assigner.get_pool(slot.object_to_assign)
+                mask[slot.object_to_assign] = mask.get(slot.object_to_assign, 0) | pool.eligible(slot.rule, event)
+        masks.append(mask)
+
+        stay_in_group = assigner.get_stay_in_group(event)
+        prev_event = stay_in_group.previous_event(event) if stay_in_group else None
+        if prev_event in positions:
+            union(i, positions[prev_event])
+
+    def shares_objects(a, b):
+        return any(a[cls] & b[cls] for cls in a.keys() & b.keys())
+
+    if assigner.strategy == "flow" or any(cls.workload_limits for mask in masks for cls in mask):
+        owners = {}  # {(object class, bit): first event that can use it}
+        for i, mask in enumerate(masks):
+            for cls, bits in mask.items():
+                while bits:
+                    low = bits & -bits
+                    bits ^= low
+                    owner = owners.setdefault((cls, low), i)
+                    if owner != i:
+                        union(i, owner)
+    else:
+        buffers = [max((group.longest_buffer for group in event.assignment_groups), default=timedelta(0))
+                   for event in events]
+        max_buffer = max(buffers, default=timedelta(0))
+
+        # Sweep in time order, only events still running (plus buffer) can conflict with the next one
+        active = []  # Heap of (end, event index), the earliest to finish on top
+        for i in sorted(range(len(events)), key=lambda i: events[i].start_time):
+            start = events[i].start_time
+            while active and active[0][0] + max_buffer <= start:
+                heapq.heappop(active)
+            for end, j in active:
+                if end + max(buffers[i], buffers[j]) > start and shares_objects(masks[i], masks[j]):
+                    union(i, j)
+
+            heapq.heappush(active, (events[i].end_time, i))
+
+    partitions = {}
+    for i, event in enumerate(events):
+        partitions.setdefault(find(i), []).append(event)
+
+    return list(partitions.values())
+
+
+def _assign_chunk(assigner, partitions, objects):
+    """
+    Runs in a worker process on pickled copies of the partitions' events and objects
+
+    :return: (objects assigned to each slot, as positions in `objects`, in event/group/slot order, printed output,
+        stats of the chunk or None)
+    """
+
+    assigner.pools = {cls: CandidatePool(cls, objs) for cls, objs in objects.items()}
+    assigner.start_ordering([event for events in partitions for event in events])
+    if assigner.stats is not None:
+        assigner.stats = AssignerStats()  # Only the counters go back to the parent
+    before = [[[len(slot.assigned_objects) for slot in group.slots] for group in event.assignment_groups]
+              for events in partitions for event in events]
+
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        for events in partitions:
+            assigner.assign_serial(events, {})
+
+    results = []
+    for event, event_before in zip((event for events in partitions for event in events), before):
+        results.append([
+            [[assigner.pools[slot.object_to_assign].positions[obj] for obj in slot.assigned_objects[count:]]
+             for slot, count in zip(group.slots, group_before)]
+            for group, group_before in zip(event.assignment_groups, event_before)
+        ])
+
+    return results, output.getvalue(), assigner.stats
+
+
+def assign_parallel(assigner, events: list, workers: int, scheduled_count: dict):
+    """
+    Assign independent partitions in a process pool and apply the results back onto the events and objects.
+    Results are the same as assigning the events serially in the same order.
+    """
+
+    partitions = partition(assigner, events)
+    if len(partitions) < 2:
+        assigner.assign_serial(events, scheduled_count)
+        return
+
+    # Balance partitions between chunks, biggest first, a few chunks per worker
+    chunks = [[] for _ in range(min(len(partitions), workers * 4))]
+    sizes = [0] * len(chunks)
+    for i in sorted(range(len(partitions)), key=lambda i: len(partitions[i]), reverse=True):
+        smallest = sizes.index(min(sizes))
+        chunks[smallest].append(i)
+        sizes[smallest] += len(partitions[i])
+
+    chunks = [[partitions[i] for i in sorted(chunk)] for chunk in chunks if chunk]
+
+    payloads = []
+    for chunk in chunks:
+        objects = {}  # {object class: [eligible objects]}
+        for events_ in chunk:
+            for event in events_:
+                for group in event.assignment_groups:
+                    for slot in group.slots:
+                        pool = assigner.get_pool(slot.object_to_assign)
+                        eligible = objects.setdefault(slot.object_to_assign, {})
+                        for obj in pool.iter(pool.eligible(slot.rule, event)):
+                            eligible[obj] = None
+
+        objects = {cls: sorted(objs, key=assigner.pools[cls].positions.__getitem__) for cls, objs in objects.items()}
+        payloads.append((chunk, objects))
+
+    pools, assigner.pools = assigner.pools, {}  # Workers build their own pools
+    ordering, assigner.ordering = assigner.ordering, None
+    registry, assigner.registry = assigner.registry, None  # Workers use the objects they are sent
+    storage, assigner.storage = assigner.storage, None  # and don't store anything
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_assign_chunk, assigner, chunk, objects) for chunk, objects in payloads]
+            results = [future.result() for future in futures]
+    finally:
+        assigner.pools = pools
+        assigner.ordering = ordering
+        assigner.registry = registry
+        assigner.storage = storage
+
+    for (chunk, objects), (assignments, output, stats) in zip(payloads, results):
+        print(output, end="")
+        if stats is not None:
+            assigner.stats.merge(stats)
+
+        events_ = [event for events_ in chunk for event in events_]
+        for event, groups in zip(events_, assignments):
+            for group, slots in zip(event.assignment_groups, groups):
+                for slot, positions in zip(group.slots, slots):
+                    for position in positions:
+                        obj = objects[slot.object_to_assign][position]
+                        slot.assigned_objects.append(obj)
+                        obj.schedule.append(event)
+                        scheduled_count[slot.name] = scheduled_count.get(slot.name, 0) + 1
@@ -0,0 +1,115 @@
+"""
+Scoped model registries
+
+Every Model subclass keeps its instances (and their indexes and pk sequence) in a ModelObjectsManager. Managers belong
+to a Registry, and `Model.objects` / `Model._instances` resolve against the registry active in the current context, so
+several leagues/seasons can be loaded side by side in one process:
+
+    season = Registry("2025")
+    with season.activate():
+        snapshot.load("2025.snap")  # Or build the models
+
+    Assigner(registry=season).assign_events(Game)
+
+Outside of any activate() block the DEFAULT registry is used, which is what code unaware of registries gets.
+
+The active registry is a context variable: asyncio tasks inherit it from the code that created them, but threads start
+out on DEFAULT, so activate the registry in the thread (or give it to the Assigner) when assigning from a thread pool.
+Registries of one process share the model classes, so fields that are only found on assignment (Event assignment groups
+not declared in assignment_group_fields) should be declared before registries are assigned from several threads.
+"""
+import functools
+import inspect
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+class Registry:
+    def __init__(self, name: str = None):
+        self.name = name
+        self._managers = {}  # {model class: ModelObjectsManager}
+
+    def objects(self, model_cls):
+        """
+        :return: model_cls's manager in this registry (what `model_cls.objects` is while the registry is active)
+        """
+
+        try:
+            return self._managers[model_cls]
+        except KeyError:
+            return self._managers.setdefault(model_cls, model_cls.manager_class(model_cls))
+
+    @contextmanager
+    def activate(self):
+        """
+        Make this the registry models resolve against until the block exits
+        """
+
+        token = _active.set(self)
+        try:
+            yield self
+        finally:
+            _active.reset(token)
+
+    def clear(self):
+        """
+        Forget every instance of every model class in this registry
+        """
+
+        for manager in self._managers.values():
+            manager.clear()
+
+    def __repr__(self):
+        return f"Registry({self.name!r})" if self.name is not None else f"Registry(at {id(self):#x})"
+
+
+DEFAULT = Registry("default")
+_active: ContextVar[Registry] = ContextVar("automatic_assigning_registry", default=DEFAULT)
+
+
+def active_registry() -> Registry:
+    return _active.get()
+
+
+def scoped(method):
+    """
+    Decorator for methods of objects with a `registry` attribute (e.x. Assigner), runs the method with that registry
+    active unless it is None. Generators only have it active while they run, not while the caller holds a yielded value
+    """
+
+    if inspect.iscoroutinefunction(method):
+        @functools.wraps(method)
+        async def wrapper(self, *args, **kwargs):
+            if self.registry is None:
+                return await method(self, *args, **kwargs)
+            with self.registry.activate():
+                return await method(self, *args, **kwargs)
+
+    elif inspect.isgeneratorfunction(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            generator = method(self, *args, **kwargs)
+            if self.registry is None:
+                return (yield from generator)
+
+            try:
+                while True:
+                    with self.registry.activate():
+                        try:
+                            value = next(generator)
+                        except StopIteration as stop:
+                            return stop.value
+                    yield value
+            finally:
+                with self.registry.activate():
+                    generator.close()
+
+    else:
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if self.registry is None:
+                return method(self, *args, **kwargs)
+            with self.registry.activate():
+                return method(self, *args, **kwargs)
+
+    return wrapper
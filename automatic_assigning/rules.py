@@ -0,0 +1,325 @@
+"""
+ALWAYS                                     # Always auto-assign this slot
+NEVER                                      # Never auto-assign this slot
+ANY                                        # Any object of this type
+WHEN event.start_time <= 12:00 PM          # Assign only if the start time is before noon
+WHEN obj.age >= event.age_group.age + 2    # Assign only if the obj is 2 years older than age group
+
+Conditions can be combined with AND, OR, NOT and parentheses. Operands are attribute paths starting at `event` or
+`obj` (`OBJECT` also works), numbers, "strings", times (12:00 PM, 13:30), TRUE/FALSE/NONE, and + - * / between them.
+Comparisons are < <= > >= == != and IN.
+"""
+import operator
+import re
+from datetime import datetime, time
+from functools import lru_cache
+
+
+class RuleSyntaxError(ValueError):
+    pass
+
+
+CONSTANTS = {"ALWAYS": True, "ANY": True, "NEVER": False}
+ROOTS = {"event": 0, "obj": 1, "object": 1}
+
+# Attributes that change while assigning, rules reading them can't be memoized
+IMPURE_ATTRIBUTES = {"schedule", "assigned_objects"}
+
+COMPARISONS = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "==": operator.eq,
+    "=": operator.eq,
+    "!=": operator.ne,
+}
+ARITHMETIC = {"+": operator.add, "-": operator.sub, "*": operator.mul, "/": operator.truediv}
+
+TOKEN_RE = re.compile(r"""
+    \s*(?:
+        (?P<time>\d{1,2}:\d{2}(?:\s*[AaPp][Mm])?)
+      | (?P<number>\d+(?:\.\d+)?)
+      | (?P<string>"[^"]*"|'[^']*')
+      | (?P<op><=|>=|==|!=|<|>|=|\+|-|\*|/|\(|\)|,)
+      | (?P<name>[A-Za-z_][A-Za-z0-9_]*(?:\.[A-Za-z_][A-Za-z0-9_]*)*)
+    )""", re.VERBOSE)
+
+
+class CompiledRule:
+    def __init__(self, text: str, predicate, pure: bool, constant: bool, event_paths=(), reads_obj=False):
+        """
+        :param predicate: predicate(event, obj) -> bool
+        :param pure: The result only depends on the event and object, not on assignments made so far
+        :param constant: The result doesn't depend on anything (ALWAYS, NEVER, ANY)
+        :param event_paths: Resolvers for every `event.` path the rule reads
+        :param reads_obj: The rule reads `obj.` paths
+        """
+
+        self.text = text
+        self.predicate = predicate
+        self.pure = pure
+        self.constant = constant
+        self.event_paths = tuple(event_paths)
+        self.reads_obj = reads_obj
+
+    def event_key(self, event):
+        """
+        Values of the event attributes the rule reads. For a pure rule, two events with the same key allow the same
+        objects (e.x. every game in an age group for `obj.age >= event.age_group.age + 2`)
+        """
+
+        return tuple(resolve((event, None)) for resolve in self.event_paths)
+
+
+def tokenize(text):
+    tokens = []
+    pos = 0
+    text = text.rstrip()
+    while pos < len(text):
+        match = TOKEN_RE.match(text, pos)
+        if not match or match.end() == pos:
+            raise RuleSyntaxError(f"Unexpected {text[pos:].strip()!r} in rule {text!r}")
+
+        kind = match.lastgroup
+        tokens.append((kind, match.group(kind)))
+        pos = match.end()
+
+    return tokens
+
+
+def parse_time(value):
+    value = value.upper().replace(" ", "")
+    if value.endswith("AM") or value.endswith("PM"):
+        return datetime.strptime(value, "%I:%M%p").time()
+    return datetime.strptime(value, "%H:%M").time()
+
+
+def compile_path(dotted):
+    root, *path = dotted.split(".")
+    index = ROOTS.get(root.lower())
+    if index is None:
+        raise RuleSyntaxError(f"Unknown name {root!r}, attribute paths start with event or obj")
+
+    path = tuple(path)
+
+    def resolve(args):
+        value = args[index]
+        for part in path:
+            value = getattr(value, part, None)
+            if value is None:
+                return None
+            if callable(value):
+                value = value()
+        return value
+
+    return resolve, not IMPURE_ATTRIBUTES.intersection(path), index
+
+
+class Parser:
+    def __init__(self, text):
+        self.text = text
+        self.tokens = tokenize(text)
+        self.pos = 0
+        self.pure = True
+        self.event_paths = []
+        self.reads_obj = False
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def keyword(self, word):
+        kind, value = self.peek()
+        if kind == "name" and value.upper() == word:
+            self.pos += 1
+            return True
+        return False
+
+    def op(self, *ops):
+        kind, value = self.peek()
+        if kind == "op" and value in ops:
+            self.pos += 1
+            return value
+        return None
+
+    def expect(self, op):
+        if not self.op(op):
+            raise RuleSyntaxError(f"Expected {op!r} in rule {self.text!r}")
+
+    def parse(self):
+        condition = self.condition()
+        if self.pos != len(self.tokens):
+            raise RuleSyntaxError(f"Unexpected {self.peek()[1]!r} in rule {self.text!r}")
+        return condition
+
+    def condition(self):
+        left = self.and_condition()
+        while self.keyword("OR"):
+            right = self.and_condition()
+            left = (lambda a, b: lambda args: a(args) or b(args))(left, right)
+        return left
+
+    def and_condition(self):
+        left = self.not_condition()
+        while self.keyword("AND"):
+            right = self.not_condition()
+            left = (lambda a, b: lambda args: a(args) and b(args))(left, right)
+        return left
+
+    def not_condition(self):
+        if self.keyword("NOT"):
+            inner = self.not_condition()
+            return lambda args: not inner(args)
+        return self.comparison()
+
+    def comparison(self):
+        left, left_type = self.expression()
+
+        if self.keyword("IN"):
+            right, right_type = self.expression()
+
+            def contains(args):
+                try:
+                    return _in(left(args), right(args))
+                except (TypeError, ArithmeticError):
+                    return False
+
+            return contains
+
+        kind, value = self.peek()
+        if kind != "op" or value not in COMPARISONS:
+            def truthy(args):  # Truthiness of the operand
+                try:
+                    return left(args)
+                except (TypeError, ArithmeticError):
+                    return False
+
+            return truthy
+
+        self.pos += 1
+        compare = COMPARISONS[value]
+        right, right_type = self.expression()
+
+        # Compare datetimes against time literals by their time of day
+        if right_type is time and left_type is not time:
+            left = _time_of_day(left)
+        if left_type is time and right_type is not time:
+            right = _time_of_day(right)
+
+        def compare_operands(args):
+            # Operands that can't be compared or computed (e.x. datetime + 2, dividing by 0) don't match
+            try:
+                a = left(args)
+                b = right(args)
+                if a is None or b is None:
+                    return compare is operator.eq and a is b or compare is operator.ne and a is not b
+                return compare(a, b)
+            except (TypeError, ArithmeticError):
+                return False
+
+        return compare_operands
+
+    def expression(self):
+        left, left_type = self.term()
+        while True:
+            op = self.op("+", "-")
+            if not op:
+                return left, left_type
+            right, right_type = self.term()
+            left, left_type = _arithmetic(ARITHMETIC[op], left, right), None
+
+    def term(self):
+        left, left_type = self.operand()
+        while True:
+            op = self.op("*", "/")
+            if not op:
+                return left, left_type
+            right, right_type = self.operand()
+            left, left_type = _arithmetic(ARITHMETIC[op], left, right), None
+
+    def operand(self):
+        kind, value = self.peek()
+        if kind is None:
+            raise RuleSyntaxError(f"Rule {self.text!r} ended unexpectedly")
+
+        self.pos += 1
+        if kind == "op" and value == "(":
+            # Either a grouped condition or a tuple for IN
+            items = [self.condition()]
+            while self.op(","):
+                items.append(self.condition())
+            self.expect(")")
+            if len(items) == 1:
+                return items[0], None
+            return (lambda items: lambda args: tuple(item(args) for item in items))(items), tuple
+        if kind == "op" and value == "-":
+            inner, inner_type = self.operand()
+            return _arithmetic(operator.sub, lambda args: 0, inner), inner_type
+        if kind == "time":
+            return _literal(parse_time(value)), time
+        if kind == "number":
+            return _literal(float(value) if "." in value else int(value)), None
+        if kind == "string":
+            return _literal(value[1:-1]), str
+        if kind == "name":
+            upper = value.upper()
+            if upper in ("TRUE", "FALSE", "NONE"):
+                return _literal({"TRUE": True, "FALSE": False, "NONE": None}[upper]), None
+
+            resolve, pure, root = compile_path(value)
+            self.pure = self.pure and pure
+            if root == ROOTS["event"]:
+                self.event_paths.append(resolve)
+            else:
+                self.reads_obj = True
+            return resolve, None
+
+        raise RuleSyntaxError(f"Unexpected {value!r} in rule {self.text!r}")
+
+
+def _literal(value):
+    return lambda args: value
+
+
+def _time_of_day(operand):
+    def resolve(args):
+        value = operand(args)
+        return value.time() if isinstance(value, datetime) else value
+    return resolve
+
+
+def _arithmetic(op, left, right):
+    def resolve(args):
+        a = left(args)
+        b = right(args)
+        if a is None or b is None:
+            return None
+        return op(a, b)
+    return resolve
+
+
+def _in(value, container):
+    try:
+        return value in container if container else False
+    except TypeError:
+        return False
+
+
+@lru_cache(maxsize=None)
+def compile_rule(text: str):
+    """
+    Compile rule text into a CompiledRule once, rules with the same text share it
+    """
+
+    stripped = text.strip()
+    if stripped.upper() in CONSTANTS:
+        result = CONSTANTS[stripped.upper()]
+        return CompiledRule(text, lambda event, obj: result, True, True)
+
+    if stripped[:4].upper() == "WHEN" and stripped[4:5].isspace():
+        stripped = stripped[5:]
+
+    parser = Parser(stripped)
+    condition = parser.parse()
+    return CompiledRule(text, lambda event, obj: bool(condition((event, obj))), parser.pure, False,
+                        parser.event_paths, parser.reads_obj)
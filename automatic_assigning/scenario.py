@@ -0,0 +1,274 @@
+"""
+What-if scenarios: fork the models, change them (move events, drop objects, assign again), diff the result against the
+state the fork started from, then commit or discard it
+
+    with fork() as what_if:
+        for game in field2.get_events(Game):
+            game.start_time += timedelta(hours=1)
+        Referee.objects.unregister(ref3.pk)
+        Assigner().assign_events(Game)
+
+        if not what_if.diff().unassigned:
+            what_if.commit()
+    # Discarded unless committed
+
+Changes are made in place and the fork records what they overwrite the first time each thing is touched (copy on
+write of the undo information), so forking costs nothing and memory grows with what the fork changes. Touched are:
+model attributes, slots' assigned objects, schedules (objects' and EventGroups'), availabilities and registry
+membership.
+Nothing else reads the old state while the fork is open, so it is one what-if at a time per registry. Forks can nest:
+committing an inner fork hands its changes to the outer one.
+"""
+from contextvars import ContextVar
+
+from .registry import Registry, active_registry
+
+_MISSING = object()
+
+
+class ScenarioDiff:
+    def __init__(self):
+        self.assignments = []  # [(slot, objects before, objects after)] of slots whose objects changed
+        self.attributes = []  # [(model, attribute, before, after)] of public attributes that changed
+        self.added = []  # Models registered in the fork
+        self.removed = []  # Models unregistered in the fork
+
+    @property
+    def unassigned(self):
+        """
+        Slot places emptied by the fork, as [(slot, object)]
+        """
+
+        return [(slot, obj) for slot, before, after in self.assignments for obj in before if obj not in after]
+
+    def __bool__(self):
+        return bool(self.assignments or self.attributes or self.added or self.removed)
+
+    def __repr__(self):
+        return (f"ScenarioDiff({len(self.assignments)} slots, {len(self.attributes)} attributes, "
+                f"{len(self.added)} added, {len(self.removed)} removed)")
+
+
+class Scenario:
+    def __init__(self, registry: Registry = None):
+        """
+        Use fork() instead of creating one directly
+
+        :param registry: Registry the scenario's models are in, defaults to the active one
+        """
+
+        self.registry = registry if registry is not None else active_registry()
+        self.parent: Scenario | None = None
+        self.open = False
+
+        # What the fork overwrote, by id of the thing touched (models aren't all hashable)
+        self._attributes = {}  # {(id(model), name): (model, name, value or _MISSING)}
+        self._slots = {}  # {id(slot): (slot, [objects])}
+        self._schedules = {}  # {id(schedule): (schedule, [events])}
+        self._states = {}  # {id(obj): (obj, __dict__ copy)}
+        self._event_groups = {}  # {id(group): group}, relinked from their schedules
+        self._members = {}  # {(id(manager), pk): (manager, pk, instance or _MISSING)}
+        self._sequences = {}  # {id(manager): (manager, last pk)}
+        self._orders = {}  # {id(manager): (manager, [pk])} of managers that lost members, to register them back in order
+
+        self._token = None
+        self._registry_scope = None
+
+    def __enter__(self):
+        if self.open:
+            raise ValueError("Scenario is already open")
+
+        self.parent = _active.get()
+        self._registry_scope = self.registry.activate()
+        self._registry_scope.__enter__()
+        self._token = _active.set(self)
+        self.open = True
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if self.open:
+            self.discard()
+
+    def _close(self):
+        if not self.open:
+            raise ValueError("Scenario isn't open")
+        if _active.get() is not self:
+            raise ValueError("Close the scenarios forked inside this one first")
+
+        _active.reset(self._token)
+        self._registry_scope.__exit__(None, None, None)
+        self.open = False
+
+    # Recording, called by the models before they change something
+
+    def touch_attribute(self, model, name: str):
+        key = (id(model), name)
+        if key not in self._attributes:
+            self._attributes[key] = (model, name, getattr(model, name, _MISSING))
+
+    def touch_slot(self, slot):
+        if id(slot) not in self._slots:
+            self._slots[id(slot)] = (slot, list(getattr(slot, "assigned_objects", ())))
+
+    def touch_schedule(self, schedule):
+        if id(schedule) not in self._schedules:
+            self._schedules[id(schedule)] = (schedule, list(schedule))
+
+    def touch_state(self, obj):
+        if id(obj) not in self._states:
+            self._states[id(obj)] = (obj, obj.__dict__.copy())
+
+    def touch_event_group(self, group):
+        self._event_groups.setdefault(id(group), group)
+
+    def touch_member(self, manager, pk):
+        key = (id(manager), pk)
+        if key not in self._members:
+            obj = manager.instances.get(pk, _MISSING)
+            self._members[key] = (manager, pk, obj)
+            if obj is not _MISSING and id(manager) not in self._orders:
+                self._orders[id(manager)] = (manager, list(manager.instances))
+
+    def touch_sequence(self, manager):
+        if id(manager) not in self._sequences:
+            self._sequences[id(manager)] = (manager, manager._last_pk)
+
+    # Ending the scenario
+
+    def diff(self):
+        """
+        What the fork changed so far, compared to the state it started from
+        """
+
+        diff = ScenarioDiff()
+        for slot, before in self._slots.values():
+            after = list(slot.assigned_objects)
+            if before != after:
+                diff.assignments.append((slot, before, after))
+
+        for model, name, before in self._attributes.values():
+            if name.startswith("_") or name == "assigned_objects":
+                continue
+            after = getattr(model, name, _MISSING)
+            if before is not after and before != after:
+                diff.attributes.append((model, name, None if before is _MISSING else before,
+                                        None if after is _MISSING else after))
+
+        for manager, pk, before in self._members.values():
+            after = manager.instances.get(pk, _MISSING)
+            if before is after:
+                continue
+            if before is not _MISSING:
+                diff.removed.append(before)
+            if after is not _MISSING:
+                diff.added.append(after)
+
+        return diff
+
+    def commit(self):
+        """
+        Keep the changes (an inner fork hands them to the outer one, so discarding that still undoes them)
+        """
+
+        self._close()
+        parent = self.parent
+        if parent is not None:
+            for mine, theirs in ((self._attributes, parent._attributes), (self._slots, parent._slots),
+                                 (self._schedules, parent._schedules), (self._states, parent._states),
+                                 (self._event_groups, parent._event_groups), (self._members, parent._members),
+                                 (self._sequences, parent._sequences), (self._orders, parent._orders)):
+                for key, value in mine.items():
+                    theirs.setdefault(key, value)
+
+        self._forget()
+
+    def discard(self):
+        """
+        Put back everything the fork changed
+        """
+
+        self._close()
+        recording = _active.set(None)  # Putting things back isn't a change for an outer fork to record
+        try:
+            with self.registry.activate():
+                self._restore()
+        finally:
+            _active.reset(recording)
+        self._forget()
+
+    def _restore(self):
+        from .models import AssignedObjects, AssignmentGroup, AssignmentRule, AssignmentSlot
+
+        groups = {}  # {id(group): AssignmentGroup} whose indexes need rebuilding
+        for model, name, value in self._attributes.values():
+            if value is _MISSING:
+                try:
+                    object.__delattr__(model, name)
+                except AttributeError:
+                    pass
+            else:
+                object.__setattr__(model, name, value)
+            if isinstance(model, AssignmentGroup):
+                groups[id(model)] = model
+            elif isinstance(model, AssignmentSlot) and model.group is not None:
+                groups[id(model.group)] = model.group
+            elif name in model._indexed_fields:
+                type(model).objects.reindex(model)
+
+        for obj, state in self._states.values():
+            obj.__dict__.clear()
+            obj.__dict__.update(state)
+
+        # Events are back at their old start times, so schedules sort them as they were
+        for schedule, events in self._schedules.values():
+            schedule.clear()
+            schedule.extend(events)
+        for group in self._event_groups.values():
+            group.relink()
+
+        for slot, objects in self._slots.values():
+            object.__setattr__(slot, "assigned_objects", AssignedObjects(slot, objects))
+            if slot.group is not None:
+                groups[id(slot.group)] = slot.group
+        for group in groups.values():
+            group._index_slots()
+
+        for manager, pk, obj in self._members.values():
+            if obj is _MISSING:
+                manager.unregister(pk)
+            elif manager.instances.get(pk) is not obj:
+                manager.register(pk, obj)
+        for manager, last_pk in self._sequences.values():
+            manager.reset_sequence(last_pk)
+        for manager, pks in self._orders.values():
+            instances = manager.instances
+            ordered = {pk: instances[pk] for pk in pks}
+            instances.clear()
+            instances.update(ordered)
+
+        AssignmentRule.clear_caches()  # Memoized against the fork's attributes
+
+    def _forget(self):
+        self._attributes = {}
+        self._slots = {}
+        self._schedules = {}
+        self._states = {}
+        self._event_groups = {}
+        self._members = {}
+        self._sequences = {}
+        self._orders = {}
+
+
+_active: ContextVar[Scenario | None] = ContextVar("automatic_assigning_scenario", default=None)
+
+
+def active_scenario() -> Scenario | None:
+    return _active.get()
+
+
+def fork(registry: Registry = None):
+    """
+    Start a what-if scenario on the registry (defaults to the active one), use it as a context manager
+    """
+
+    return Scenario(registry)
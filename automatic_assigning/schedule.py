@@ -0,0 +1,264 @@
+import weakref
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+
+from .scenario import active_scenario
+
+
+class Schedule:
+    _per_day = None  # Schedules pickled before the tallies existed
+    _duty_per_day = None
+
+    def __init__(self, events=()):
+        """
+        Events kept sorted by start time (e.x. what an AssignmentObject has been assigned to, the events in an
+        EventGroup), so overlap and buffer checks only have to look at the few events that could possibly collide
+        instead of the whole list.
+
+        :param events: Events to start the schedule with
+        """
+
+        self._starts: list[datetime] = []
+        self._events: list = []
+        self._max_duration = timedelta(0)
+        self._watchers = None  # {watcher: key}, see watch
+        self._per_day = None  # {date: events starting on it}, see per_day
+        self._duty_per_day = None  # {date: duration of the events starting on it}, see duty_per_day
+
+        for event in events:
+            self.append(event)
+
+    def watch(self, watcher, key):
+        """
+        Call `watcher.schedule_changed(key, start, end, added)` whenever an event is added or removed. For a removal,
+        end is only an upper bound (the event may have been moved since it was added). Watchers are held weakly.
+        """
+
+        if self._watchers is None:
+            self._watchers = weakref.WeakKeyDictionary()
+        self._watchers[watcher] = key
+
+    def _touch(self):
+        scenario = active_scenario()
+        if scenario is not None:
+            scenario.touch_schedule(self)
+
+    def _notify(self, start: datetime, end: datetime, added: bool):
+        for watcher, key in list(self._watchers.items()):
+            watcher.schedule_changed(key, start, end, added)
+
+    def append(self, event):
+        """
+        Insert the event at its start time position (the name is kept so `obj.schedule.append(event)` keeps working)
+
+        :return: Position the event was inserted at
+        """
+
+        self._touch()
+        index = bisect_right(self._starts, event.start_time)
+        self._starts.insert(index, event.start_time)
+        self._events.insert(index, event)
+
+        duration = event.end_time - event.start_time
+        if duration > self._max_duration:
+            self._max_duration = duration
+
+        if self._per_day is not None:
+            day = event.start_time.date()
+            self._per_day[day] = self._per_day.get(day, 0) + 1
+        if self._duty_per_day is not None:
+            day = event.start_time.date()
+            self._duty_per_day[day] = self._duty_per_day.get(day, timedelta(0)) + duration
+
+        if self._watchers:
+            self._notify(event.start_time, event.end_time, True)
+
+        return index
+
+    def extend(self, events):
+        for event in events:
+            self.append(event)
+
+    def remove(self, event):
+        index = self._index(event)
+        if index is None:
+            raise ValueError(f"{event} is not in schedule")
+
+        self._touch()
+        start = self._starts[index]
+        del self._starts[index]
+        del self._events[index]
+
+        if self._per_day is not None:
+            day = start.date()
+            count = self._per_day[day] - 1
+            if count:
+                self._per_day[day] = count
+            else:
+                del self._per_day[day]
+        if self._duty_per_day is not None:
+            day = start.date()
+            duty = self._duty_per_day[day] - (event.end_time - event.start_time)
+            if duty > timedelta(0):
+                self._duty_per_day[day] = duty
+            else:
+                del self._duty_per_day[day]
+
+        if self._watchers:
+            self._notify(start, start + self._max_duration, False)
+
+    def discard(self, event):
+        if self._index(event) is not None:
+            self.remove(event)
+
+    def clear(self):
+        self._touch()
+        cleared = (self._starts[0], self._starts[-1] + self._max_duration) if self._events else None
+
+        self._starts = []
+        self._events = []
+        self._max_duration = timedelta(0)
+        if self._per_day is not None:
+            self._per_day = {}
+        if self._duty_per_day is not None:
+            self._duty_per_day = {}
+
+        if self._watchers and cleared:
+            self._notify(*cleared, False)
+
+    def _index(self, event):
+        lo = bisect_left(self._starts, event.start_time)
+        hi = bisect_right(self._starts, event.start_time, lo)
+        for i in range(lo, hi):
+            if self._events[i] is event:
+                return i
+
+        # The event's start time may have been changed after it was added, fall back to a scan
+        for i, scheduled in enumerate(self._events):
+            if scheduled is event:
+                return i
+
+        return None
+
+    def per_day(self):
+        """
+        :return: {date: number of events starting on it}, counted once on the first call and kept up to date from then
+            on (by the start time each event was added with, like removals)
+        """
+
+        if self._per_day is None:
+            self._per_day = {}
+            for start in self._starts:
+                day = start.date()
+                self._per_day[day] = self._per_day.get(day, 0) + 1
+        return self._per_day
+
+    def duty_per_day(self):
+        """
+        :return: {date: total duration of the events starting on it}, kept up to date like per_day (removals take off
+            the event's current duration)
+        """
+
+        if self._duty_per_day is None:
+            self._duty_per_day = {}
+            for start, event in zip(self._starts, self._events):
+                day = start.date()
+                self._duty_per_day[day] = self._duty_per_day.get(day, timedelta(0)) + event.end_time - event.start_time
+        return self._duty_per_day
+
+    @property
+    def longest(self):
+        """
+        Longest duration of the events added since the schedule was last cleared
+        """
+
+        return self._max_duration
+
+    def between(self, start: datetime, end: datetime):
+        """
+        Events that start in [start, end)
+        """
+
+        lo = bisect_left(self._starts, start)
+        hi = bisect_left(self._starts, end, lo)
+        return self._events[lo:hi]
+
+    def conflicts(self, start: datetime, end: datetime, buffer: timedelta = timedelta(0), gap=None):
+        """
+        Find the first scheduled event that collides with [start, end). An event collides if it overlaps the range,
+        or if it ends less than `buffer` before the range starts.
+
+        Only events starting after `start - buffer - longest duration` can reach the range, so this is a bisect plus
+        a scan of the handful of events in that window.
+
+        :param gap: Function of a scheduled event to the buffer it needs instead (e.x. TravelTimes.before), `buffer`
+            has to be the longest it returns
+        """
+
+        if not self._events:
+            return None
+
+        lower = start - buffer - self._max_duration
+        lo = bisect_right(self._starts, lower)
+        hi = bisect_left(self._starts, end, lo)
+        for i in range(hi - 1, lo - 1, -1):
+            scheduled = self._events[i]
+            if scheduled.end_time + (buffer if gap is None else gap(scheduled)) > start:
+                return scheduled
+
+        return None
+
+    def overlapping(self, start: datetime, end: datetime):
+        """
+        Every scheduled event that overlaps [start, end)
+        """
+
+        lo = bisect_right(self._starts, start - self._max_duration) if self._events else 0
+        hi = bisect_left(self._starts, end, lo)
+        return [event for event in self._events[lo:hi] if event.end_time > start]
+
+    def previous(self, start: datetime):
+        """
+        Last scheduled event starting before `start`
+        """
+
+        index = bisect_left(self._starts, start)
+        return self._events[index - 1] if index > 0 else None
+
+    def following(self, start: datetime):
+        """
+        First scheduled event starting at or after `start`
+        """
+
+        index = bisect_left(self._starts, start)
+        return self._events[index] if index < len(self._events) else None
+
+    def __iter__(self):
+        return iter(self._events)
+
+    def __len__(self):
+        return len(self._events)
+
+    def __bool__(self):
+        return bool(self._events)
+
+    def __getitem__(self, index):
+        return self._events[index]
+
+    def __contains__(self, event):
+        return self._index(event) is not None
+
+    def __eq__(self, other):
+        if isinstance(other, Schedule):
+            return self._events == other._events
+        if isinstance(other, list):
+            return self._events == other
+        return False
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_watchers"] = None  # Watchers don't follow a copy
+        return state
+
+    def __repr__(self):
+        return f"Schedule({self._events!r})"
@@ -0,0 +1,223 @@
+"""
+Binary snapshots of the model registry
+
+A snapshot file is a header, the registry, then any number of appended assignment deltas:
+
+    MAGIC | manifest length | states length (little endian uint64s) | manifest | states | delta...
+
+- manifest: pickle of [(model class, pk_field, last auto pk, [pk, ...]), ...]
+- states: pickle of each registered instance's state, in manifest order. References to registered instances are
+  stored as their position in the manifest, so every instance is pickled on its own instead of recursing through the
+  whole graph
+- delta: uint32 length + pickle of (event, start time, assigned objects per group/slot), written by append_assignments.
+  References are stored as (class, pk) here. Replaying a delta overwrites the event's assignments, so the last delta
+  for an event wins
+
+Loading reads and unpickles the whole file up front, so it takes time and memory in proportion to the registry.
+Snapshots are not memory mapped and nothing is loaded lazily: the models reference each other as plain objects, so
+materializing records on demand would need a proxy around every reference. To load only what a run touches, keep the
+models in a storage.SQLiteStorage and attach it instead. Snapshots are pickles, and unpickling can run arbitrary code:
+only load snapshots you wrote yourself, never ones from an untrusted source.
+"""
+import io
+import os
+import pickle
+import struct
+
+from .models import Event, Model
+
+MAGIC = b"AASNAP\x00\x01"
+HEADER = struct.Struct("<8sQQ")
+DELTA_LENGTH = struct.Struct("<I")
+
+
+class SnapshotError(ValueError):
+    pass
+
+
+def _model_classes(model_cls=Model):
+    for subclass in model_cls.__subclasses__():
+        yield subclass
+        yield from _model_classes(subclass)
+
+
+def _pk(obj):
+    return getattr(obj, type(obj).pk_field or "pk", None)
+
+
+class _StatesPickler(pickle.Pickler):
+    def __init__(self, file, refs: dict):
+        super().__init__(file, pickle.HIGHEST_PROTOCOL)
+        self.refs = refs  # {id(instance): position in the manifest}
+
+    def persistent_id(self, obj):
+        return self.refs.get(id(obj))
+
+
+class _DeltaPickler(pickle.Pickler):
+    def persistent_id(self, obj):
+        if isinstance(obj, Model):
+            pk = _pk(obj)
+            if type(obj)._instances.get(pk) is obj:
+                return type(obj), pk
+        return None
+
+
+class _DeltaUnpickler(pickle.Unpickler):
+    def persistent_load(self, pid):
+        cls, pk = pid
+        try:
+            return cls._instances[pk]
+        except KeyError:
+            raise SnapshotError(f"Snapshot references a {cls.__name__} that doesn't exist: {pk!r}") from None
+
+
+def _state(obj):
+    # What object.__getstate__ (Python 3.11+) returns, __reduce_ex__ gives the same on older versions
+    return obj.__reduce_ex__(pickle.HIGHEST_PROTOCOL)[2]
+
+
+def _restore(obj, state):
+    if hasattr(type(obj), "__setstate__"):
+        obj.__setstate__(state)
+        return
+
+    # Default object state: __dict__, or (__dict__, slots) for slotted classes. Skips __setattr__ so nothing is
+    # reindexed or regrouped half built
+    dict_state, slots_state = state if isinstance(state, tuple) else (state, None)
+    for part in (dict_state, slots_state):
+        for name, value in (part or {}).items():
+            object.__setattr__(obj, name, value)
+
+
+def save(path, model_cls=Model):
+    """
+    Write every registered instance of model_cls's subclasses to a new snapshot, replacing the file (and its deltas)
+    """
+
+    manifest = []
+    states = []
+    refs = {}
+    for cls in _model_classes(model_cls):
+        if not cls._instances:
+            continue
+
+        manifest.append((cls, cls.pk_field, cls.objects._last_pk, list(cls._instances)))
+        for obj in cls._instances.values():
+            refs[id(obj)] = len(refs)
+            states.append(_state(obj))
+
+    manifest_data = pickle.dumps(manifest, pickle.HIGHEST_PROTOCOL)
+    buffer = io.BytesIO()
+    _StatesPickler(buffer, refs).dump(states)
+    states_data = buffer.getvalue()
+
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(manifest_data), len(states_data)))
+        f.write(manifest_data)
+        f.write(states_data)
+    os.replace(tmp, path)
+
+
+def load(path, model_cls=Model):
+    """
+    Replace the registries of model_cls's subclasses with a snapshot's, then replay its assignment deltas. Everything
+    is loaded eagerly. Only load trusted snapshots (see above)
+
+    :return: Number of deltas replayed
+    """
+
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < HEADER.size:
+        raise SnapshotError(f"Not a snapshot file: {path}")
+
+    return _load(data, model_cls)
+
+
+def _load(data: bytes, model_cls):
+    magic, manifest_length, states_length = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise SnapshotError("Not a snapshot file")
+
+    stream = io.BytesIO(data)
+    offset = HEADER.size
+    stream.seek(offset)
+    manifest = pickle.load(stream)
+    offset += manifest_length
+
+    # Create every instance first so the states can reference each other
+    instances = []
+    for cls, pk_field, last_pk, pks in manifest:
+        new = cls.__new__
+        instances += [new(cls) for _ in pks]
+
+    stream.seek(offset)
+    unpickler = pickle.Unpickler(stream)
+    unpickler.persistent_load = instances.__getitem__
+    states = unpickler.load()
+    offset += states_length
+
+    for cls in _model_classes(model_cls):
+        cls.objects.clear()
+
+    position = 0
+    for cls, pk_field, last_pk, pks in manifest:
+        cls.pk_field = pk_field
+        for pk in pks:
+            obj = instances[position]
+            _restore(obj, states[position])
+            cls.objects.register(pk, obj)
+            position += 1
+        cls.objects.reset_sequence(last_pk)
+
+    replayed = 0
+    while offset + DELTA_LENGTH.size <= len(data):
+        length, = DELTA_LENGTH.unpack_from(data, offset)
+        offset += DELTA_LENGTH.size
+        if offset + length > len(data):
+            break  # Cut off while being appended
+
+        stream.seek(offset)
+        _apply_delta(*_DeltaUnpickler(stream).load())
+        offset += length
+        replayed += 1
+
+    return replayed
+
+
+def append_assignments(path, events: list[Event]):
+    """
+    Append the events' current start times and assignments to a snapshot (e.x. the events changed by
+    Assigner.reschedule or Assigner.withdraw), instead of saving everything again.
+    Only assignments and start times are recorded, other changes (like blackouts) need a full save.
+    """
+
+    with open(path, "ab") as f:
+        for event in events:
+            assignments = [[list(slot.assigned_objects) for slot in group.slots] for group in event.assignment_groups]
+            buffer = io.BytesIO()
+            _DeltaPickler(buffer, pickle.HIGHEST_PROTOCOL).dump((event, event.start_time, assignments))
+            data = buffer.getvalue()
+            f.write(DELTA_LENGTH.pack(len(data)))
+            f.write(data)
+
+
+def _apply_delta(event: Event, start_time, assignments):
+    for group in event.assignment_groups:
+        for slot in group.slots:
+            for obj in slot.assigned_objects:
+                if obj is not None:
+                    obj.schedule.discard(event)
+        group.clear()
+
+    if event.start_time != start_time:
+        event.start_time = start_time
+
+    for group, slots in zip(event.assignment_groups, assignments):
+        for slot, objs in zip(group.slots, slots):
+            slot.assigned_objects = list(objs)
+            for obj in objs:
+                if obj is not None:
+                    obj.schedule.append(event)
@@ -0,0 +1,92 @@
+PHASES = ("continuity", "needed", "candidates", "flow_build", "flow_solve", "repair")
+REASONS = ("blackout", "unavailable", "overlap", "buffer", "in_group", "rule", "workload", "other")
+
+
+class AssignerStats:
+    def __init__(self):
+        """
+        Counters and timers for one Assigner.assign_events run, pass one to Assigner(stats=...) to turn them on.
+        Subclass and override assigned_object/rejected/unassigned_slot to hook into the run (they also keep the counters, so call
+        super()). Hooks aren't called for events assigned in worker processes, only the counters are merged back.
+
+        - seconds: {phase: seconds}, see PHASES
+        - group_seconds: {stay in group EventGroup name (or None): seconds spent assigning its events}
+        - examined: Candidates checked with can_be_assigned that were rejected or assigned
+        - prefiltered: Candidates skipped by the slot rule's eligibility bitset without being checked
+        - booked: Eligible candidates skipped because the pool's booking index has them busy at the time (also counted
+          in rejections and examined, under the reason can_be_assigned would have given)
+        - rejections: {reason: count}, see REASONS ("other" is a can_be_assigned override refusing)
+        - rule_rejections: {rule text: count}
+        - workload_rejections: {workload limit (repr): count}
+        - assigned / unassigned: Slot places filled / left empty by the main pass
+        - repaired: Empty slot places filled afterwards by the repair pass
+        """
+
+        self.seconds = dict.fromkeys(PHASES, 0.0)
+        self.group_seconds = {}
+        self.prefiltered = 0
+        self.booked = 0
+        self.rejections = dict.fromkeys(REASONS, 0)
+        self.rule_rejections = {}
+        self.workload_rejections = {}
+        self.assigned = 0
+        self.unassigned = 0
+        self.repaired = 0
+
+    @property
+    def examined(self):
+        return sum(self.rejections.values()) + self.assigned
+
+    def add_group_time(self, group, seconds: float):
+        name = group.name if group is not None else None
+        self.group_seconds[name] = self.group_seconds.get(name, 0.0) + seconds
+
+    def assigned_object(self, event, slot, obj):
+        self.assigned += 1
+
+    def rejected(self, event, slot, obj, reason: str):
+        self.rejections[reason] += 1
+        if reason == "rule":
+            text = slot.rule.rule_text
+            self.rule_rejections[text] = self.rule_rejections.get(text, 0) + 1
+        elif reason == "workload":
+            limit = repr(obj.blocking_limit(event))
+            self.workload_rejections[limit] = self.workload_rejections.get(limit, 0) + 1
+
+    def unassigned_slot(self, event, slot):
+        self.unassigned += 1
+
+    def merge(self, other: "AssignerStats"):
+        for phase, seconds in other.seconds.items():
+            self.seconds[phase] = self.seconds.get(phase, 0.0) + seconds
+        for name, seconds in other.group_seconds.items():
+            self.group_seconds[name] = self.group_seconds.get(name, 0.0) + seconds
+        for reason, count in other.rejections.items():
+            self.rejections[reason] = self.rejections.get(reason, 0) + count
+        for text, count in other.rule_rejections.items():
+            self.rule_rejections[text] = self.rule_rejections.get(text, 0) + count
+        for limit, count in other.workload_rejections.items():
+            self.workload_rejections[limit] = self.workload_rejections.get(limit, 0) + count
+
+        self.prefiltered += other.prefiltered
+        self.booked += other.booked
+        self.assigned += other.assigned
+        self.unassigned += other.unassigned
+        self.repaired += other.repaired
+
+    def report(self):
+        """
+        :return: Human readable summary
+        """
+
+        lines = [f"Assigned {self.assigned}, unassigned {self.unassigned}, repaired {self.repaired}",
+                 f"Candidates examined {self.examined}, prefiltered {self.prefiltered}, booked {self.booked}"]
+        lines += [f"  {phase}: {seconds:.4f}s" for phase, seconds in self.seconds.items() if seconds]
+        lines += [f"  rejected ({reason}): {count}" for reason, count in self.rejections.items() if count]
+        for text, count in sorted(self.rule_rejections.items(), key=lambda item: -item[1]):
+            lines.append(f"  rule {text!r}: {count}")
+        for limit, count in sorted(self.workload_rejections.items(), key=lambda item: -item[1]):
+            lines.append(f"  workload {limit}: {count}")
+        for name, seconds in sorted(self.group_seconds.items(), key=lambda item: -item[1]):
+            lines.append(f"  group {name}: {seconds:.4f}s")
+        return "\n".join(lines)
@@ -0,0 +1,405 @@
+"""
+Storage backends: load models into the registry and write assignment runs back
+
+SQLiteStorage keeps each mapped model class in a table (see Table) plus:
+
+- assignments: (event_table, event_pk, assignment_group, slot, position, object_table, object_pk), one row per assigned
+  object, replaced per event by save_assignments
+- runs / scheduled_counts: when each save_assignments ran, and how many objects it scheduled per slot name
+
+Every write is one transaction of batched executemany calls. Connections are opened per thread (and per process), and
+reused by the calls made from that thread.
+"""
+import os
+import sqlite3
+import threading
+import weakref
+from datetime import date, datetime, time, timedelta
+from typing import Callable, Iterable, Protocol, Type
+
+from .indexes import compile_lookup
+from .models import AssignmentGroup, Event, Model
+
+_CONVERTERS = {
+    datetime: (datetime.isoformat, datetime.fromisoformat),
+    date: (date.isoformat, date.fromisoformat),
+    time: (time.isoformat, time.fromisoformat),
+    timedelta: (timedelta.total_seconds, lambda seconds: timedelta(seconds=seconds)),
+}
+_UNFILTERABLE = object()
+_CHUNK = 500  # Most values bound in one IN (...)
+
+
+class StorageError(ValueError):
+    pass
+
+
+class Storage(Protocol):
+    def load(self, model_cls: Type[Model], **filters) -> int:
+        """
+        Register the stored instances of model_cls that may match the filters (ModelObjectsManager.filter keyword
+        arguments) in the active registry
+
+        :return: Number of instances created
+        """
+
+    def save_assignments(self, events: list[Event], scheduled_count: dict = None) -> None:
+        """
+        Store the events' assignments (replacing what was stored for them) and the run's scheduled counts
+        """
+
+
+def _quote(name: str):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _pk(obj):
+    return getattr(obj, type(obj).pk_field or "pk")
+
+
+class Table:
+    def __init__(self, model_cls: Type[Model], columns: Iterable[str], name: str = None, pk: str = "pk",
+                 types: dict = None, references: dict = None, attributes: dict[str, str | Callable] = None,
+                 indexes: Iterable[str] = ()):
+        """
+        How a model class is stored. Each column is an argument of the class's constructor, so rows are loaded with
+        `model_cls.objects.bulk_create`
+
+        :param columns: Constructor arguments stored as columns
+        :param name: Table name, defaults to the class name
+        :param pk: Primary key column, one of the columns, or "pk" for auto-increment classes (stored on its own).
+            Stored as it is, without types or references
+        :param types: {column: datetime, date, time or timedelta} for values SQLite can't store as they are
+        :param references: {column: model class} for columns holding another model's primary key
+        :param attributes: {column: attribute name or function of the instance} for columns that aren't stored in the
+            attribute of the same name (e.x. {"age_group": "event_type"})
+        :param indexes: Columns to index besides the primary key, the references and the columns of the class's
+            field indexes
+        """
+
+        self.model_cls = model_cls
+        self.columns = tuple(columns)
+        self.name = name or model_cls.__name__
+        self.pk = pk
+        self.auto_pk = pk not in self.columns
+        self.types = types or {}
+        self.references = references or {}
+        self.attributes = {column: column for column in self.columns}
+        self.attributes.update(attributes or {})
+
+        # {attribute filters use: column}, only attributes stored as they are can be filtered on in SQL
+        self.filterable = {attribute: column for column, attribute in self.attributes.items()
+                           if isinstance(attribute, str)}
+        if self.auto_pk:
+            self.filterable["pk"] = self.pk
+
+        indexed = {self.filterable[index.path[0]] for index in model_cls.indexes if index.path[0] in self.filterable}
+        self.indexes = [column for column in self.columns
+                        if column in self.references or column in indexed or column in indexes]
+
+        self.select = f"SELECT {', '.join(map(_quote, (self.pk, ) + self.columns))} FROM {_quote(self.name)}"
+        self.stored = (self.pk, ) + tuple(column for column in self.columns if column != self.pk)
+
+    def encode(self, column: str, value):
+        if value is None:
+            return None
+
+        ref_cls = self.references.get(column)
+        if ref_cls is not None:
+            return _pk(value) if isinstance(value, ref_cls) else _UNFILTERABLE
+
+        value_type = self.types.get(column)
+        if value_type is not None:
+            return _CONVERTERS[value_type][0](value) if isinstance(value, value_type) else _UNFILTERABLE
+
+        return value
+
+    def decode(self, column: str, value):
+        if value is None:
+            return None
+
+        ref_cls = self.references.get(column)
+        if ref_cls is not None:
+            return ref_cls._instances[value]
+
+        value_type = self.types.get(column)
+        if value_type is not None:
+            return _CONVERTERS[value_type][1](value)
+
+        return value
+
+    def pk_of(self, obj):
+        return obj.pk if self.auto_pk else self.read(obj, self.pk)
+
+    def read(self, obj, column: str):
+        attribute = self.attributes[column]
+        if isinstance(attribute, str):
+            return getattr(obj, attribute, None)
+        return attribute(obj)
+
+    def row(self, obj):
+        """
+        Values of the stored columns (pk first)
+        """
+
+        return (self.pk_of(obj), ) + tuple(self.encode(column, self.read(obj, column)) for column in self.stored[1:])
+
+    def where(self, filters: dict):
+        """
+        SQL for the filters it can check (eq and in on a stored attribute), the rest are left to
+        ModelObjectsManager.filter. The rows it selects are a superset of what the filters match
+
+        :return: (WHERE clause or "", parameters), or (None, None) if nothing can match
+        """
+
+        clauses = []
+        params = []
+        for key, value in filters.items():
+            path, lookup = compile_lookup(key)
+            column = self.filterable.get(path[0]) if len(path) == 1 else None
+            if column is None or lookup not in ("eq", "in"):
+                continue
+
+            if lookup == "eq":
+                encoded = self.encode(column, value)
+                if encoded is _UNFILTERABLE:
+                    continue
+                if encoded is None:
+                    clauses.append(f"{_quote(column)} IS NULL")
+                else:
+                    clauses.append(f"{_quote(column)} = ?")
+                    params.append(encoded)
+            else:
+                encoded = [self.encode(column, v) for v in value] if value else []
+                if any(v is _UNFILTERABLE or v is None for v in encoded):
+                    continue
+                if not encoded:
+                    return None, None
+                clauses.append(f"{_quote(column)} IN ({', '.join('?' * len(encoded))})")
+                params += encoded
+
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+
+class SQLiteStorage:
+    def __init__(self, path: str, tables: Iterable[Table]):
+        """
+        :param path: Database file (every thread opens its own connection, so not ":memory:")
+        :param tables: How each stored model class is mapped
+        """
+
+        self.path = path
+        self.tables: dict[Type[Model], Table] = {table.model_cls: table for table in tables}
+        self._by_name = {table.name: table for table in self.tables.values()}
+        self._local = threading.local()
+        self._loaded = weakref.WeakKeyDictionary()  # {ModelObjectsManager: True} once all of its rows are loaded
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_local"], state["_loaded"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+        self._loaded = weakref.WeakKeyDictionary()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """
+        This thread's connection, opened on first use
+        """
+
+        local = self._local
+        if getattr(local, "pid", None) != os.getpid():  # Not opened yet, or inherited from the parent process
+            local.connection = sqlite3.connect(self.path)
+            local.pid = os.getpid()
+        return local.connection
+
+    def close(self):
+        """
+        Close this thread's connection
+        """
+
+        if getattr(self._local, "pid", None) == os.getpid():
+            self._local.connection.close()
+        self._local = threading.local()
+
+    def table(self, model_cls: Type[Model]):
+        try:
+            return self.tables[model_cls]
+        except KeyError:
+            raise StorageError(f"{model_cls.__name__} isn't stored in {self.path}") from None
+
+    def create_tables(self):
+        with self.connection as connection:
+            for table in self.tables.values():
+                columns = [f"{_quote(table.pk)} PRIMARY KEY"] + [_quote(column) for column in table.stored[1:]]
+                connection.execute(f"CREATE TABLE IF NOT EXISTS {_quote(table.name)} ({', '.join(columns)})")
+                for column in table.indexes:
+                    connection.execute(f"CREATE INDEX IF NOT EXISTS {_quote(f'{table.name}_{column}')} "
+                                       f"ON {_quote(table.name)} ({_quote(column)})")
+
+            connection.execute("CREATE TABLE IF NOT EXISTS assignments (event_table TEXT, event_pk, "
+                               "assignment_group TEXT, slot TEXT, position INTEGER, object_table TEXT, object_pk)")
+            connection.execute("CREATE INDEX IF NOT EXISTS assignments_event ON assignments (event_table, event_pk)")
+            connection.execute("CREATE TABLE IF NOT EXISTS runs (run INTEGER PRIMARY KEY, finished TEXT)")
+            connection.execute("CREATE TABLE IF NOT EXISTS scheduled_counts (run INTEGER, slot TEXT, amount INTEGER)")
+
+    def attach(self, *model_classes: Type[Model]):
+        """
+        Load the classes' rows on demand: `objects.filter` / `objects.get` first load the rows that may match (the
+        filters SQL can check are pushed down to it), `objects.all` loads every row. Attached in the active registry
+        """
+
+        for model_cls in model_classes:
+            self.table(model_cls)
+            model_cls.objects.source = self
+
+    def save_objects(self, model_cls: Type[Model], objs: Iterable[Model] = None):
+        """
+        Insert (or replace) instances' rows
+
+        :param objs: Defaults to every registered instance of the class
+        """
+
+        table = self.table(model_cls)
+        if objs is None:
+            objs = list(model_cls._instances.values())
+
+        placeholders = ", ".join("?" * len(table.stored))
+        columns = ", ".join(map(_quote, table.stored))
+        with self.connection as connection:
+            connection.executemany(f"INSERT OR REPLACE INTO {_quote(table.name)} ({columns}) VALUES ({placeholders})",
+                                   [table.row(obj) for obj in objs])
+
+    def load(self, model_cls: Type[Model], **filters):
+        table = self.table(model_cls)
+        manager = model_cls.objects
+        if self._loaded.get(manager):
+            return 0
+
+        where, params = table.where(filters)
+        if where is None:
+            return 0
+
+        rows = self.connection.execute(table.select + where, params).fetchall()
+        created = self._build(table, manager, rows)
+        if not where:
+            self._loaded[manager] = True
+        return created
+
+    def _load_pks(self, model_cls: Type[Model], pks: set):
+        """
+        Make sure the instances with these pks are registered, loading the missing ones
+        """
+
+        instances = model_cls._instances
+        missing = [pk for pk in pks if pk not in instances]
+        if not missing:
+            return
+
+        if model_cls in self.tables:
+            table = self.tables[model_cls]
+            for i in range(0, len(missing), _CHUNK):
+                chunk = missing[i:i + _CHUNK]
+                rows = self.connection.execute(
+                    f"{table.select} WHERE {_quote(table.pk)} IN ({', '.join('?' * len(chunk))})", chunk).fetchall()
+                self._build(table, model_cls.objects, rows)
+
+        missing = [pk for pk in missing if pk not in instances]
+        if missing:
+            raise StorageError(f"Stored rows reference {model_cls.__name__}s that don't exist: {missing[:10]}")
+
+    def _build(self, table: Table, manager, rows: list):
+        instances = manager.instances
+        rows = [row for row in rows if row[0] not in instances]
+        if not rows:
+            return 0
+
+        for column, ref_cls in table.references.items():
+            i = table.columns.index(column) + 1
+            self._load_pks(ref_cls, {row[i] for row in rows if row[i] is not None})
+
+        columns = table.columns
+        kwargs = [{column: table.decode(column, value) for column, value in zip(columns, row[1:])} for row in rows]
+        manager.bulk_create(kwargs, pks=[row[0] for row in rows] if table.auto_pk else None)
+        return len(rows)
+
+    def save_assignments(self, events: list[Event], scheduled_count: dict = None):
+        keys = []
+        rows = []
+        for event in events:
+            event_table = self.table(type(event))
+            event_pk = event_table.pk_of(event)
+            keys.append((event_table.name, event_pk))
+
+            for field in event._group_fields:
+                group = getattr(event, field, None)
+                if not isinstance(group, AssignmentGroup):
+                    continue
+
+                for slot in group.slots:
+                    for position, obj in enumerate(slot.assigned_objects):
+                        if obj is not None:
+                            object_table = self.table(type(obj))
+                            rows.append((event_table.name, event_pk, field, slot.name, position, object_table.name,
+                                         object_table.pk_of(obj)))
+
+        with self.connection as connection:  # One transaction
+            connection.executemany("DELETE FROM assignments WHERE event_table = ? AND event_pk = ?", keys)
+            connection.executemany("INSERT INTO assignments VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            if scheduled_count:
+                run = connection.execute("INSERT INTO runs (finished) VALUES (?)",
+                                         (datetime.now().isoformat(), )).lastrowid
+                connection.executemany("INSERT INTO scheduled_counts VALUES (?, ?, ?)",
+                                       [(run, slot, amount) for slot, amount in scheduled_count.items()])
+
+    def load_assignments(self, events: list[Event]):
+        """
+        Replace the events' assignments with the stored ones, adding the events to their objects' schedules (objects
+        that aren't loaded yet are)
+        """
+
+        by_key = {}
+        for event in events:
+            event_table = self.table(type(event))
+            by_key[(event_table.name, event_table.pk_of(event))] = event
+
+        rows = []
+        for table_name in {table_name for table_name, pk in by_key}:
+            pks = [pk for name, pk in by_key if name == table_name]
+            for i in range(0, len(pks), _CHUNK):
+                chunk = pks[i:i + _CHUNK]
+                rows += self.connection.execute(
+                    f"SELECT event_table, event_pk, assignment_group, slot, object_table, object_pk FROM assignments "
+                    f"WHERE event_table = ? AND event_pk IN ({', '.join('?' * len(chunk))}) ORDER BY position",
+                    [table_name] + chunk).fetchall()
+
+        wanted = {}  # {object table: {pk}}
+        for row in rows:
+            wanted.setdefault(row[4], set()).add(row[5])
+        for table_name, pks in wanted.items():
+            table = self._by_name.get(table_name)
+            if table is None:
+                raise StorageError(f"Assignments reference a table that isn't mapped: {table_name}")
+            self._load_pks(table.model_cls, pks)
+
+        for event in by_key.values():
+            for group in event.assignment_groups:
+                for slot in group.slots:
+                    for obj in slot.assigned_objects:
+                        if obj is not None:
+                            obj.schedule.discard(event)
+                group.clear()
+
+        for event_table, event_pk, field, slot_name, object_table, object_pk in rows:
+            event = by_key[(event_table, event_pk)]
+            group = getattr(event, field, None)
+            slot = group.get_slot(slot_name) if isinstance(group, AssignmentGroup) else None
+            if slot is None:
+                raise StorageError(f"Stored assignment to a slot {event_pk} doesn't have: {field}.{slot_name}")
+
+            obj = self._by_name[object_table].model_cls._instances[object_pk]
+            slot.assigned_objects.append(obj)
+            obj.schedule.append(event)
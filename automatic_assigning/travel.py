@@ -0,0 +1,133 @@
+from datetime import timedelta
+from typing import Iterable
+
+from .models import Event, EventGroup
+
+
+class TravelTimes:
+    def __init__(self, groups: Iterable[EventGroup], default: timedelta = timedelta(minutes=15)):
+        """
+        Time an object needs between the end of one event and the start of the next depending on where both are
+        (venues, airports), kept as a dense row-major matrix so a lookup is an index, not a search. Give it to the
+        AssignmentGroups that should use it instead of their flat assignment_buffer (AssignmentGroup(...,
+        travel_times=times)).
+
+        An event is at the first of its EventGroups that is in the matrix. Its position is kept on the event, so
+        lookups don't go through a dictionary (and the matrix doesn't hold on to events).
+
+        :param groups: EventGroups of the matrix
+        :param default: Time between groups nothing was set for, and to or from events at none of the groups
+        """
+
+        self.groups = list(groups)
+        self.positions = {group: i for i, group in enumerate(self.groups)}
+        self.size = len(self.groups)
+        self.default = default
+        self.times = [default] * (self.size * self.size)  # times[from * size + to]
+
+        self._longest = None
+        self._shortest_to = None  # Shortest time into each group, from any group (or the default)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[tuple], default: timedelta = timedelta(minutes=15), symmetric: bool = True):
+        """
+        :param rows: (from EventGroup, to EventGroup, time)
+        :param symmetric: Use each time both ways
+        """
+
+        rows = list(rows)
+        groups = {}
+        for a, b, time in rows:
+            groups[a] = groups[b] = None
+
+        travel_times = cls(groups, default)
+        for a, b, time in rows:
+            travel_times.set(a, b, time, symmetric)
+        return travel_times
+
+    def set(self, a: EventGroup, b: EventGroup, time: timedelta, symmetric: bool = True):
+        i, j = self.positions[a], self.positions[b]
+        self.times[i * self.size + j] = time
+        if symmetric:
+            self.times[j * self.size + i] = time
+
+        self._longest = None
+        self._shortest_to = None
+
+    def venue(self, event: Event):
+        """
+        :return: Position of the event's group in the matrix, -1 if it isn't at any
+        """
+
+        cached = getattr(event, "_venue", None)
+        if cached is not None and cached[0] is self and cached[1] is event.groups:
+            return cached[2]
+
+        position = -1
+        for group in event.groups:
+            position = self.positions.get(group, -1)
+            if position >= 0:
+                break
+
+        object.__setattr__(event, "_venue", (self, event.groups, position))  # A cache, not a change to record
+        return position
+
+    def index(self, events: Iterable[Event]):
+        """
+        Look up the events' groups ahead of time (e.x. before a run), so checks don't have to
+        """
+
+        for event in events:
+            self.venue(event)
+
+    def between(self, previous: Event, event: Event):
+        """
+        Time needed between the end of `previous` and the start of `event`
+        """
+
+        i, j = self.venue(previous), self.venue(event)
+        if i < 0 or j < 0:
+            return self.default
+        return self.times[i * self.size + j]
+
+    def before(self, event: Event):
+        """
+        :return: Function of an earlier event to the time needed between it and `event`, with `event`'s group looked
+            up once
+        """
+
+        j = self.venue(event)
+        default = self.default
+        if j < 0:
+            return lambda previous: default
+
+        times, size, venue = self.times, self.size, self.venue
+
+        def gap(previous):
+            i = venue(previous)
+            return times[i * size + j] if i >= 0 else default
+
+        return gap
+
+    @property
+    def longest(self):
+        """
+        Longest time between any two events
+        """
+
+        if self._longest is None:
+            self._longest = max(self.times + [self.default])
+        return self._longest
+
+    def shortest_before(self, event: Event):
+        """
+        Shortest time any earlier event can need before this one
+        """
+
+        if self._shortest_to is None:
+            size = self.size
+            self._shortest_to = [min([self.times[i * size + j] for i in range(size)] + [self.default])
+                                 for j in range(size)]
+
+        j = self.venue(event)
+        return self._shortest_to[j] if j >= 0 else self.default
@@ -0,0 +1,123 @@
+"""
+Workload limits, declared per AssignmentObject class
+
+    class Referee(AssignmentObject):
+        workload_limits = (MaxEventsPerDay(4), MaxDuty(timedelta(hours=8), within=timedelta(hours=12)),
+                           MinRest(timedelta(hours=10)))
+
+can_be_assigned refuses an object one of its limits blocks, stats count that as a "workload" rejection. Limits only
+read the object's schedule, which keeps its events sorted and tallied per day (count and duty) as they are added and
+removed, so a check is a few lookups or a bisect plus a look at the few events within the limit's window, however long
+the schedule gets.
+"""
+from bisect import bisect_left
+from datetime import timedelta
+from itertools import accumulate
+
+
+class WorkloadLimit:
+    reach = timedelta(0)  # How far apart two events can be and still both count against the limit
+
+    def allows(self, obj, event):
+        """
+        :return: If the object can take the event on top of what is in its schedule
+        """
+
+        raise NotImplementedError
+
+
+class MaxEventsPerDay(WorkloadLimit):
+    def __init__(self, count: int):
+        """
+        :param count: Most events starting on one day
+        """
+
+        self.count = count
+        self.reach = timedelta(days=1)
+
+    def allows(self, obj, event):
+        return obj.schedule.per_day().get(event.start_time.date(), 0) < self.count
+
+    def __repr__(self):
+        return f"MaxEventsPerDay({self.count})"
+
+
+class MaxDuty(WorkloadLimit):
+    def __init__(self, duty: timedelta, within: timedelta):
+        """
+        :param duty: Most time spent in events in any rolling window
+        :param within: Length of the window
+        """
+
+        self.duty = duty
+        self.within = within
+        self.reach = within
+
+    def allows(self, obj, event):
+        start, end, within = event.start_time, event.end_time, self.within
+        schedule = obj.schedule
+
+        # Every event a window covering this one can reach starts on one of these days, if they don't even hold the
+        # limit between them no window can break it
+        duty = end - start
+        day, last = (start - within - schedule.longest).date(), (end + within).date()
+        per_day = schedule.duty_per_day()
+        while day <= last and duty <= self.duty:
+            duty += per_day.get(day, timedelta(0))
+            day += timedelta(days=1)
+        if duty <= self.duty:
+            return True
+
+        intervals = [(e.start_time, e.end_time) for e in schedule.overlapping(start - within, end + within)]
+        intervals.append((start, end))
+
+        # Duty before t is sum(t - s for starts before t) - sum(t - e for ends before t), a bisect into each
+        starts = sorted(s for s, _ in intervals)
+        ends = sorted(e for _, e in intervals)
+        start_sums, end_sums = list(accumulate(s - start for s in starts)), list(accumulate(e - start for e in ends))
+
+        def duty_before(t):
+            i, j = bisect_left(starts, t), bisect_left(ends, t)
+            return (t - start) * (i - j) - (start_sums[i - 1] if i else timedelta(0)) + \
+                (end_sums[j - 1] if j else timedelta(0))
+
+        # A window holds the most duty when it starts at an event's start or ends at an event's end
+        for window_start in set(starts) | {e - within for e in ends}:
+            window_end = window_start + within
+            if window_end <= start or window_start >= end:
+                continue  # Doesn't cover the new event, was within the limit before
+            if duty_before(window_end) - duty_before(window_start) > self.duty:
+                return False
+
+        return True
+
+    def __repr__(self):
+        return f"MaxDuty({self.duty}, within={self.within})"
+
+
+class MinRest(WorkloadLimit):
+    def __init__(self, rest: timedelta):
+        """
+        :param rest: Least time between the last event of a day and the first event of the next day the object works
+        """
+
+        self.rest = rest
+        self.reach = rest
+
+    def allows(self, obj, event):
+        day = event.start_time.date()
+
+        previous = obj.schedule.previous(event.start_time)
+        if previous is not None and previous.start_time.date() != day and \
+                event.start_time - previous.end_time < self.rest:
+            return False
+
+        following = obj.schedule.following(event.start_time)
+        if following is not None and following.start_time.date() != day and \
+                following.start_time - event.end_time < self.rest:
+            return False
+
+        return True
+
+    def __repr__(self):
+        return f"MinRest({self.rest})"
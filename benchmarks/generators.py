@@ -0,0 +1,178 @@
+"""
+Synthetic workloads for the benchmarks, every generator is deterministic for a given seed
+"""
+import random
+from datetime import datetime, time, timedelta
+
+from automatic_assigning.models import ANY_RULE, AssignmentGroup, AssignmentObject, AssignmentRule, AssignmentSlot, \
+    Event, EventGroup, EventType, Model
+from demo.models import AgeGroup, FieldGroup, Game, Referee
+
+START = datetime(2025, 6, 7, 8, 0)  # A Saturday
+
+
+def reset_registries(model_cls=Model):
+    for subclass in model_cls.__subclasses__():
+        subclass.objects.clear()
+        reset_registries(subclass)
+
+
+def league(events: int = 200, objects: int = 60, groups: int = 8, slots_per_group: int = 3,
+           rule_density: float = 0.5, days: int = 2, seed: int = 0):
+    """
+    Youth soccer league on the demo models: `groups` fields playing `events` games back to back over `days` days,
+    refereed by `objects` referees
+
+    :param slots_per_group: Slots per game, a center plus assistants
+    :param rule_density: Share of slots with an age rule (the referee has to be 2 years older than the age group)
+    :return: Game class, the games
+    """
+
+    rng = random.Random(seed)
+    age_groups = []
+    for age, minutes in ((10, 55), (12, 65), (14, 80), (16, 90)):
+        age_group = AgeGroup(f"U{age}", timedelta(minutes=minutes))
+        age_group.age = age
+        age_groups.append(age_group)
+
+    for i in range(objects):
+        referee = Referee(f"Ref {i}")
+        referee.age = rng.randint(12, 40)
+
+    older = AssignmentRule("WHEN obj.age >= event.event_type.age + 2")
+    fields = [FieldGroup(f"Field {f}") for f in range(groups)]
+    per_field_day = max(1, -(-events // (groups * days)))
+
+    games = []
+    for f, field in enumerate(fields):
+        for day in range(days):
+            start = START + timedelta(days=day, minutes=rng.choice((0, 15, 30)))
+            for g in range(per_field_day):
+                if len(games) >= events:
+                    break
+
+                age_group = rng.choice(age_groups)
+                game = Game(f"F{f}D{day}G{g}", f"Field {f} game {g}", age_group, start, field)
+
+                slots = [AssignmentSlot("Center Referee", Referee, rule=_maybe(older, rule_density, rng))]
+                for a in range(1, slots_per_group):
+                    slots.append(AssignmentSlot(f"Assistant Referee {a}", Referee,
+                                                rule=_maybe(older, rule_density / 2, rng)))
+                game.referees = AssignmentGroup(*slots)
+
+                games.append(game)
+                start += age_group.default_duration + timedelta(minutes=rng.choice((10, 20, 30)))
+
+    return Game, games
+
+
+class Airport(EventGroup):
+    def __init__(self, code):
+        super().__init__(code, try_keep_assignments_in_group=False)
+
+
+class Route(EventGroup):
+    def __init__(self, name):
+        super().__init__(name, try_keep_assignments_in_group=True)
+
+
+class FlightType(EventType):
+    def __init__(self, name, duration: timedelta, seats: int):
+        self.seats = seats
+        super().__init__(name, duration)
+
+
+class CrewMember(AssignmentObject):
+    __slots__ = ("name", "rank", "ratings")
+
+    def __init__(self, name, rank: int, ratings: tuple):
+        self.name = name
+        self.rank = rank  # 3 captain, 2 first officer, 1 flight attendant
+        self.ratings = ratings
+        super().__init__([(weekday, time(5, 0), time(23, 0)) for weekday in range(7)], False)
+
+
+class Aircraft(AssignmentObject):
+    __slots__ = ("name", "type_name", "seats")
+
+    def __init__(self, tail, type_name, seats: int):
+        self.name = tail
+        self.type_name = type_name
+        self.seats = seats
+        super().__init__([], True)
+
+
+class Flight(Event):
+    __slots__ = ("crew", "aircraft")
+    assignment_group_fields = ("crew", "aircraft")
+
+    def __init__(self, flight_number, flight_type, start_time, route, origin, destination, slots_per_group, rules):
+        super().__init__(flight_number, flight_number, flight_type, start_time, groups=[origin, destination, route])
+
+        captain = AssignmentSlot("Captain", CrewMember, rule=rules["captain"])
+        first_officer = AssignmentSlot("First Officer", CrewMember, rule=rules["first_officer"])
+        attendants = AssignmentSlot("Flight Attendant", CrewMember, max(1, slots_per_group - 2), rule=rules["attendant"])
+        self.crew = AssignmentGroup(captain, first_officer, attendants, assignment_buffer=timedelta(minutes=45))
+        self.aircraft = AssignmentGroup(AssignmentSlot("Aircraft", Aircraft, rule=rules["aircraft"]),
+                                        assignment_buffer=timedelta(minutes=30))
+
+
+def airline(events: int = 200, objects: int = 120, groups: int = 10, slots_per_group: int = 5,
+            rule_density: float = 0.5, days: int = 2, seed: int = 0):
+    """
+    Regional airline: `events` flights on `groups` routes between a handful of airports, crewed from `objects` crew
+    members (plus a fleet of aircraft a tenth of that size)
+
+    :param slots_per_group: Crew slots per flight, captain and first officer plus flight attendants
+    :param rule_density: Share of crew slots that also check the crew member is rated for the aircraft type
+    :return: Flight class, the flights
+    """
+
+    rng = random.Random(seed)
+    types = [FlightType("E175", timedelta(minutes=75), 76), FlightType("A320", timedelta(minutes=120), 150)]
+    airports = [Airport(code) for code in ("BOS", "JFK", "ORD", "DCA", "ATL", "MIA")]
+    routes = []
+    for r in range(groups):
+        origin, destination = rng.sample(airports, 2)
+        routes.append((Route(f"{origin.name}-{destination.name} #{r}"), origin, destination, rng.choice(types)))
+
+    for i in range(objects):
+        rank = 3 if i % 6 == 0 else 2 if i % 6 == 1 else 1
+        ratings = tuple(t.name for t in types if rng.random() < 0.7) or (types[0].name,)
+        CrewMember(f"Crew {i}", rank, ratings)
+
+    for i in range(max(2, objects // 10)):
+        flight_type = types[i % len(types)]
+        Aircraft(f"N{100 + i}", flight_type.name, flight_type.seats)
+
+    aircraft_rule = AssignmentRule("WHEN obj.type_name == event.event_type.name AND obj.seats >= event.event_type.seats")
+    rank_rules = {}
+    for slot, rank in (("captain", 3), ("first_officer", 2), ("attendant", 1)):
+        rank_rules[slot] = (AssignmentRule(f"WHEN obj.rank == {rank}"),
+                            AssignmentRule(f"WHEN obj.rank == {rank} AND event.event_type.name IN obj.ratings"))
+
+    per_route_day = max(1, -(-events // (groups * days)))
+    flights = []
+    for route, origin, destination, flight_type in routes:
+        for day in range(days):
+            start = START + timedelta(days=day, hours=6, minutes=rng.choice((0, 20, 40)))
+            for leg in range(per_route_day):
+                if len(flights) >= events:
+                    break
+
+                frm, to = (origin, destination) if leg % 2 == 0 else (destination, origin)
+                rules = {slot: rated if rng.random() < rule_density else plain
+                         for slot, (plain, rated) in rank_rules.items()}
+                rules["aircraft"] = aircraft_rule
+                flights.append(Flight(f"{route.name}/{day}/{leg}", flight_type, start, route, frm, to,
+                                      slots_per_group, rules))
+                start += flight_type.default_duration + timedelta(minutes=rng.choice((40, 55, 70)))
+
+    return Flight, flights
+
+
+def _maybe(rule, density, rng):
+    return rule if rng.random() < density else ANY_RULE
+
+
+SCENARIOS = {"league": league, "airline": airline}
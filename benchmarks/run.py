@@ -0,0 +1,220 @@
+"""
+Benchmark the Assigner and ModelObjectsManager hot paths on synthetic workloads
+
+python -m benchmarks.run                                    # Default matrix, prints a table
+python -m benchmarks.run --scenario airline --events 2000 --objects 400 --output results.json
+python -m benchmarks.run --compare before.json after.json  # Compare two result files (e.x. from two commits)
+python -m benchmarks.run --stats                            # Also print rejection counters and phase timings
+"""
+import argparse
+import contextlib
+import gc
+import io
+import itertools
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+from automatic_assigning import Assigner
+from automatic_assigning.models import Model
+from automatic_assigning.ordering import ORDERS
+from automatic_assigning.stats import AssignerStats
+
+from .generators import SCENARIOS, reset_registries
+
+
+class BulkRow(Model):
+    def __init__(self, name):
+        self.name = name
+        super().__init__()
+
+
+def fill_rate(events):
+    needed = 0
+    filled = 0
+    for event in events:
+        for group in event.assignment_groups:
+            for slot in group.slots:
+                if slot.should_assign:
+                    needed += slot.amount
+                    filled += len(slot.assigned_objects)
+
+    return filled / needed if needed else 1.0
+
+
+def measure(fn, memory: bool):
+    """
+    :return: (result, seconds, peak bytes allocated while running or None)
+    """
+
+    gc.collect()
+    if memory:
+        tracemalloc.start()
+
+    start = time.perf_counter()
+    try:
+        res = fn()
+        seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] if memory else None
+    finally:
+        if memory:
+            tracemalloc.stop()
+
+    return res, seconds, peak
+
+
+def bench_assign(params: dict, strategy: str, workers: int, memory: bool, stats: bool = False, order: str = "pool"):
+    reset_registries()
+    event_class, events = SCENARIOS[params["scenario"]](**{k: v for k, v in params.items() if k != "scenario"})
+
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return Assigner(strategy=strategy, workers=workers, stats=AssignerStats() if stats else None,
+                            order=order).assign_events(event_class)
+
+    res, seconds, peak = measure(run, memory)
+    if res is not None:
+        print(res.report(), file=sys.stderr)
+    return {"seconds": seconds, "peak_bytes": peak, "fill_rate": fill_rate(events)}
+
+
+def bench_objects(params: dict, memory: bool):
+    reset_registries()
+    event_class, events = SCENARIOS[params["scenario"]](**{k: v for k, v in params.items() if k != "scenario"})
+    pks = [event.event_id for event in events]
+    groups = list({group: None for event in events for group in event.groups})
+
+    res = {}
+    _, res["get_seconds"], _ = measure(lambda: [event_class.objects.get(pk) for pk in pks], False)
+    _, res["filter_contains_seconds"], _ = measure(
+        lambda: [event_class.objects.filter(groups__contains=group) for group in groups], False)
+    _, res["filter_scan_seconds"], _ = measure(
+        lambda: [event_class.objects.filter(name=event.name) for event in events[:100]], False)
+
+    rows = [(f"Row {i}",) for i in range(params["objects"] * 10)]
+    _, res["bulk_create_seconds"], res["bulk_create_peak_bytes"] = measure(lambda: BulkRow.objects.bulk_create(rows),
+                                                                           memory)
+    res["bulk_create_rows"] = len(rows)
+    return res
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_matrix(args):
+    results = []
+    for scenario, events, objects, groups, slots, density in itertools.product(
+            args.scenario, args.events, args.objects, args.groups, args.slots, args.rule_density):
+        params = {"scenario": scenario, "events": events, "objects": objects, "groups": groups,
+                  "slots_per_group": slots, "rule_density": density, "seed": args.seed}
+
+        for strategy in args.strategy:
+            runs = [bench_assign(params, strategy, args.workers, memory=False, order=args.order)
+                    for _ in range(args.repeat)]
+            res = min(runs, key=lambda r: r["seconds"])
+            if args.memory:
+                res["peak_bytes"] = bench_assign(params, strategy, args.workers, memory=True,
+                                                 order=args.order)["peak_bytes"]
+            if args.stats:
+                bench_assign(params, strategy, args.workers, memory=False, stats=True, order=args.order)
+
+            order = {"order": args.order} if args.order != "pool" else {}  # Keeps keys of older result files
+            results.append({"benchmark": "assign", "strategy": strategy, **order, "workers": args.workers, **params,
+                            **res})
+            print_row(results[-1])
+
+        results.append({"benchmark": "objects", **params, **bench_objects(params, args.memory)})
+        print_row(results[-1])
+
+    return results
+
+
+def print_row(res):
+    name = f"{res['scenario']} {res['events']}x{res['objects']} g={res['groups']} s={res['slots_per_group']} " \
+           f"r={res['rule_density']}"
+    if res["benchmark"] == "assign":
+        peak = f", peak {res['peak_bytes'] / 2 ** 20:.1f} MiB" if res["peak_bytes"] is not None else ""
+        strategy = f"{res['strategy']} {res['order']}" if "order" in res else res["strategy"]
+        print(f"{name:<40} {strategy:>6}: {res['seconds']:.3f}s, fill rate {res['fill_rate']:.1%}{peak}",
+              file=sys.stderr)
+    else:
+        print(f"{name:<40} objects: get {res['get_seconds']:.4f}s, contains {res['filter_contains_seconds']:.4f}s, "
+              f"scan {res['filter_scan_seconds']:.4f}s, bulk_create {res['bulk_create_seconds']:.3f}s",
+              file=sys.stderr)
+
+
+def result_key(res):
+    return tuple(res.get(k) for k in ("benchmark", "strategy", "order", "workers", "scenario", "events", "objects",
+                                      "groups", "slots_per_group", "rule_density", "seed"))
+
+
+def compare(before_path, after_path):
+    with open(before_path) as f:
+        before = {result_key(res): res for res in json.load(f)["results"]}
+    with open(after_path) as f:
+        after = json.load(f)["results"]
+
+    for res in after:
+        old = before.get(result_key(res))
+        if old is None:
+            continue
+
+        changes = []
+        for metric, value in res.items():
+            if metric.endswith("seconds") or metric.endswith("bytes") or metric == "fill_rate":
+                if isinstance(value, (int, float)) and old.get(metric):
+                    changes.append(f"{metric} {value / old[metric] - 1:+.1%}")
+
+        print(f"{' '.join(str(k) for k in result_key(res) if k is not None)}: {', '.join(changes)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scenario", nargs="+", default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument("--events", nargs="+", type=int, default=[200, 1000])
+    parser.add_argument("--objects", nargs="+", type=int, default=[60])
+    parser.add_argument("--groups", nargs="+", type=int, default=[8])
+    parser.add_argument("--slots", nargs="+", type=int, default=[3])
+    parser.add_argument("--rule-density", nargs="+", type=float, default=[0.5])
+    parser.add_argument("--strategy", nargs="+", default=list(Assigner.strategies), choices=Assigner.strategies)
+    parser.add_argument("--order", default="pool", choices=ORDERS, help="Candidate order (greedy)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--repeat", type=int, default=1, help="Keep the fastest of this many runs")
+    parser.add_argument("--no-memory", dest="memory", action="store_false", help="Skip the tracemalloc runs")
+    parser.add_argument("--stats", action="store_true", help="Print the Assigner's counters and phase timings")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="Compare two result files")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    results = run_matrix(args)
+    report = {
+        "commit": git_commit(),
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
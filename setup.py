@@ -4,4 +4,5 @@ setup(
     name='automatic_assigning',
     version='0.1',
     packages=find_packages(),
+    python_requires='>=3.10',
 )
\ No newline at end of file
@@ -1,8 +1,36 @@
-from datetime import timedelta, datetime
-from unittest import TestCase
+import asyncio
+import contextlib
+import io
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta, datetime, time, timezone
+from unittest import TestCase, mock
 from automatic_assigning.assigner import Assigner
+from automatic_assigning.async_assigner import AsyncAssigner
 from automatic_assigning.models import Event, EventType, AssignmentGroup, AssignmentSlot, \
-    AssignmentObject, EventGroup, NEVER_RULE
+    AssignmentObject, AssignmentRule, EventGroup, NEVER_RULE
+from automatic_assigning.rules import RuleSyntaxError
+from automatic_assigning.availability import Availability
+from automatic_assigning.candidates import CandidatePool
+from automatic_assigning.indexes import HashIndex
+from automatic_assigning.ordering import CandidateQueue
+from automatic_assigning.parallel import partition
+from automatic_assigning.schedule import Schedule
+from automatic_assigning import snapshot
+from automatic_assigning.registry import Registry
+from automatic_assigning.scenario import fork
+from automatic_assigning.storage import SQLiteStorage, Table
+from automatic_assigning.stats import AssignerStats
+from automatic_assigning.travel import TravelTimes
+from automatic_assigning.workload import MaxDuty, MaxEventsPerDay, MinRest
+from automatic_assigning.models import Model
+
+
+def reset_registries(model_cls=Model):
+    for subclass in model_cls.__subclasses__():
+        subclass.objects.clear()
+        reset_registries(subclass)
 
 
 class FieldGroup(EventGroup):
@@ -31,6 +59,9 @@ class Game(Event):
 
 
 class AssignerTest(TestCase):
+    def tearDown(self):
+        reset_registries()
+
     def setUp(self):
         field1 = FieldGroup("Field 1")
         field2 = FieldGroup("Field 2")
@@ -78,3 +109,1309 @@ class AssignerTest(TestCase):
         self.assertEqual(game21.referees.slots[1].assigned_objects, game22.referees.slots[1].assigned_objects)
 
 
+class ScheduleTest(TestCase):
+    def tearDown(self):
+        reset_registries()
+
+    def setUp(self):
+        self.field = FieldGroup("Field 1")
+        self.u9_10 = AgeGroup("U9/10", timedelta(minutes=55))
+        self.group = AssignmentGroup(AssignmentSlot("Center Referee", Referee))
+
+    def game(self, event_id, hour, minute=0):
+        return Game(event_id, event_id, self.u9_10, datetime(2025, 6, 9, hour, minute), self.field)
+
+    def test_sorted_by_start_time(self):
+        late, early = self.game("S2", 11), self.game("S1", 8)
+        schedule = Schedule([late, early])
+
+        self.assertEqual([early, late], list(schedule))
+        self.assertEqual(early, schedule.previous(datetime(2025, 6, 9, 10)))
+
+        schedule.remove(early)
+        self.assertNotIn(early, schedule)
+        self.assertEqual(1, len(schedule))
+
+    def test_overlap_and_buffer(self):
+        ref = Referee("Ref S")
+        ref.schedule.append(self.game("S1", 8))  # 08:00 - 08:55
+
+        self.assertFalse(ref.is_available(self.game("S2", 8, 30), self.group))  # Overlaps
+        self.assertFalse(ref.is_available(self.game("S3", 9, 5), self.group))   # Inside the 15 minute buffer
+        self.assertTrue(ref.is_available(self.game("S4", 9, 10), self.group))
+        self.assertTrue(ref.is_available(self.game("S5", 7), self.group))       # Ends as S1 starts
+
+
+class AssignmentGroupTest(TestCase):
+    def tearDown(self):
+        reset_registries()
+
+    def test_reverse_index(self):
+        refs = [Referee(f"Ref {i}") for i in range(4)]
+        center, assistant = AssignmentSlot("Center Referee", Referee), AssignmentSlot("Assistant Referee", Referee, 2)
+        group = AssignmentGroup(center, assistant)
+
+        self.assertIs(assistant, group.get_slot("Assistant Referee"))
+        self.assertIsNone(group.get_slot("Fourth Official"))
+
+        group["Center Referee"] = refs[0]
+        assistant.assigned_objects.extend(refs[1:3])
+        self.assertIs(center, group.find_assigned_object(refs[0]))
+        self.assertIs(assistant, group.find_assigned_object(refs[2]))
+
+        del assistant.assigned_objects[0]
+        assistant.assigned_objects.insert(0, refs[3])
+        self.assertIsNone(group.find_assigned_object(refs[1]))
+        self.assertIs(assistant, group.find_assigned_object(refs[3]))
+
+        center.assigned_objects = [refs[1]]  # Replacing the list
+        self.assertIsNone(group.find_assigned_object(refs[0]))
+        self.assertIs(center, group.find_assigned_object(refs[1]))
+
+        group.unassign(refs[3])
+        self.assertEqual([refs[2]], assistant.assigned_objects)
+
+        group.clear()
+        self.assertEqual([], list(group))
+        self.assertIsNone(group.find_assigned_object(refs[2]))
+
+    def test_signature(self):
+        group = AssignmentGroup(AssignmentSlot("Center Referee", Referee), AssignmentSlot("Assistant Referee", Referee))
+        same = AssignmentGroup(AssignmentSlot("Center Referee", Referee), AssignmentSlot("Assistant Referee", Referee))
+        other = AssignmentGroup(AssignmentSlot("Center Referee", Referee))
+
+        self.assertEqual(group, same)
+        self.assertNotEqual(group, other)
+
+        other.slots[0].name = "Assistant Referee"  # Renaming a slot updates the group
+        self.assertEqual(["Assistant Referee"], other.slots_names)
+        self.assertIs(other.slots[0], other.get_slot("Assistant Referee"))
+
+
+class IndexedReferee(AssignmentObject):
+    indexes = (HashIndex("name"),)
+
+    def __init__(self, name):
+        self.name = name
+        super().__init__([], True)
+
+
+class ObjectsManagerTest(TestCase):
+    def tearDown(self):
+        reset_registries()
+
+    def setUp(self):
+        self.field1 = FieldGroup("Field 1")
+        self.field2 = FieldGroup("Field 2")
+        u9_10 = AgeGroup("U9/10", timedelta(minutes=55))
+
+        self.game11 = Game("GAME11", "Game #11", u9_10, datetime(2025, 6, 9, 8, 0), self.field1)
+        self.game12 = Game("GAME12", "Game #12", u9_10, datetime(2025, 6, 9, 9, 30), self.field1)
+        self.game21 = Game("GAME21", "Game #21", u9_10, datetime(2025, 6, 9, 8, 0), self.field2)
+
+    def test_pk_and_contains(self):
+        self.assertIs(self.game11, Game.objects.get("GAME11"))
+        self.assertIsNone(Game.objects.get("GAME99", None))
+        self.assertEqual([self.game11, self.game12], Game.objects.filter(groups__contains=self.field1))
+        self.assertEqual([self.game12], Game.objects.filter(groups__contains=self.field1, name="Game #12"))
+
+    def test_reindex_on_assignment(self):
+        self.game21.groups = [self.field1]
+        self.assertEqual([self.game11, self.game21, self.game12], self.field1.get_events(Game))
+        self.assertEqual([], self.field2.get_events(Game))
+
+        self.game11.groups.append(self.field2)
+        Game.objects.reindex(self.game11)
+        self.assertEqual([self.game11], self.field2.get_events(Game))
+        self.assertEqual([self.game11], Game.objects.filter(groups__contains=self.field2))
+
+    def test_group_order(self):
+        game10 = Game("GAME10", "Game #10", self.game11.event_type, datetime(2025, 6, 9, 6, 30), self.field1)
+
+        self.assertEqual([game10, self.game11, self.game12], self.field1.get_events(Game))
+        self.assertEqual(game10, self.field1.previous_event(self.game11))
+        self.assertIsNone(self.field1.previous_event(game10))
+
+        self.game12.start_time = datetime(2025, 6, 9, 6, 0)
+        self.assertEqual([self.game12, game10, self.game11], self.field1.get_events(Game))
+        self.assertEqual(self.game11, self.field1.next_event(game10))
+
+        game10.add_group(self.field2)
+        game10.remove_group(self.field1)
+        self.assertEqual([game10, self.game21], self.field2.get_events(Game))
+        self.assertEqual(self.game12, self.field1.previous_event(self.game11))
+
+    def test_bulk_create(self):
+        refs = IndexedReferee.objects.bulk_create([("Ref 1",), {"name": "Ref 2"}])
+
+        self.assertEqual([1, 2], [ref.pk for ref in refs])
+        self.assertEqual(refs, IndexedReferee.objects.all())
+        self.assertEqual([refs[1]], IndexedReferee.objects.filter(name="Ref 2"))
+
+        IndexedReferee.objects.reset_sequence(100)
+        self.assertEqual(101, IndexedReferee("Ref 3").pk)
+
+    def test_hash_index(self):
+        ref1, ref2, _ = IndexedReferee("Ref 1"), IndexedReferee("Ref 2"), IndexedReferee("Ref 3")
+
+        self.assertEqual([ref2], IndexedReferee.objects.filter(name="Ref 2"))
+        self.assertEqual([ref1, ref2], IndexedReferee.objects.filter(name__in=["Ref 1", "Ref 2"]))
+
+        ref2.name = "Ref 4"
+        self.assertEqual([], IndexedReferee.objects.filter(name="Ref 2"))
+        self.assertEqual([ref2], IndexedReferee.objects.filter(name="Ref 4"))
+
+
+class Official(AssignmentObject):
+    def __init__(self, name, *qualified_slots):
+        self.name = name
+        self.qualified_slots = qualified_slots
+        super().__init__([], True)
+
+    def can_be_assigned(self, event, slot, group):
+        return slot.name in self.qualified_slots and super().can_be_assigned(event, slot, group)
+
+
+class Match(Event):
+    def __init__(self, event_id, age_group, start_time, field):
+        super().__init__(event_id, event_id, age_group, start_time, groups=[field])
+        self.officials = AssignmentGroup(AssignmentSlot("Center", Official), AssignmentSlot("Assistant", Official))
+
+
+class FlowStrategyTest(TestCase):
+    def tearDown(self):
+        reset_registries()
+
+    def setUp(self):
+        self.field1 = FieldGroup("Field 1")
+        self.field2 = FieldGroup("Field 2")
+        self.u9_10 = AgeGroup("U9/10", timedelta(minutes=55))
+
+    def test_fills_what_greedy_misses(self):
+        # Greedy makes Ref 1 the first center, leaving no assistant for M2
+        Official("Ref 1", "Center", "Assistant")
+        Official("Ref 2", "Center")
+        Official("Ref 3", "Center")
+        Official("Ref 4", "Assistant")
+        m1 = Match("M1", self.u9_10, datetime(2025, 6, 9, 8, 0), self.field1)
+        m2 = Match("M2", self.u9_10, datetime(2025, 6, 9, 8, 0), self.field2)
+
+        Assigner(strategy="flow").assign_events(Match)
+
+        centers = {obj.name for match in (m1, m2) for obj in match.officials["Center"]}
+        assistants = {obj.name for match in (m1, m2) for obj in match.officials["Assistant"]}
+        self.assertEqual({"Ref 2", "Ref 3"}, centers)
+        self.assertEqual({"Ref 1", "Ref 4"}, assistants)
+
+    def test_keeps_assignments_in_group(self):
+        for i in range(4):
+            Official(f"Ref {i}", "Center", "Assistant")
+        m1 = Match("M1", self.u9_10, datetime(2025, 6, 9, 8, 0), self.field1)
+        m2 = Match("M2", self.u9_10, datetime(2025, 6, 9, 9, 30), self.field1)
+
+        Assigner(strategy="flow").assign_events(Match)
+
+        self.assertEqual(m1.officials["Center"], m2.officials["Center"])
+        self.assertEqual(m1.officials["Assistant"], m2.officials["Assistant"])
+
+    def test_unknown_strategy(self):
+        with self.assertRaises(ValueError):
+            Assigner(strategy="random")
+
+
+class AgedReferee(AssignmentObject):
+    def __init__(self, name, age):
+        self.name = name
+        self.age = age
+        super().__init__([], True)
+
+
+class YouthAgeGroup(EventType):
+    def __init__(self, name, duration: timedelta, age):
+        self.age = age
+        super().__init__(name, duration)
+
+
+class YouthGame(Event):
+    def __init__(self, event_id, age_group, start_time, field):
+        super().__init__(event_id, event_id, age_group, start_time, groups=[field], age_group=age_group)
+
+        morning = AssignmentRule("WHEN event.start_time <= 12:00 PM")
+        center_slot = AssignmentSlot("Center Referee", AgedReferee, rule=AssignmentRule("WHEN obj.age >= event.age_group.age + 2"))
+        assistant_slot = AssignmentSlot("Assistant Referee", AgedReferee, 2, should_assign_rule=morning)
+        self.referees = AssignmentGroup(center_slot, assistant_slot)
+
+
+class RuleTest(TestCase):
+    def tearDown(self):
+        reset_registries()
+
+    def setUp(self):
+        self.field = FieldGroup("Field 1")
+        self.u12 = YouthAgeGroup("U12", timedelta(minutes=65), 12)
+
+    def test_constants(self):
+        self.assertTrue(AssignmentRule("ALWAYS").evaluate_should_assign())
+        self.assertFalse(NEVER_RULE.evaluate_should_assign())
+        self.assertTrue(AssignmentRule("ANY").evaluate_can_be_assigned(AgedReferee("Ref 1", 30)))
+
+    def test_conditions(self):
+        game = YouthGame("G1", self.u12, datetime(2025, 6, 9, 11, 0), self.field)
+        young, old = AgedReferee("Ref 1", 13), AgedReferee("Ref 2", 14)
+
+        rule = AssignmentRule("WHEN obj.age >= event.age_group.age + 2")
+        self.assertFalse(rule.evaluate_can_be_assigned(young, game))
+        self.assertTrue(rule.evaluate_can_be_assigned(old, game))
+
+        rule = AssignmentRule("WHEN (obj.age < 14 OR obj.name == 'Ref 2') AND NOT event.name IN ('G2', 'G3')")
+        self.assertTrue(rule.evaluate_can_be_assigned(young, game))
+        self.assertTrue(rule.evaluate_can_be_assigned(old, game))
+
+        self.assertTrue(AssignmentRule("OBJECT.age * 2 > 27").evaluate_can_be_assigned(old))
+        self.assertFalse(AssignmentRule("WHEN event.start_time > 13:00").evaluate_should_assign(game))
+        self.assertFalse(AssignmentRule("WHEN obj.missing.attribute > 1").evaluate_can_be_assigned(old, game))
+
+    def test_arithmetic_errors(self):
+        game = YouthGame("G1", self.u12, datetime(2025, 6, 9, 11, 0), self.field)
+        zero = AgedReferee("Ref 0", 0)
+
+        for text in ("WHEN event.start_time + 2 > 3", "WHEN 12 / obj.age > 1", "WHEN 12 / obj.age",
+                     "WHEN 12 / obj.age IN (1, 2)"):
+            self.assertFalse(AssignmentRule(text).evaluate_can_be_assigned(zero, game), text)
+        self.assertTrue(AssignmentRule("WHEN NOT 12 / obj.age > 1").evaluate_can_be_assigned(zero, game))
+
+    def test_syntax_errors(self):
+        for text in ("WHEN obj.age >=", "WHEN slot.name == 'x'", "WHEN obj.age > 1 )", "SOMETIMES ?"):
+            with self.assertRaises(RuleSyntaxError):
+                AssignmentRule(text)
+
+    def test_memoized_until_cleared(self):
+        game = YouthGame("G1", self.u12, datetime(2025, 6, 9, 11, 0), self.field)
+        rule = AssignmentRule("WHEN event.start_time <= 12:00 PM")
+
+        self.assertTrue(rule.evaluate_should_assign(game))
+        game.start_time = datetime(2025, 6, 9, 13, 0)
+        self.assertTrue(rule.evaluate_should_assign(game))
+        rule.clear_cache()
+        self.assertFalse(rule.evaluate_should_assign(game))
+
+    def test_assigning_with_rules(self):
+        AgedReferee("Ref 1", 13)
+        AgedReferee("Ref 2", 13)
+        AgedReferee("Ref 3", 15)
+        morning = YouthGame("G1", self.u12, datetime(2025, 6, 9, 10, 0), self.field)
+        afternoon = YouthGame("G2", self.u12, datetime(2025, 6, 9, 14, 0), self.field)
+
+        Assigner().assign_events(YouthGame)
+
+        self.assertEqual(["Ref 3"], [obj.name for obj in morning.referees["Center Referee"]])
+        self.assertEqual(["Ref 1", "Ref 2"], [obj.name for obj in morning.referees["Assistant Referee"]])
+        self.assertEqual(["Ref 3"], [obj.name for obj in afternoon.referees["Center Referee"]])
+        self.assertEqual([], afternoon.referees["Assistant Referee"])
+
+
+class CandidatePoolTest(TestCase):
+    def tearDown(self):
+        reset_registries()
+
+    def test_eligibility_shared_by_event_attributes(self):
+        field = FieldGroup("Field 1")
+        u10 = YouthAgeGroup("U10", timedelta(minutes=55), 10)
+        u12 = YouthAgeGroup("U12", timedelta(minutes=65), 12)
+        refs = [AgedReferee(f"Ref {age}", age) for age in (11, 12, 13, 14)]
+        games = [YouthGame(f"G{i}", age_group, datetime(2025, 6, 9, 8 + i), field)
+                 for i, age_group in enumerate((u10, u12, u10, u12))]
+
+        pool = CandidatePool(AgedReferee)
+        rule = AssignmentRule("WHEN obj.age >= event.age_group.age + 2")
+
+        self.assertEqual(refs[1:], list(pool.candidates(rule, games[0])))
+        self.assertEqual(refs[3:], list(pool.candidates(rule, games[1])))
+        self.assertEqual(refs[1:], list(pool.candidates(rule, games[2])))
+        self.assertEqual(2, len(pool._eligible))  # Once per age group
+
+        self.assertEqual(refs, list(pool.candidates(AssignmentRule("ANY"), games[0])))
+        self.assertEqual([], list(pool.candidates(AssignmentRule("WHEN event.age_group.age > 12"), games[0])))
+
+    def test_available(self):
+        field = FieldGroup("Field 1")
+        u10 = AgeGroup("U10", timedelta(minutes=55))
+        refs = [Referee(f"Ref {i}") for i in range(3)]
+        early = Game("G1", "Game #1", u10, datetime(2025, 6, 9, 8), field)
+        late = Game("G2", "Game #2", u10, datetime(2025, 6, 9, 9, 5), field)
+        refs[0].schedule.append(early)
+
+        pool = CandidatePool(Referee)
+        buffer = timedelta(minutes=15)
+        self.assertEqual(0b110, pool.available(early))
+        self.assertEqual(0b110, pool.available(late, buffer))  # 8:55 + 15 minutes
+        self.assertEqual(0b111, pool.available(late))
+
+        refs[1].schedule.append(late)  # Watched after the pool was built
+        refs[0].schedule.append(late)
+        refs[0].schedule.remove(early)
+        self.assertEqual(0b111, pool.available(early))
+        self.assertEqual(0b100, pool.available(late))
+
+        refs[0].schedule.clear()
+        self.assertEqual(0b101, pool.available(late))
+
+
+class LeagueReferee(AssignmentObject):
+    def __init__(self, name, league):
+        self.name = name
+        self.league = league
+        super().__init__([], True)
+
+
+class LeagueGame(Event):
+    def __init__(self, event_id, age_group, start_time, field, league):
+        super().__init__(event_id, event_id, age_group, start_time, groups=[field], league=league)
+
+        same_league = AssignmentRule("WHEN obj.league == event.league")
+        center_slot = AssignmentSlot("Center Referee", LeagueReferee, rule=same_league)
+        assistant_slot = AssignmentSlot("Assistant Referee", LeagueReferee, 2, rule=same_league)
+        self.referees = AssignmentGroup(center_slot, assistant_slot)
+
+
+class ParallelTest(TestCase):
+    def tearDown(self):
+        reset_registries()
+
+    def create_leagues(self):
+        reset_registries()
+        u9_10 = AgeGroup("U9/10", timedelta(minutes=55))
+        for league in ("North", "South", "East"):
+            for i in range(5):
+                LeagueReferee(f"{league} Ref {i}", league)
+            for f in range(2):
+                field = FieldGroup(f"{league} Field {f}")
+                for g in range(4):
+                    start = datetime(2025, 6, 9, 8, 0) + timedelta(minutes=70 * g + 20 * f)
+                    LeagueGame(f"{league}{f}{g}", u9_10, start, field, league)
+
+    def snapshot(self):
+        return {game.event_id: [[obj.name for obj in slot.assigned_objects] for slot in game.referees.slots]
+                for game in LeagueGame.objects.all()}
+
+    def test_partitions(self):
+        self.create_leagues()
+        partitions = partition(Assigner(), LeagueGame.objects.all())
+
+        self.assertEqual(3, len(partitions))
+        self.assertEqual({"North"}, {game.league for game in partitions[0]})
+        self.assertEqual(LeagueGame.objects.all(), [game for events in partitions for game in events])
+
+    def test_one_partition_runs_serially(self):
+        def create_league():
+            self.create_leagues()
+            for obj in LeagueGame.objects.all() + LeagueReferee.objects.all():
+                obj.league = "North"
+
+        create_league()
+        Assigner().assign_events(LeagueGame)
+        serial = self.snapshot()
+
+        create_league()
+        self.assertEqual(1, len(partition(Assigner(), LeagueGame.objects.all())))
+        with mock.patch("automatic_assigning.parallel.ProcessPoolExecutor", side_effect=AssertionError):
+            Assigner(workers=2).assign_events(LeagueGame)
+        self.assertEqual(serial, self.snapshot())
+
+    def test_same_as_serial(self):
+        for strategy in Assigner.strategies:
+            self.create_leagues()
+            Assigner(strategy=strategy).assign_events(LeagueGame)
+            serial = self.snapshot()
+
+            self.create_leagues()
+            Assigner(strategy=strategy, workers=2).assign_events(LeagueGame)
+            self.assertEqual(serial, self.snapshot())
+
+            schedules = {ref.name: [game.event_id for game in ref.schedule] for ref in LeagueReferee.objects.all()}
+            for game_id, slots in serial.items():
+                for names in slots:
+                    for name in names:
+                        self.assertIn(game_id, schedules[name])
+
+
+class IncrementalTest(TestCase):
+    def tearDown(self):
+        reset_registries()
+
+    def setUp(self):
+        self.field1 = FieldGroup("Field 1")
+        self.field2 = FieldGroup("Field 2")
+        u9_10 = AgeGroup("U9/10", timedelta(minutes=55))
+
+        self.refs = [Referee(f"Ref {i}") for i in range(9)]
+        self.game11 = Game("GAME11", "Game #11", u9_10, datetime(2025, 6, 9, 8, 0), self.field1)
+        self.game12 = Game("GAME12", "Game #12", u9_10, datetime(2025, 6, 9, 9, 30), self.field1)
+        self.game13 = Game("GAME13", "Game #13", u9_10, datetime(2025, 6, 9, 11, 0), self.field1)
+        self.game21 = Game("GAME21", "Game #21", u9_10, datetime(2025, 6, 9, 8, 0), self.field2)
+
+        self.assigner = Assigner()
+        self.assigner.assign_events(Game)
+
+    def assertConsistent(self):
+        for ref in self.refs:
+            for i, game in enumerate(ref.schedule):
+                self.assertIsNotNone(game.referees.find_assigned_object(ref))
+                if i:
+                    self.assertLessEqual(ref.schedule[i - 1].end_time + timedelta(minutes=15), game.start_time)
+
+        for game in Game.objects.all():
+            for slot, ref in game.referees:
+                self.assertIn(game, ref.schedule)
+
+    def test_reschedule(self):
+        crew = self.game11.referees["Center Referee"] + self.game11.referees["Assistant Referee"]
+
+        # Move game 12 on top of game 21 (different crew) and game 11 (same crew, now can't continue)
+        changed = self.assigner.reschedule(self.game12, datetime(2025, 6, 9, 8, 30))
+
+        self.assertEqual([self.game12, self.game13], changed)
+        self.assertEqual([self.game11, self.game12, self.game13], self.field1.get_events(Game))
+        self.assertEqual(3, len(list(self.game12.referees)))
+        self.assertFalse(set(crew) & {ref for slot, ref in self.game12.referees})
+        self.assertEqual(self.game12.referees["Center Referee"], self.game13.referees["Center Referee"])
+        self.assertConsistent()
+
+    def test_reschedule_reports_once(self):
+        repaired = []
+
+        def repair(event):
+            repaired.append(event)
+            changed = Assigner.repair(self.assigner, event)
+            # The walk from the old next event reaching the moved event again
+            return changed + [repaired[0]] if len(repaired) > 1 else changed
+
+        self.assigner.repair = repair
+        changed = self.assigner.reschedule(self.game11, datetime(2025, 6, 9, 12, 30))
+
+        self.assertEqual(repaired, [self.game11, self.game12])
+        self.assertEqual(changed, [self.game11, self.game12])
+
+    def test_withdraw(self):
+        center = self.game12.referees["Center Referee"][0]
+
+        changed = self.assigner.withdraw(center, datetime(2025, 6, 9, 9, 0), datetime(2025, 6, 9, 10, 30))
+
+        self.assertEqual([self.game12, self.game13], changed)
+        self.assertNotIn(self.game12, center.schedule)
+        self.assertIn(self.game11, center.schedule)
+        self.assertEqual(1, len(self.game12.referees["Center Referee"]))
+        self.assertNotEqual(center, self.game12.referees["Center Referee"][0])
+        self.assertConsistent()
+
+    def test_withdraw_offers_new_objects(self):
+        crew = [ref for slot, ref in self.game12.referees]
+        for ref in self.refs:
+            if ref not in crew:
+                ref.add_blackout(datetime(2025, 6, 9, 9, 0), datetime(2025, 6, 9, 11, 0))
+        new_ref = Referee("Ref 9")  # Registered after the run built its pools
+
+        self.assigner.withdraw(crew[0], datetime(2025, 6, 9, 9, 0), datetime(2025, 6, 9, 10, 30))
+
+        self.assertEqual([new_ref], self.game12.referees["Center Referee"])
+        self.assertConsistent()
+
+
+class AvailabilityTest(TestCase):
+    def tearDown(self):
+        reset_registries()
+
+    def test_windows_and_blackouts(self):
+        availability = Availability()
+        self.assertIsNone(availability.check(datetime(2025, 6, 9, 8), datetime(2025, 6, 9, 9)))
+
+        availability.add_window(datetime(2025, 6, 9, 8), datetime(2025, 6, 9, 12))
+        availability.add_blackout(datetime(2025, 6, 9, 10), datetime(2025, 6, 9, 10, 30))
+        availability.add_window(datetime(2025, 6, 2, 8), datetime(2025, 6, 2, 9))  # Before the first window
+
+        self.assertTrue(availability.check(datetime(2025, 6, 9, 8), datetime(2025, 6, 9, 10)))
+        self.assertFalse(availability.check(datetime(2025, 6, 9, 9), datetime(2025, 6, 9, 10, 5)))
+        self.assertIsNone(availability.check(datetime(2025, 6, 9, 11), datetime(2025, 6, 9, 12, 1)))
+        self.assertTrue(availability.check(datetime(2025, 6, 2, 8), datetime(2025, 6, 2, 9)))
+        self.assertIsNone(availability.check(datetime(2025, 5, 1, 8), datetime(2025, 5, 1, 9)))
+
+    def test_rounding(self):
+        availability = Availability()
+        availability.add_window(datetime(2025, 6, 9, 8, 3), datetime(2025, 6, 9, 11, 57))  # Off the 5 minute buckets
+        availability.add_blackout(datetime(2025, 6, 9, 14, 1), datetime(2025, 6, 9, 14, 2))
+        availability.add_weekly(1, time(8, 3), time(8, 6))  # Shorter than a bucket
+
+        self.assertIsNone(availability.check(datetime(2025, 6, 9, 8), datetime(2025, 6, 9, 9)))
+        self.assertIsNone(availability.check(datetime(2025, 6, 9, 11), datetime(2025, 6, 9, 11, 58)))
+        self.assertTrue(availability.check(datetime(2025, 6, 9, 8, 5), datetime(2025, 6, 9, 11, 55)))
+        self.assertFalse(availability.check(datetime(2025, 6, 9, 13, 59), datetime(2025, 6, 9, 14, 0, 30)))
+        self.assertIsNone(availability.check(datetime(2025, 6, 10, 8, 3), datetime(2025, 6, 10, 8, 6)))
+
+    def test_zero_duration(self):
+        availability = Availability()
+        availability.add_window(datetime(2025, 6, 9, 8), datetime(2025, 6, 9, 12))
+        availability.add_window(datetime(2025, 6, 9, 14), datetime(2025, 6, 9, 14))  # Covers nothing
+        availability.add_blackout(datetime(2025, 6, 9, 11, 2), datetime(2025, 6, 9, 11, 2))  # Blocks its bucket
+
+        self.assertTrue(availability.check(datetime(2025, 6, 9, 9), datetime(2025, 6, 9, 9)))
+        self.assertFalse(availability.check(datetime(2025, 6, 9, 11, 4), datetime(2025, 6, 9, 11, 4)))
+        self.assertFalse(availability.check(datetime(2025, 6, 9, 10, 30), datetime(2025, 6, 9, 11, 1)))
+        self.assertTrue(availability.check(datetime(2025, 6, 9, 11, 5), datetime(2025, 6, 9, 11, 5)))
+        self.assertIsNone(availability.check(datetime(2025, 6, 9, 12), datetime(2025, 6, 9, 12)))
+        self.assertIsNone(availability.check(datetime(2025, 6, 9, 14), datetime(2025, 6, 9, 14)))
+        with self.assertRaises(ValueError):
+            availability.check(datetime(2025, 6, 9, 9), datetime(2025, 6, 9, 8))
+
+        with self.assertRaises(ValueError):
+            availability.check(datetime(2025, 6, 9, 8, tzinfo=timezone.utc), datetime(2025, 6, 9, 9, tzinfo=timezone.utc))
+
+    def test_weekly(self):
+        availability = Availability()
+        availability.add_weekly(6, time(22, 0), time(2, 0))  # Sunday night, past midnight into Monday
+        availability.add_weekly(0, time(8, 0), time(12, 0))  # Monday morning
+
+        self.assertTrue(availability.check(datetime(2025, 6, 8, 23), datetime(2025, 6, 9, 1)))
+        self.assertTrue(availability.check(datetime(2025, 6, 16, 8, 30), datetime(2025, 6, 16, 11)))
+        self.assertIsNone(availability.check(datetime(2025, 6, 17, 8, 30), datetime(2025, 6, 17, 11)))
+
+        availability.add_blackout(datetime(2025, 6, 16, 9), datetime(2025, 6, 16, 10))
+        self.assertFalse(availability.check(datetime(2025, 6, 16, 8, 30), datetime(2025, 6, 16, 11)))
+        self.assertTrue(availability.check(datetime(2025, 6, 23, 8, 30), datetime(2025, 6, 23, 11)))
+
+    def test_is_available(self):
+        field = FieldGroup("Field 1")
+        u9_10 = AgeGroup("U9/10", timedelta(minutes=55))
+        group = AssignmentGroup(AssignmentSlot("Center Referee", Referee))
+        game = Game("GAME11", "Game #11", u9_10, datetime(2025, 6, 9, 8, 0), field)  # Monday
+
+        weekends_only = AssignmentObject([(5, time(0, 0), time(0, 0)), (6, time(0, 0), time(0, 0))])
+        mornings = AssignmentObject([(datetime(2025, 6, 9, 7), datetime(2025, 6, 9, 12))])
+        always = Referee("Ref 1")
+        always.add_blackout(datetime(2025, 6, 9, 8, 50), datetime(2025, 6, 9, 9))
+
+        self.assertFalse(weekends_only.is_available(game, group))
+        self.assertTrue(mornings.is_available(game, group))
+        self.assertFalse(always.is_available(game, group))
+
+
+class StatsTest(TestCase):
+    def tearDown(self):
+        reset_registries()
+
+    def setUp(self):
+        u9_10 = AgeGroup("U9/10", timedelta(minutes=55))
+        Referee("Ref 1")
+        Referee("Ref 2")
+
+        Game("GAME1", "Game #1", u9_10, datetime(2025, 6, 9, 8, 0), FieldGroup("Field 1"))
+        Game("GAME2", "Game #2", u9_10, datetime(2025, 6, 9, 8, 30), FieldGroup("Field 2"))  # Overlaps
+        Game("GAME3", "Game #3", u9_10, datetime(2025, 6, 9, 9, 0), FieldGroup("Field 3"))  # Inside the buffer
+
+    def test_counters(self):
+        class HookedStats(AssignerStats):
+            def __init__(self):
+                super().__init__()
+                self.log = []
+
+            def assigned_object(self, event, slot, obj):
+                super().assigned_object(event, slot, obj)
+                self.log.append((event.event_id, slot.name, obj.name))
+
+        self.assertIsNone(Assigner().assign_events(Game))
+        for game in Game.objects.all():
+            Assigner().release(game)
+
+        stats = Assigner(stats=HookedStats()).assign_events(Game)
+
+        self.assertEqual(stats.log, [("GAME1", "Center Referee", "Ref 1"), ("GAME1", "Assistant Referee", "Ref 2")])
+        self.assertEqual((stats.assigned, stats.unassigned), (2, 7))
+        self.assertEqual(stats.rejections["in_group"], 3)
+        self.assertEqual(stats.rejections["overlap"], 6)
+        self.assertEqual(stats.rejections["buffer"], 6)
+        self.assertEqual(stats.examined, 17)
+        self.assertGreater(stats.seconds["candidates"], 0)
+        self.assertEqual(set(stats.group_seconds), {"Field 1", "Field 2", "Field 3"})
+
+    def test_flow(self):
+        stats = Assigner(strategy="flow", stats=AssignerStats()).assign_events(Game)
+
+        self.assertEqual((stats.assigned, stats.unassigned), (2, 7))
+        self.assertGreater(stats.seconds["flow_solve"], 0)
+        self.assertEqual(stats.seconds["candidates"], 0)
+
+
+class SlottedReferee(AssignmentObject):
+    __slots__ = ("name",)
+
+    def __init__(self, name):
+        self.name = name
+        super().__init__([], True)
+
+
+class SlottedGame(Event):
+    __slots__ = ("officials", "assistants")
+    assignment_group_fields = ("officials", "assistants")
+
+    def __init__(self, event_id, start_time, field):
+        super().__init__(event_id, event_id, AgeGroup("U12", timedelta(minutes=60)), start_time, groups=[field])
+        # Set out of declaration order on purpose
+        self.assistants = AssignmentGroup(AssignmentSlot("Assistant Referee", SlottedReferee, 2))
+        self.officials = AssignmentGroup(AssignmentSlot("Center Referee", SlottedReferee))
+
+
+class CompactStorageTest(TestCase):
+    def tearDown(self):
+        reset_registries()
+
+    def test_slotted_models(self):
+        field = FieldGroup("Field 1")
+        refs = [SlottedReferee(f"Ref {i}") for i in range(3)]
+        game = SlottedGame("GAME1", datetime(2025, 6, 9, 8, 0), field)
+
+        self.assertFalse(hasattr(game, "__dict__"))
+        self.assertFalse(hasattr(refs[0], "__dict__"))
+        self.assertEqual(game.assignment_groups, [game.officials, game.assistants])
+
+        Assigner().assign_events(SlottedGame)
+        self.assertEqual(game.officials["Center Referee"], [refs[0]])
+        self.assertEqual(game.assistants["Assistant Referee"], refs[1:])
+
+    def test_groups_registered_on_class(self):
+        field = FieldGroup("Field 1")
+        game = Game("GAME1", "Game #1", AgeGroup("U9/10", timedelta(minutes=55)), datetime(2025, 6, 9, 8), field)
+        game.extra = AssignmentGroup(AssignmentSlot("Fourth Official", Referee))
+
+        self.assertEqual(list(Game._group_fields), ["referees", "extra"])
+        self.assertEqual(len(game.assignment_groups), 2)
+        game.extra = None
+        self.assertEqual(game.assignment_groups, [game.referees])
+
+
+class SnapshotTest(TestCase):
+    def tearDown(self):
+        reset_registries()
+
+    def setUp(self):
+        field1 = FieldGroup("Field 1")
+        u9_10 = AgeGroup("U9/10", timedelta(minutes=55))
+        for i in range(6):
+            Referee(f"Ref {i}")
+        Game("GAME11", "Game #11", u9_10, datetime(2025, 6, 9, 8, 0), field1)
+        Game("GAME12", "Game #12", u9_10, datetime(2025, 6, 9, 9, 30), field1)
+        Game("GAME21", "Game #21", u9_10, datetime(2025, 6, 9, 8, 0), FieldGroup("Field 2"))
+        Assigner().assign_events(Game)
+
+        fd, self.path = tempfile.mkstemp()
+        os.close(fd)
+        self.addCleanup(os.remove, self.path)
+
+    @staticmethod
+    def assignments():
+        return {game.event_id: [(slot.name, ref.name) for slot, ref in game.referees]
+                for game in Game.objects.all()}
+
+    def test_round_trip(self):
+        before = self.assignments()
+        snapshot.save(self.path)
+        reset_registries()
+        self.assertEqual(Game.objects.all(), [])
+
+        self.assertEqual(snapshot.load(self.path), 0)
+        self.assertEqual(self.assignments(), before)
+
+        game11, game12 = Game.objects.get("GAME11"), Game.objects.get("GAME12")
+        field1 = FieldGroup.objects.get(name="Field 1")
+        self.assertEqual(Game.objects.filter(groups__contains=field1), [game11, game12])
+        self.assertIs(field1.next_event(game11), game12)
+        self.assertIs(game11.referees.event, game11)
+
+        ref = game11.referees["Center Referee"][0]
+        self.assertEqual(list(ref.schedule), [game11, game12])
+        self.assertEqual(Referee(f"Ref 6").pk, 7)  # Sequence carries on
+
+    def test_deltas(self):
+        snapshot.save(self.path)
+
+        assigner = Assigner()
+        ref = Game.objects.get("GAME11").referees["Center Referee"][0]
+        changed = assigner.withdraw(ref, datetime(2025, 6, 9, 9), datetime(2025, 6, 9, 12))
+        changed += assigner.reschedule(Game.objects.get("GAME21"), datetime(2025, 6, 9, 13))
+        snapshot.append_assignments(self.path, changed)
+        after = self.assignments()
+
+        reset_registries()
+        self.assertEqual(snapshot.load(self.path), len(changed))
+        self.assertEqual(self.assignments(), after)
+        self.assertEqual(Game.objects.get("GAME21").start_time, datetime(2025, 6, 9, 13))
+        for game in Game.objects.all():
+            for slot, ref in game.referees:
+                self.assertIn(game, ref.schedule)
+
+    def test_slotted_models(self):
+        game = SlottedGame("GAME31", datetime(2025, 6, 9, 8, 0), FieldGroup("Field 3"))
+        refs = [SlottedReferee(f"Slotted {i}") for i in range(3)]
+        self.assertEqual(type(game).__dictoffset__, 0)
+        Assigner().assign_events(SlottedGame)
+
+        snapshot.save(self.path)
+        reset_registries()
+        snapshot.load(self.path)
+
+        game = SlottedGame.objects.get("GAME31")
+        self.assertEqual([ref.name for ref in game.officials["Center Referee"]], [refs[0].name])
+        self.assertEqual([ref.name for ref in game.assistants["Assistant Referee"]], [ref.name for ref in refs[1:]])
+        self.assertEqual(list(game.officials["Center Referee"][0].schedule), [game])
+
+    def test_not_a_snapshot(self):
+        with open(self.path, "wb") as f:
+            f.write(b"x" * 64)
+        with self.assertRaises(snapshot.SnapshotError):
+            snapshot.load(self.path)
+
+
+class RegistryTest(TestCase):
+    def tearDown(self):
+        reset_registries()
+
+    @staticmethod
+    def season(refs):
+        field = FieldGroup("Field 1")
+        u9_10 = AgeGroup("U9/10", timedelta(minutes=55))
+        for i in range(refs):
+            Referee(f"Ref {i}")
+        for i in range(3):
+            Game(f"GAME{i}", f"Game #{i}", u9_10, datetime(2025, 6, 9, 8 + 2 * i), field)
+
+    def test_side_by_side(self):
+        seasons = [Registry("Spring"), Registry("Fall")]
+        for refs, registry in zip((3, 5), seasons):
+            with registry.activate():
+                self.season(refs)
+                self.assertEqual(refs, len(Referee.objects.all()))
+
+        self.assertEqual([], Game.objects.all())  # Nothing in the default registry
+        with seasons[1].activate():
+            self.assertEqual(3, len(Game.objects.all()))
+            self.assertIsNot(Game.objects.get("GAME0"), seasons[0].objects(Game).get("GAME0"))
+
+        # Assign both at once, threads don't see each other's registry
+        with ThreadPoolExecutor(2) as executor:
+            list(executor.map(lambda registry: Assigner(registry=registry).assign_events(Game), seasons))
+
+        for refs, registry in zip((3, 5), seasons):
+            game = registry.objects(Game).get("GAME0")
+            self.assertEqual([ref.name for slot, ref in game.referees], [f"Ref {i}" for i in range(3)])
+            self.assertEqual(refs, len(registry.objects(Referee).all()))
+
+    def test_stream_keeps_registry(self):
+        registry = Registry()
+        with registry.activate():
+            self.season(3)
+            events = Game.objects.all()
+
+        assigner = Assigner(registry=registry)
+        for event in assigner.assign_stream(events, horizon=timedelta(0)):
+            self.assertEqual([], Game.objects.all())  # Not active while the caller has the event
+
+        self.assertEqual(["GAME2"], [game.event_id for game in registry.objects(Game).all()])  # Others retired
+
+
+class ScenarioTest(TestCase):
+    def tearDown(self):
+        reset_registries()
+
+    def setUp(self):
+        self.fields = [FieldGroup("Field 1"), FieldGroup("Field 2")]
+        u9_10 = AgeGroup("U9/10", timedelta(minutes=55))
+        self.refs = [Referee(f"Ref {i}") for i in range(7)]
+        for i in range(3):
+            for field in self.fields:
+                Game(f"{field.name} #{i}", f"Game #{i}", u9_10, datetime(2025, 6, 9, 8 + 2 * i), field)
+        Assigner().assign_events(Game)
+
+    def state(self):
+        return ({game.event_id: (game.start_time, [(slot.name, ref.name) for slot, ref in game.referees])
+                 for game in Game.objects.all()},
+                [list(ref.schedule) for ref in self.refs],
+                [field.get_events(Game) for field in self.fields],
+                [field.next_event(game) for field in self.fields for game in field.get_events(Game)],
+                Referee.objects.all())
+
+    def what_if(self, assigner):
+        # Move Field 2 an hour later and drop Ref 0
+        for game in self.fields[1].get_events(Game):
+            assigner.release(game)
+            game.start_time += timedelta(hours=1)
+        assigner.withdraw(self.refs[0], datetime(2025, 6, 9), datetime(2025, 6, 10))
+        Referee.objects.unregister(self.refs[0].pk)
+        assigner.assign_events(Game)
+
+    def test_discard(self):
+        before = self.state()
+        assigner = Assigner()
+        with fork() as scenario:
+            self.what_if(assigner)
+            self.assertNotEqual(before, self.state())
+
+            diff = scenario.diff()
+            self.assertEqual([self.refs[0]], diff.removed)
+            self.assertEqual(3, len([change for change in diff.attributes if change[1] == "start_time"]))
+            self.assertIn(self.refs[0], [obj for slot, obj in diff.unassigned])
+
+        self.assertEqual(before, self.state())
+        self.assertIsNone(self.refs[0].availability.check(datetime(2025, 6, 9, 8), datetime(2025, 6, 9, 9)))
+
+    def test_commit(self):
+        with fork() as outer:
+            with fork() as inner:
+                self.what_if(Assigner())
+                after = self.state()
+                inner.commit()
+
+            self.assertEqual(after, self.state())
+            self.assertEqual([self.refs[0]], outer.diff().removed)  # Handed to the outer fork
+            outer.commit()
+
+        self.assertEqual(after, self.state())
+
+
+class StorageTest(TestCase):
+    def tearDown(self):
+        reset_registries()
+
+    def setUp(self):
+        fd, path = tempfile.mkstemp(suffix=".sqlite3")
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+
+        self.storage = SQLiteStorage(path, [
+            Table(FieldGroup, ("name", )),
+            Table(AgeGroup, ("name", "duration"), types={"duration": timedelta},
+                  attributes={"duration": "default_duration"}),
+            Table(Referee, ("name", )),
+            Table(Game, ("event_id", "name", "age_group", "start_time", "field"), pk="event_id",
+                  types={"start_time": datetime}, references={"age_group": AgeGroup, "field": FieldGroup},
+                  attributes={"age_group": "event_type", "field": lambda game: game.groups[0]}),
+        ])
+        self.addCleanup(self.storage.close)
+        self.storage.create_tables()
+
+        fields = [FieldGroup("Field 1"), FieldGroup("Field 2")]
+        u9_10 = AgeGroup("U9/10", timedelta(minutes=55))
+        for i in range(6):
+            Referee(f"Ref {i}")
+        for i in range(4):
+            Game(f"GAME{i}", f"Game #{i}", u9_10, datetime(2025, 6, 9, 8 + 2 * (i // 2)), fields[i % 2])
+        for model_cls in self.storage.tables:
+            self.storage.save_objects(model_cls)
+
+    @staticmethod
+    def assignments():
+        return {game.event_id: [(slot.name, ref.name) for slot, ref in game.referees] for game in Game.objects.all()}
+
+    def test_round_trip(self):
+        Assigner(storage=self.storage).assign_events(Game)
+        assigned = self.assignments()
+
+        connection = self.storage.connection
+        self.assertEqual(sum(len(refs) for refs in assigned.values()),
+                         connection.execute("SELECT COUNT(*) FROM assignments").fetchone()[0])
+        self.assertEqual([("Center Referee", 4), ("Assistant Referee", 8)],
+                         connection.execute("SELECT slot, amount FROM scheduled_counts").fetchall())
+
+        reset_registries()
+        self.storage.attach(Game, Referee, AgeGroup, FieldGroup)
+
+        game = Game.objects.get("GAME0")
+        self.assertEqual(["GAME0"], list(Game._instances))  # Only the row asked for (and what it references)
+        self.assertEqual(datetime(2025, 6, 9, 8), game.start_time)
+        self.assertEqual(timedelta(minutes=55), game.duration)
+
+        self.storage.load_assignments(Game.objects.all())
+        self.assertEqual(assigned, self.assignments())
+        self.assertEqual(6, len(Referee.objects.all()))
+        self.assertEqual(2, len(Game.objects.filter(event_type=game.event_type, groups__contains=game.groups[0])))
+
+
+class StreamTest(TestCase):
+    def tearDown(self):
+        reset_registries()
+
+    @staticmethod
+    def games(days):
+        u9_10 = AgeGroup("U9/10", timedelta(minutes=55))
+        fields = [FieldGroup(f"Field {f}") for f in range(2)]
+        for day in range(days):
+            for slot in range(4):
+                for f, field in enumerate(fields):
+                    start = datetime(2025, 6, 9, 8) + timedelta(days=day, minutes=90 * slot + 30 * f)
+                    yield Game(f"D{day}S{slot}F{f}", "Game", u9_10, start, field)
+
+    @staticmethod
+    def assignments(games):
+        return [[(slot.name, ref.name) for slot, ref in game.referees] for game in games]
+
+    def test_matches_batch(self):
+        for strategy in Assigner.strategies:
+            refs = [Referee(f"Ref {i}") for i in range(8)]
+            games = list(self.games(3))
+            Assigner(strategy=strategy).assign_events(Game, games)
+            expected = self.assignments(games)
+            reset_registries()
+
+            refs = [Referee(f"Ref {i}") for i in range(8)]
+            streamed = []
+            for game in Assigner(strategy=strategy).assign_stream(self.games(3)):
+                streamed.append(game)
+                self.assertLessEqual(len(Game.objects.all()), 8)  # Earlier days are retired
+                self.assertTrue(all(len(ref.schedule) <= 4 for ref in refs))
+
+            self.assertEqual([game.event_id for game in streamed], [game.event_id for game in games])
+            if strategy == "greedy":
+                self.assertEqual(self.assignments(streamed), expected)
+            else:  # The load cost only sees events that aren't retired, so the flow can pick different refs
+                self.assertEqual([len(game) for game in self.assignments(streamed)], [len(game) for game in expected])
+            reset_registries()
+
+    def test_registered_ahead(self):
+        def games():
+            # Field 1 continues with refs 3-5 (0-2 are on field 2 at first), its second game comes after field 2's
+            # second one, by when its first one could be retired
+            u9_10 = AgeGroup("U9/10", timedelta(minutes=55))
+            field1, field2 = FieldGroup("Field 1"), FieldGroup("Field 2")
+            return [Game("G0", "Game", u9_10, datetime(2025, 6, 9, 7), field2),
+                    Game("G1", "Game", u9_10, datetime(2025, 6, 9, 7, 30), field1),
+                    Game("G2", "Game", u9_10, datetime(2025, 6, 9, 9), field2),
+                    Game("G3", "Game", u9_10, datetime(2025, 6, 9, 10, 30), field1)]
+
+        refs = [Referee(f"Ref {i}") for i in range(6)]
+        Assigner().assign_events(Game, games())
+        expected = self.assignments(Game.objects.all())
+        self.assertEqual(expected[3], expected[1])
+        reset_registries()
+
+        refs = [Referee(f"Ref {i}") for i in range(6)]
+        streamed = list(Assigner().assign_stream(games()))  # All registered before streaming
+        self.assertEqual(self.assignments(streamed), expected)
+
+    def test_out_of_order(self):
+        Referee("Ref 1")
+        games = list(self.games(1))
+        with self.assertRaises(ValueError):
+            list(Assigner().assign_stream(reversed(games)))
+
+
+class AsyncAssignerTest(TestCase):
+    def tearDown(self):
+        reset_registries()
+
+    def test_prefetch_and_batches(self):
+        log = []
+        field = FieldGroup("Field 1")
+        u9_10 = AgeGroup("U9/10", timedelta(minutes=55))
+
+        class Source:
+            def __init__(self):
+                self.day = 0
+
+            async def next_window(self):
+                if self.day == 3:
+                    return None
+                self.day += 1
+                log.append(f"fetch {self.day}")
+                await asyncio.sleep(0.01)
+                start = datetime(2025, 6, 8 + self.day, 8)
+                return [Game(f"D{self.day}G{g}", "Game", u9_10, start + timedelta(minutes=90 * g), field)
+                        for g in range(3)]
+
+            async def load_objects(self, events):
+                if not Referee.objects.all():
+                    for i in range(3):
+                        Referee(f"Ref {i}")
+
+        class Sink:
+            def __init__(self):
+                self.batches = []
+
+            async def write(self, events):
+                log.append(f"write {len(events)}")
+                self.batches.append([event.event_id for event in events])
+
+        class LoggingAssigner(AsyncAssigner):
+            def assign_serial(self, events, scheduled_count):
+                log.append(f"assign {events[0].event_id}")
+                super().assign_serial(events, scheduled_count)
+
+        sink = Sink()
+        asyncio.run(LoggingAssigner().assign_events_async(Source(), sink, batch_size=4))
+
+        self.assertEqual(log.index("fetch 2"), log.index("assign D1G0") + 1)  # Fetched while day 1 is assigned
+        self.assertEqual([len(batch) for batch in sink.batches], [6, 3])
+        for game in Game.objects.all():
+            self.assertEqual(3, len(list(game.referees)))
+
+
+class Marshal(AssignmentObject):
+    def __init__(self, name, grade):
+        self.name = name
+        self.grade = grade
+        super().__init__([], True)
+
+
+class Venue(EventGroup):
+    def __init__(self, name):
+        super().__init__(name, try_keep_assignments_in_group=False)
+
+
+class Heat(Event):
+    def __init__(self, event_id, start_time, venue):
+        super().__init__(event_id, event_id, EventType("Heat", timedelta(minutes=45)), start_time, groups=[venue])
+        self.marshals = AssignmentGroup(AssignmentSlot("Helper", Marshal),
+                                        AssignmentSlot("Lead", Marshal, rule=AssignmentRule("WHEN obj.grade >= 2")))
+
+
+class OrderingTest(TestCase):
+    def tearDown(self):
+        reset_registries()
+
+    @staticmethod
+    def crew(heat):
+        return heat.marshals["Lead"] + heat.marshals["Helper"]
+
+    def test_least_loaded(self):
+        marshals = [Marshal("M0", 2), Marshal("M1", 2), Marshal("M2", 1)]
+        heats = [Heat(f"H{i}", datetime(2025, 6, 9, 8 + i), Venue(f"V{i}")) for i in range(3)]
+
+        Assigner().assign_events(Heat)
+        self.assertEqual([len(m.schedule) for m in marshals], [3, 3, 0])
+
+        for heat in heats:
+            Assigner().release(heat)
+        Assigner(order="least_loaded").assign_events(Heat)
+        self.assertEqual([len(m.schedule) for m in marshals], [2, 2, 2])
+        self.assertEqual([m.name for m in self.crew(heats[1])], ["M0", "M2"])
+
+    def test_most_constrained_first(self):
+        Marshal("M0", 2)
+        Marshal("M1", 1)
+        heat = Heat("H0", datetime(2025, 6, 9, 8), Venue("V0"))
+
+        Assigner().assign_events(Heat)
+        self.assertEqual([m.name for m in self.crew(heat)], ["M0"])  # Helper took the only lead
+
+        Assigner().release(heat)
+        Assigner(order="fewest_eligible").assign_events(Heat)
+        self.assertEqual([m.name for m in self.crew(heat)], ["M0", "M1"])
+
+    def test_closest_venue(self):
+        marshals = [Marshal(f"M{i}", 2) for i in range(4)]
+        a, b = Venue("A"), Venue("B")
+        Heat("H1", datetime(2025, 6, 9, 8), a)
+        Heat("H2", datetime(2025, 6, 9, 8), b)
+        heat3 = Heat("H3", datetime(2025, 6, 9, 10), b)
+
+        Assigner(order="closest_venue").assign_events(Heat)
+        self.assertEqual(set(self.crew(heat3)), {marshals[2], marshals[3]})
+
+        for order in ("least_loaded", "fewest_eligible"):
+            for heat in Heat.objects.all():
+                Assigner().release(heat)
+            Assigner(order=order).assign_events(Heat)
+            self.assertEqual(set(self.crew(heat3)), {marshals[0], marshals[1]}, order)
+
+    def test_queue_follows_schedules(self):
+        marshals = [Marshal(f"M{i}", 2) for i in range(3)]
+        heats = [Heat(f"H{i}", datetime(2025, 6, 9, 8 + i), Venue(f"V{i}")) for i in range(3)]
+        pool = CandidatePool(Marshal)
+        queue = CandidateQueue(pool, lambda i: len(pool.objects[i].schedule), watch=True)
+
+        marshals[0].schedule.extend(heats[:2])
+        marshals[1].schedule.append(heats[2])
+        self.assertEqual(list(queue.iter(pool.everyone)), [marshals[2], marshals[1], marshals[0]])
+
+        marshals[0].schedule.clear()  # Loads going down are picked up too
+        self.assertEqual(list(queue.iter(pool.everyone)), [marshals[0], marshals[2], marshals[1]])
+
+        for _ in range(100):
+            queue.touch(1)
+        self.assertLess(len(queue.heap), 30)
+        self.assertEqual(list(queue.iter(pool.everyone)), [marshals[0], marshals[2], marshals[1]])
+
+    def test_unknown_order(self):
+        with self.assertRaises(ValueError):
+            Assigner(order="random")
+
+
+class RepairPassTest(TestCase):
+    def tearDown(self):
+        reset_registries()
+
+    def setUp(self):
+        self.marshals = [Marshal("M0", 2), Marshal("M1", 1), Marshal("M2", 2), Marshal("M3", 1)]
+        self.h1 = Heat("H1", datetime(2025, 6, 9, 8), Venue("A"))
+        self.h2 = Heat("H2", datetime(2025, 6, 9, 8), Venue("B"))
+
+    def test_moves_an_assignment(self):
+        Assigner().assign_events(Heat)
+        self.assertEqual(self.h2.marshals["Lead"], [])  # M0 went to H1 as a helper
+
+        for heat in (self.h1, self.h2):
+            Assigner().release(heat)
+        stats = Assigner(repair_iterations=100, stats=AssignerStats()).assign_events(Heat)
+
+        self.assertEqual(stats.repaired, 1)
+        for heat in (self.h1, self.h2):
+            self.assertEqual(2, len(list(heat.marshals)))
+            self.assertTrue(all(m.grade >= 2 for m in heat.marshals["Lead"]))
+        for marshal in self.marshals:
+            self.assertLessEqual(len(marshal.schedule), 1)
+            for heat in marshal.schedule:
+                self.assertIsNotNone(heat.marshals.find_assigned_object(marshal))
+
+    def test_budget(self):
+        stats = Assigner(repair_iterations=100, repair_depth=0, stats=AssignerStats()).assign_events(Heat)
+        self.assertEqual(stats.repaired, 0)
+        self.assertEqual(self.h2.marshals["Lead"], [])
+
+    def test_scheduled_count(self):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            Assigner(repair_iterations=100).assign_events(Heat)
+        self.assertIn("Scheduled 2 Leads", out.getvalue())
+        self.assertIn("Scheduled 2 Helpers", out.getvalue())
+
+    def test_time_budget_alone(self):
+        stats = Assigner(repair_seconds=5, stats=AssignerStats()).assign_events(Heat)
+        self.assertEqual(stats.repaired, 1)
+
+
+class TravelTimesTest(TestCase):
+    def tearDown(self):
+        reset_registries()
+
+    def setUp(self):
+        self.a, self.b, self.c = Venue("A"), Venue("B"), Venue("C")
+        self.times = TravelTimes.from_rows([(self.a, self.a, timedelta(0)), (self.a, self.b, timedelta(hours=1)),
+                                            (self.a, self.c, timedelta(hours=1)), (self.b, self.c, timedelta(minutes=10))])
+
+    def test_lookup(self):
+        h1 = Heat("H1", datetime(2025, 6, 9, 8), self.a)
+        h2 = Heat("H2", datetime(2025, 6, 9, 8), self.b)
+        h3 = Heat("H3", datetime(2025, 6, 9, 8), Venue("D"))
+
+        self.assertEqual(self.times.between(h1, h2), timedelta(hours=1))
+        self.assertEqual(self.times.between(h2, h2), timedelta(minutes=15))  # Not set, the default
+        self.assertEqual(self.times.between(h1, h3), timedelta(minutes=15))
+        self.assertEqual(self.times.longest, timedelta(hours=1))
+        self.assertEqual(self.times.shortest_before(h1), timedelta(0))
+
+        h1.groups = [self.b]
+        self.assertEqual(self.times.between(h1, h2), timedelta(minutes=15))
+
+    def test_buffers(self):
+        Marshal("M0", 2)
+        Marshal("M1", 2)
+        h1 = Heat("H1", datetime(2025, 6, 9, 8), self.a)
+        h2 = Heat("H2", datetime(2025, 6, 9, 8, 50), self.a)  # 5 minutes after H1, same venue
+        h3 = Heat("H3", datetime(2025, 6, 9, 9, 50), self.b)  # 15 minutes after H2, an hour away
+
+        Assigner().assign_events(Heat)
+        self.assertEqual([len(list(heat.marshals)) for heat in (h1, h2, h3)], [2, 0, 2])
+
+        for heat in (h1, h2, h3):
+            Assigner().release(heat)
+            heat.marshals.travel_times = self.times
+        Assigner().assign_events(Heat)
+        self.assertEqual([len(list(heat.marshals)) for heat in (h1, h2, h3)], [2, 2, 0])
+
+        lead = h3.marshals.get_slot("Lead")
+        self.assertEqual(Marshal.objects.all()[0].rejection_reason(h3, lead, h3.marshals), "buffer")
+
+    def test_nearest_first(self):
+        marshals = [Marshal(f"M{i}", 2) for i in range(4)]
+        Heat("H1", datetime(2025, 6, 9, 8), self.a)
+        Heat("H2", datetime(2025, 6, 9, 8), self.b)
+        heat3 = Heat("H3", datetime(2025, 6, 9, 10), self.c)
+        for heat in Heat.objects.all():
+            heat.marshals.travel_times = self.times
+
+        Assigner(order="closest_venue").assign_events(Heat)
+        self.assertEqual(set(heat3.marshals["Lead"] + heat3.marshals["Helper"]), {marshals[2], marshals[3]})
+
+
+class Steward(AssignmentObject):
+    workload_limits = (MaxEventsPerDay(2),)
+
+    def __init__(self, name):
+        self.name = name
+        super().__init__([], True)
+
+
+class Race(Event):
+    def __init__(self, event_id, start_time):
+        super().__init__(event_id, event_id, EventType("Race", timedelta(minutes=45)), start_time)
+        self.stewards = AssignmentGroup(AssignmentSlot("Steward", Steward))
+
+
+class WorkloadTest(TestCase):
+    def tearDown(self):
+        reset_registries()
+
+    def test_limits(self):
+        marshal = Marshal("M0", 1)
+        venue = Venue("A")
+        day = datetime(2025, 6, 9)
+        heats = [Heat(f"H{hour}", day.replace(hour=hour), venue) for hour in (8, 10)]
+        marshal.schedule.extend(heats)
+
+        per_day = MaxEventsPerDay(2)
+        self.assertFalse(per_day.allows(marshal, Heat("H14", day.replace(hour=14), venue)))
+        self.assertTrue(per_day.allows(marshal, Heat("N8", day + timedelta(days=1, hours=8), venue)))
+        marshal.schedule.remove(heats[1])
+        self.assertTrue(per_day.allows(marshal, Heat("H16", day.replace(hour=16), venue)))
+        marshal.schedule.append(heats[1])
+
+        duty = MaxDuty(timedelta(hours=2), within=timedelta(hours=4))
+        self.assertFalse(duty.allows(marshal, Heat("H11", day.replace(hour=11), venue)))  # 8:00-12:00 has 2h15
+        self.assertTrue(duty.allows(marshal, Heat("H12", day.replace(hour=12), venue)))
+
+        rest = MinRest(timedelta(hours=10))
+        self.assertFalse(rest.allows(marshal, Heat("E", day - timedelta(hours=1), venue)))  # 23:00 the day before
+        self.assertTrue(rest.allows(marshal, Heat("H22", day.replace(hour=22), venue)))  # Same day
+        self.assertTrue(rest.allows(marshal, Heat("N7", day + timedelta(days=1, hours=7), venue)))
+        marshal.schedule.append(Heat("H22", day.replace(hour=22), venue))
+        self.assertFalse(rest.allows(marshal, Heat("N7", day + timedelta(days=1, hours=7), venue)))
+
+    def test_duty_tallies(self):
+        marshal = Marshal("M0", 1)
+        venue = Venue("A")
+        day = datetime(2025, 6, 9)
+        heats = [Heat(f"H{hour}", day.replace(hour=hour), venue) for hour in (8, 10, 23)]
+        marshal.schedule.extend(heats[:2])
+
+        self.assertEqual({day.date(): timedelta(minutes=90)}, marshal.schedule.duty_per_day())
+        marshal.schedule.append(heats[2])  # Counted on the day it starts
+        marshal.schedule.remove(heats[0])
+        self.assertEqual({day.date(): timedelta(minutes=90)}, marshal.schedule.duty_per_day())
+
+        duty = MaxDuty(timedelta(minutes=75), within=timedelta(hours=2))
+        self.assertFalse(duty.allows(marshal, Heat("N0", day + timedelta(days=1), venue)))  # 23:00-1:00 has 1h30
+        self.assertTrue(duty.allows(marshal, Heat("N1", day + timedelta(days=1, minutes=30), venue)))
+
+        marshal.schedule.clear()
+        self.assertEqual({}, marshal.schedule.duty_per_day())
+        self.assertTrue(duty.allows(marshal, Heat("N0", day + timedelta(days=1), venue)))
+
+    def test_assign(self):
+        stewards = [Steward("S0"), Steward("S1")]
+        races = [Race(f"R{hour}", datetime(2025, 6, 9, hour)) for hour in (8, 10, 12)]
+
+        stats = Assigner(stats=AssignerStats()).assign_events(Race)
+        self.assertEqual([race.stewards["Steward"] for race in races],
+                         [[stewards[0]], [stewards[0]], [stewards[1]]])
+        self.assertEqual(stats.rejections["workload"], 1)
+        self.assertEqual(stats.workload_rejections, {"MaxEventsPerDay(2)": 1})
+
+        self.assertEqual(stewards[0].schedule.per_day(), {datetime(2025, 6, 9).date(): 2})
+        Assigner().release(races[0])
+        self.assertEqual(stewards[0].schedule.per_day(), {datetime(2025, 6, 9).date(): 1})